@@ -0,0 +1,93 @@
+"""Chart payload benchmark: full-resolution vs downsampled comparison chart.
+
+Builds the comparison chart for three synthetic 40-year daily portfolios
+(plus a 5-minute intraday series) and reports, per mode, the number of
+plotted points, the serialized figure size and the time to downsample,
+build and serialize it (what ``st.plotly_chart`` does on every rerun).
+
+    python benchmarks/bench_charts.py [--years 40] [--repeat 5]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine import CHART_MAX_POINTS, downsample_series  # noqa: E402
+
+
+def synthetic_series(n_days: int, seed: int, start: str = "1985-01-01", freq: str = "B") -> pd.Series:
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=n_days, freq=freq)
+    values = 100_000 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, n_days)))
+    return pd.Series(values, index=index)
+
+
+def build_figure(series_list: list[pd.Series], method: str | None) -> go.Figure:
+    fig = go.Figure()
+    for i, s in enumerate(series_list):
+        if method:
+            s = downsample_series(s, CHART_MAX_POINTS, method)
+        trace_cls = go.Scattergl if len(s) > CHART_MAX_POINTS else go.Scatter
+        fig.add_trace(trace_cls(x=s.index, y=s.values, mode="lines", name=f"portfolio {i + 1}"))
+    fig.update_layout(template="plotly_dark", height=520, hovermode="x unified")
+    return fig
+
+
+def bench(series_list: list[pd.Series], method: str | None, repeat: int) -> dict:
+    best_build = best_json = np.inf
+    payload = ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fig = build_figure(series_list, method)
+        t1 = time.perf_counter()
+        payload = pio.to_json(fig, validate=False)
+        t2 = time.perf_counter()
+        best_build = min(best_build, t1 - t0)
+        best_json = min(best_json, t2 - t1)
+    return {
+        "mode": method or "full",
+        "points": sum(len(t.x) for t in fig.data),
+        "payload_kb": len(payload) / 1024,
+        "build_ms": best_build * 1e3,
+        "to_json_ms": best_json * 1e3,
+    }
+
+
+def max_abs_gap(full: pd.Series, method: str) -> float:
+    # The extremes must survive: relative error of the plotted min and max.
+    small = downsample_series(full, CHART_MAX_POINTS, method)
+    return max(abs(small.max() / full.max() - 1), abs(small.min() / full.min() - 1))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    cases = {
+        f"comparison ({args.years}y × 3 portfolios)": [synthetic_series(args.years * 252, seed) for seed in range(3)],
+        "research intraday (5d × 5m)": [synthetic_series(5 * 78, 9, "2024-01-01", "5min")],
+        "research 5y daily": [synthetic_series(5 * 252, 7)],
+    }
+    for name, series_list in cases.items():
+        print(f"\n{name}")
+        print(f"  {'mode':<8}{'points':>10}{'payload KB':>13}{'build ms':>11}{'to_json ms':>12}")
+        for method in (None, "minmax", "lttb"):
+            r = bench(series_list, method, args.repeat)
+            print(f"  {r['mode']:<8}{r['points']:>10,}{r['payload_kb']:>13,.1f}{r['build_ms']:>11.1f}{r['to_json_ms']:>12.1f}")
+        for method in ("minmax", "lttb"):
+            print(f"  {method} extreme error: {max(max_abs_gap(s, method) for s in series_list):.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
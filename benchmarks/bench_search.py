@@ -0,0 +1,136 @@
+"""Ticker search latency over a 50k-symbol listing.
+
+Builds a TickerIndex over --symbols synthetic symbols (US-style tickers and
+TASE ".TA" listings with multi-word names) and times single lookups drawn
+from the listing itself:
+
+    prefix     the first 1-3 letters of a symbol or a name
+    substring  3-6 letters from the middle of a name
+    typo       a symbol or name word with one letter dropped, doubled,
+               swapped or replaced (TickerIndex.suggest)
+
+Reported per kind: p50 / p99 / max per lookup in ms; also the index build
+time and, for reference, a linear scan's p50 on the prefix queries. Exit
+code 1 when any kind's p50 reaches --target-ms.
+
+    python benchmarks/bench_search.py [--symbols 50000] [--queries 2000] [--target-ms 1]
+"""
+
+import argparse
+import string
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine import TickerIndex  # noqa: E402
+
+LOOKUP_TARGET_MS = 1.0
+NAME_WORDS = (
+    "American Global Capital Energy Health Tech Financial Industrial Growth Value Income Bond Treasury "
+    "Israel Tel Aviv Bank Insurance Realty Pharma Systems Networks Holdings Partners Trust Index Fund "
+    "Dividend Emerging Markets Small Mid Large Cap Total Semiconductor Software Retail Consumer Utilities"
+).split()
+SUFFIXES = ("Inc", "Corp", "Ltd", "ETF", "Group", "plc")
+
+
+def synthetic_listing(n: int, seed: int = 0) -> dict[str, str]:
+    rng = np.random.default_rng(seed)
+    letters = np.array(list(string.ascii_uppercase))
+    db = {}
+    while len(db) < n:
+        sym = "".join(rng.choice(letters, size=int(rng.integers(1, 6))))
+        if rng.random() < 0.2:
+            sym += ".TA"
+        words = rng.choice(NAME_WORDS, size=int(rng.integers(1, 4)), replace=False)
+        db.setdefault(sym, " ".join([*words, str(rng.choice(SUFFIXES))]))
+    return db
+
+
+def typo(word: str, rng: np.random.Generator) -> str:
+    j = int(rng.integers(0, len(word)))
+    kind = rng.integers(0, 4)
+    if kind == 0 and len(word) > 3:
+        return word[:j] + word[j + 1:]
+    if kind == 1:
+        return word[:j] + word[j] + word[j:]
+    if kind == 2 and j + 1 < len(word):
+        return word[:j] + word[j + 1] + word[j] + word[j + 2:]
+    return word[:j] + str(rng.choice(list(string.ascii_uppercase))) + word[j + 1:]
+
+
+def make_queries(db: dict[str, str], n: int, seed: int = 1) -> dict[str, list[str]]:
+    rng = np.random.default_rng(seed)
+    entries = list(db.items())
+    picks = [entries[i] for i in rng.integers(0, len(entries), size=n)]
+    prefix, substring, typos = [], [], []
+    for sym, name in picks:
+        source = sym if rng.random() < 0.5 else name
+        prefix.append(source[:int(rng.integers(1, 4))])
+        k = int(rng.integers(3, 7))
+        lo = int(rng.integers(1, max(len(name) - k, 2)))
+        substring.append(name[lo:lo + k])
+        word = sym.split(".")[0] if rng.random() < 0.5 or len(sym) > 3 else str(rng.choice(name.split()))
+        typos.append(typo(word.upper(), rng) if len(word) > 1 else word + "X")
+    return {"prefix": prefix, "substring": substring, "typo": typos}
+
+
+def linear_search(db: dict[str, str], query: str, limit: int = 12) -> list[tuple[str, str]]:
+    # The pre-index search: one pass over every entry, upper-casing as it goes.
+    q = query.upper().strip()
+    exact, starts, contains = [], [], []
+    for sym, name in db.items():
+        s, n = sym.upper(), name.upper()
+        if s == q:
+            exact.append((sym, name))
+        elif s.startswith(q) or n.startswith(q):
+            starts.append((sym, name))
+        elif q in s or q in n:
+            contains.append((sym, name))
+    return (exact + starts + contains)[:limit]
+
+
+def time_lookups(fn, queries: list[str]) -> np.ndarray:
+    out = np.empty(len(queries))
+    for i, q in enumerate(queries):
+        t0 = time.perf_counter()
+        fn(q)
+        out[i] = (time.perf_counter() - t0) * 1e3
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--target-ms", type=float, default=LOOKUP_TARGET_MS, help="p50 budget per lookup")
+    args = parser.parse_args(argv)
+
+    db = synthetic_listing(args.symbols)
+    t0 = time.perf_counter()
+    index = TickerIndex(db)
+    build_ms = (time.perf_counter() - t0) * 1e3
+    queries = make_queries(db, args.queries)
+    print(f"{len(db):,} symbols, index built in {build_ms:,.0f} ms, {args.queries:,} queries per kind\n")
+
+    lookups = {"prefix": index.search, "substring": index.search, "typo": index.suggest}
+    print(f"{'kind':<10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    ok = True
+    for kind, fn in lookups.items():
+        fn(queries[kind][0])  # warm-up
+        ms = time_lookups(fn, queries[kind])
+        p50, p99 = np.percentile(ms, [50, 99])
+        ok &= p50 < args.target_ms
+        print(f"{kind:<10}{p50:>9.3f}{p99:>9.3f}{ms.max():>9.3f}")
+
+    scan = time_lookups(lambda q: linear_search(db, q), queries["prefix"][:50])
+    print(f"\nlinear scan (prefix queries): p50 {np.median(scan):.2f} ms")
+    print(f"search latency: {'ok' if ok else 'FAILED'} (p50 target {args.target_ms:g} ms)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Multi-session memory load test for the shared market cache (Linux only).
+
+Prices and asset metadata come from a store pre-filled offline with
+SyntheticPriceProvider / SyntheticInfoProvider, so nothing touches the
+network. Two parts:
+
+    sessions   one fresh interpreter keeps --sessions AppTest sessions open
+               at once, each running a simulation over the same universe.
+               After every session it records the process's private
+               (RssAnon) and file-backed (RssFile) resident memory and, from
+               INVEST_PROFILE_LOG, how the run's market lookup was served.
+               Reported: MB added per session past the first, and how many
+               close matrices were loaded (1 when sessions share one).
+    processes  --workers processes open that universe through
+               SharedMarketCache on the same store at the same time, touch
+               every page and read their mapping of the matrix file from
+               /proc/self/smaps. Pss ~ Rss / workers means the pages are
+               shared between processes rather than copied into each.
+
+Exit code 1 when the per-session slope exceeds --budget-mb, the sessions
+loaded more than one matrix, the workers didn't share pages, or a run raised.
+
+    python benchmarks/bench_sessions.py [--sessions 16] [--workers 4] [--budget-mb 4]
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from invest_engine import (  # noqa: E402
+    TICKER_DB, USDILS_TICKER, MetadataStore, PriceStore, SharedMarketCache, SyntheticInfoProvider, SyntheticPriceProvider,
+)
+
+UNIVERSE = sorted(a for a in TICKER_DB if a.isalpha())[:20]
+START_YEAR = 1995
+SESSION_BUDGET_MB = 4.0
+
+SAMPLE = r"""
+import gc, json, sys
+from streamlit.testing.v1 import AppTest
+
+def memory():
+    status = dict(line.split(":", 1) for line in open("/proc/self/status"))
+    return {k: int(status[k].split()[0]) / 1024 for k in ("RssAnon", "RssFile")}
+
+app, n_sessions, universe, start_year = sys.argv[1], int(sys.argv[2]), json.loads(sys.argv[3]), int(sys.argv[4])
+sessions = []
+for i in range(n_sessions):
+    at = AppTest.from_file(app, default_timeout=300)
+    at.run()
+    at.number_input(key="start_year").set_value(start_year).run()
+    at.multiselect(key="assets_0").set_value(universe).run()
+    next(b for b in at.button if "הפעל סימולציה" in b.label).click().run()
+    sessions.append(at)
+    gc.collect()
+    print(json.dumps({"session": i + 1, "errors": len(at.exception), **memory()}), flush=True)
+"""
+
+
+def fill_store(tmp: str) -> tuple[str, str]:
+    prices, metadata = os.path.join(tmp, "prices"), os.path.join(tmp, "metadata.json")
+    PriceStore(prices, SyntheticPriceProvider()).refresh(UNIVERSE + [USDILS_TICKER], pd.Timestamp.today().normalize())
+    MetadataStore(metadata, SyntheticInfoProvider()).prefetch(UNIVERSE)
+    return prices, metadata
+
+
+def run_sessions(tmp: str, prices: str, metadata: str, n_sessions: int) -> tuple[list[dict], dict]:
+    log = os.path.join(tmp, "profile.jsonl")
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "INVEST_PROFILE_LOG": log,
+        "INVEST_PREWARM": "0",
+        "PRICE_STORE_DIR": prices,
+        "METADATA_PATH": metadata,
+    }
+    proc = subprocess.run(
+        [sys.executable, "-c", SAMPLE, str(ROOT / "investment_app.py"), str(n_sessions), json.dumps(UNIVERSE), str(START_YEAR)],
+        env=env, cwd=tmp, capture_output=True, text=True, check=True,
+    )
+    samples = [json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{")]
+    with open(log, encoding="utf-8") as fh:
+        counters = [r for r in map(json.loads, fh) if r["kind"] == "counters"]
+    lookups = {k: sum(r.get(f"market_cache_{k}", 0) for r in counters) for k in ("hit", "miss")}
+    return samples, lookups
+
+
+def map_worker(prices: str, barrier, out):
+    # Opens the matrix like a fresh app process would, pulls every page in,
+    # waits until all workers hold it, then reads its own mapping stats.
+    store = PriceStore(prices, SyntheticPriceProvider())
+    cache = SharedMarketCache(store)
+    market = cache.market(UNIVERSE, f"{START_YEAR}-01-01", pd.Timestamp.today().strftime("%Y-%m-%d"))
+    float(np.asarray(market.closes, dtype=np.float64).sum())
+    barrier.wait()
+    mapping, stats = None, {}
+    with open("/proc/self/smaps") as fh:
+        for line in fh:
+            fields = line.split()
+            if not fields[0].endswith(":"):  # a mapping header: range, perms, offset, dev, inode[, path]
+                mapping = fields[5] if len(fields) > 5 else None
+            elif mapping and "/markets/" in mapping and mapping.endswith(".close.npy") and fields[0] in ("Rss:", "Pss:"):
+                stats[fields[0][:-1]] = stats.get(fields[0][:-1], 0) + int(fields[1])
+    barrier.wait()
+    out.put({"pid": os.getpid(), "builds": cache.builds, "matrix_kb": market.closes.nbytes / 1024, **stats})
+
+
+def run_processes(prices: str, workers: int) -> list[dict]:
+    ctx = mp.get_context("spawn")
+    barrier, out = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=map_worker, args=(prices, barrier, out)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    results = [out.get(timeout=300) for _ in procs]
+    for p in procs:
+        p.join()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--budget-mb", type=float, default=SESSION_BUDGET_MB, help="private MB allowed per added session")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench_sessions_") as tmp:
+        prices, metadata = fill_store(tmp)
+        samples, lookups = run_sessions(tmp, prices, metadata, args.sessions)
+        print(f"{'sessions':>9}{'private MB':>12}{'file MB':>10}")
+        for s in samples:
+            print(f"{s['session']:>9}{s['RssAnon']:>12.1f}{s['RssFile']:>10.1f}")
+        tail = samples[1:] or samples
+        slope = np.polyfit([s["session"] for s in tail], [s["RssAnon"] for s in tail], 1)[0] if len(tail) > 1 else 0.0
+        print(f"\nprivate memory per added session: {slope:.2f} MB (budget {args.budget_mb:.1f} MB)")
+        print(f"market lookups: {lookups['miss']} loaded, {lookups['hit']} served from the shared cache")
+
+        # Built once up front, as the first app process would; every worker
+        # then maps that same file.
+        SharedMarketCache(PriceStore(prices, SyntheticPriceProvider())).market(
+            UNIVERSE, f"{START_YEAR}-01-01", pd.Timestamp.today().strftime("%Y-%m-%d"),
+        )
+        workers = run_processes(prices, args.workers) if args.workers > 1 else []
+        for w in workers:
+            print(f"worker {w['pid']}: matrix {w['matrix_kb']:.0f} KB, resident {w.get('Rss', 0)} KB, proportional share {w.get('Pss', 0)} KB")
+
+    errors = sum(s["errors"] for s in samples)
+    # Pss splits each resident page between the processes mapping it.
+    shared = all(0 < w.get("Pss", 0) < w.get("Rss", 0) for w in workers)
+    ok = slope <= args.budget_mb and lookups["miss"] <= 1 and shared and not errors
+    print(f"\nload test: {'ok' if ok else 'FAILED'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""Simulation and data-path benchmark suite, offline and deterministic.
+
+Prices come from SyntheticPriceProvider with a fixed date range, so every
+run sees identical data and never touches the network. Simulation cases
+cover 1/10/50 assets × 5/30/60-year horizons × the four rebalance modes ×
+accumulation/withdrawal × USD/ILS (ILS through a synthetic USDILS FxSeries,
+so every date converts at its own rate); Monte Carlo cases project a 10-asset
+portfolio 10 years past the fixture with the bootstrap and correlated-normal
+samplers at 1k/5k/10k paths; data-path cases cover the on-disk price store
+(cold fetch and warm read) and the return alignment.
+
+Each case reports wall time (median of --repeat samples after a warm-up;
+a sample loops a short case until it spans MIN_SAMPLE_MS; Monte Carlo cases
+take at most MC_REPEAT samples), the samples' spread, peak traced memory and
+throughput (simulations, paths or rows per second).
+
+A calibration case (fixed numpy and interpreter work, no invest_engine
+code) is sampled before, between the cases of, and after the suite; its
+median is the machine's speed over the run. Results are compared against a
+stored baseline (default benchmarks/baseline.json) as ratios normalized to
+the calibration, so a slower or busier machine scales the baseline rather
+than flagging every case. A case regresses when its normalized ratio
+exceeds --threshold and the slowdown exceeds both --min-delta-ms and
+NOISE_SPREADS × its spread. Flagged cases are measured again after the
+suite and only a case slow both times counts; the exit code is 1 when any
+case regressed.
+
+    python benchmarks/bench_simulation.py                 # compare to baseline
+    python benchmarks/bench_simulation.py --save-baseline # record a new one
+    python benchmarks/bench_simulation.py --quick --filter assets=10
+"""
+
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine import (  # noqa: E402
+    USDILS_TICKER, FxSeries, PriceStore, SyntheticPriceProvider, market_from_closes, run_asset_monte_carlo,
+    simulate_portfolio, simulation_window,
+)
+
+FIXTURE_FIRST = "1960-01-04"
+FIXTURE_LAST = "2025-12-31"
+LAST_YEAR = 2025
+ILS_LAST_RATE = 3.7
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+ASSET_COUNTS = (1, 10, 50)
+HORIZONS = (5, 30, 60)
+REBALANCE_MODES = {"none": None, "monthly": "ME", "quarterly": "QE", "yearly": "YE"}
+PHASES = ("accumulation", "withdrawal")
+CURRENCIES = ("USD", "ILS")
+MC_SAMPLERS = ("bootstrap", "normal")
+MC_PATH_COUNTS = (1_000, 5_000, 10_000)
+MC_ASSETS = 10
+MC_YEARS = 10
+MC_REPEAT = 3
+MIN_SAMPLE_MS = 20.0
+NOISE_SPREADS = 3.0
+CALIBRATION = "calibration"
+CALIBRATION_REPEAT = 15
+
+
+def fixture_provider() -> SyntheticPriceProvider:
+    return SyntheticPriceProvider(first_date=FIXTURE_FIRST, last_date=FIXTURE_LAST)
+
+
+def fixture_tickers(n: int) -> list[str]:
+    return [f"SYN{i:02d}" for i in range(n)]
+
+
+def fixture_market(n_assets: int):
+    provider = fixture_provider()
+    tickers = fixture_tickers(n_assets)
+    return market_from_closes(pd.DataFrame({t: provider.series(t) for t in tickers}))
+
+
+def fixture_fx() -> FxSeries:
+    # A deterministic USDILS history over the fixture, ending at ILS_LAST_RATE.
+    rates = SyntheticPriceProvider(FIXTURE_FIRST, FIXTURE_LAST, drift=0.0, vol=0.005).series(USDILS_TICKER)
+    return FxSeries(rates.index, rates.to_numpy() * (ILS_LAST_RATE / rates.iloc[-1]))
+
+
+def measure(fn, repeat: int) -> dict:
+    # A timed warm-up run sizes the samples: a case shorter than
+    # MIN_SAMPLE_MS runs in a loop per sample, so timer resolution and
+    # one-off stalls average out. Longer cases keep the warm-up as their
+    # first sample. Reports the median per-call time and the spread
+    # (median absolute deviation), then one extra traced run for the peak
+    # memory (tracemalloc slows the code, so it is not timed).
+    t0 = time.perf_counter()
+    fn()
+    first = time.perf_counter() - t0
+    loops = max(1, int(np.ceil(MIN_SAMPLE_MS / 1e3 / max(first, 1e-9))))
+    times = [first] if loops == 1 else []
+    while len(times) < repeat:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - t0) / loops)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    med = statistics.median(times)
+    return {
+        "wall_ms": med * 1e3,
+        "spread_ms": statistics.median(abs(t - med) for t in times) * 1e3,
+        "peak_mb": peak / 2**20,
+    }
+
+
+def calibration_run(
+    matrix: np.ndarray = np.random.default_rng(0).normal(0.0, 0.01, (2_520, 50)),
+    out: np.ndarray = np.empty((2_520, 50)),
+):
+    # Work shaped like a simulation's (array passes over a years × assets
+    # matrix plus interpreter-bound bookkeeping) that never changes with the
+    # code under test, so its time measures only the machine and its load.
+    # It writes into a preallocated buffer: fresh megabyte arrays would time
+    # the allocator's state, which depends on what ran before.
+    for _ in range(10):
+        np.add(matrix, 1.0, out=out)
+        np.cumprod(out, axis=0, out=out)
+    total = 0.0
+    for i in range(100_000):
+        total += i * 0.5
+    return total
+
+
+def calibration_sample() -> float:
+    t0 = time.perf_counter()
+    calibration_run()
+    return (time.perf_counter() - t0) * 1e3
+
+
+def simulation_cases(quick: bool):
+    counts = ASSET_COUNTS[:2] if quick else ASSET_COUNTS
+    horizons = HORIZONS[:2] if quick else HORIZONS
+    modes = ("none", "quarterly") if quick else tuple(REBALANCE_MODES)
+    currencies = CURRENCIES[:1] if quick else CURRENCIES
+    yield from itertools.product(counts, horizons, modes, PHASES, currencies)
+
+
+def run_simulation_case(markets: dict, n_assets: int, horizon: int, mode: str, phase: str, currency: str, repeat: int) -> dict:
+    tickers = fixture_tickers(n_assets)
+    port_cfg = {
+        "assets": tickers,
+        "weights": {t: 100.0 / n_assets for t in tickers},
+        "withdrawal_rate": 4.0 if phase == "withdrawal" else 0.0,
+        "withdrawal_month": 1,
+    }
+    start_y, end_y = LAST_YEAR - horizon + 1, LAST_YEAR
+    _, _, dl_start, hist_end = simulation_window(start_y, end_y)
+    # Amounts are in the case's currency; ILS runs convert every cash flow
+    # and value at its own date's rate, as the app does.
+    fx = markets["fx"] if currency == "ILS" else None
+    initial, monthly = 100_000.0, (0.0 if phase == "withdrawal" else 1_000.0)
+
+    def run():
+        # A fresh window per run, as every app rerun loads a fresh MarketData,
+        # so the return alignment is part of the timed work.
+        market = markets[n_assets].window(dl_start, hist_end)
+        return simulate_portfolio(port_cfg, market, initial, monthly, start_y, end_y, REBALANCE_MODES[mode], fx=fx)
+
+    result = measure(run, repeat)
+    result["sims_per_sec"] = 1e3 / result["wall_ms"] if result["wall_ms"] > 0 else float("inf")
+    return result
+
+
+def run_monte_carlo_cases(markets: dict, repeat: int, quick: bool, selected=lambda name: True):
+    # The projection alone, from the fixture's last day: historical returns
+    # in, percentile bands out, with contributions, a 4% withdrawal, tax
+    # lots and yearly rebalancing on every path. Yields (name, result) as
+    # each case finishes; cases `selected` rejects aren't run.
+    tickers = fixture_tickers(MC_ASSETS)
+    history = markets[MC_ASSETS].returns(tickers).to_numpy()
+    weights = np.full(MC_ASSETS, 1.0 / MC_ASSETS)
+    last = pd.Timestamp(FIXTURE_LAST)
+    future = pd.bdate_range(last + pd.Timedelta(days=1), f"{LAST_YEAR + MC_YEARS}-12-31")
+    for method, n_paths in itertools.product(MC_SAMPLERS, MC_PATH_COUNTS[:2] if quick else MC_PATH_COUNTS):
+        name = f"mc/{method}/assets={MC_ASSETS}/years={MC_YEARS}/paths={n_paths}"
+        if not selected(name):
+            continue
+
+        def run():
+            run_asset_monte_carlo(
+                history, weights, "YE", future, 100_000.0 * weights, 100_000.0, 1_000.0, 4.0, 1, 0.25,
+                n_paths=n_paths, seed=42, method=method, prev_date=last,
+            )
+
+        r = measure(run, min(repeat, MC_REPEAT))
+        r["paths_per_sec"] = n_paths / (r["wall_ms"] / 1e3) if r["wall_ms"] > 0 else float("inf")
+        yield name, r
+
+
+def run_data_cases(repeat: int, quick: bool) -> dict:
+    results = {}
+    counts = ASSET_COUNTS[:2] if quick else ASSET_COUNTS
+    start, end = f"{LAST_YEAR - 29}-01-01", f"{LAST_YEAR}-12-31"
+    for n in counts:
+        tickers = tuple(fixture_tickers(n))
+
+        def cold():
+            with tempfile.TemporaryDirectory(prefix="bench_store_") as root:
+                PriceStore(root, fixture_provider()).load(tickers, start, end)
+
+        with tempfile.TemporaryDirectory(prefix="bench_store_") as warm_root:
+            closes, _ = PriceStore(warm_root, fixture_provider()).load(tickers, start, end)
+
+            def warm():
+                PriceStore(warm_root, fixture_provider()).load(tickers, start, end)
+
+            def align():
+                market_from_closes(closes).returns(list(tickers))
+
+            for name, fn in (("store_cold", cold), ("store_warm", warm), ("align_returns", align)):
+                r = measure(fn, repeat)
+                r["rows_per_sec"] = len(closes) * n / (r["wall_ms"] / 1e3) if r["wall_ms"] > 0 else float("inf")
+                results[f"data/{name}/assets={n}"] = r
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    # The baseline is rescaled by the calibration ratio (this machine and
+    # load against the baseline's), and a slowdown against that expected
+    # time must also clear the noise: min_delta_ms in absolute terms and
+    # NOISE_SPREADS × the spread of this run's samples.
+    scale = 1.0
+    if CALIBRATION in results and CALIBRATION in baseline:
+        scale = results[CALIBRATION]["wall_ms"] / baseline[CALIBRATION]["wall_ms"]
+    regressions = []
+    print(f"\ncalibration: {scale:.2f}× the baseline machine; ratios below are normalized to it")
+    print(f"{'case':<58}{'ms':>10}{'base ms':>10}{'ratio':>8}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if name == CALIBRATION:
+            continue
+        if base is None:
+            print(f"{name:<58}{r['wall_ms']:>10.2f}{'—':>10}{'new':>8}")
+            continue
+        expected = base["wall_ms"] * scale
+        ratio = r["wall_ms"] / expected if expected > 0 else 1.0
+        floor = max(min_delta_ms, NOISE_SPREADS * r.get("spread_ms", 0.0))
+        regressed = ratio > threshold and r["wall_ms"] - expected > floor
+        print(f"{name:<58}{r['wall_ms']:>10.2f}{base['wall_ms']:>10.2f}{ratio:>8.2f}{'  ← regression' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def run_suite(markets: dict, args, selected, calibration: list | None = None) -> dict:
+    # Runs the selected cases, printing each as it finishes; with a
+    # `calibration` list, a calibration sample is appended after every case.
+    results = {}
+
+    def done(name, r):
+        results[name] = r
+        if calibration is not None:
+            calibration.append(calibration_sample())
+
+    print(f"{'case':<58}{'ms':>10}{'peak MB':>10}{'sims/s':>10}")
+    for n, h, mode, phase, cur in simulation_cases(args.quick):
+        name = f"sim/assets={n}/years={h}/rebalance={mode}/{phase}/{cur}"
+        if not selected(name):
+            continue
+        r = run_simulation_case(markets, n, h, mode, phase, cur, args.repeat)
+        done(name, r)
+        print(f"{name:<58}{r['wall_ms']:>10.2f}{r['peak_mb']:>10.1f}{r['sims_per_sec']:>10.1f}")
+    for i, (name, r) in enumerate(run_monte_carlo_cases(markets, args.repeat, args.quick, selected)):
+        if i == 0:
+            print(f"\n{'case':<58}{'ms':>10}{'peak MB':>10}{'paths/s':>10}")
+        done(name, r)
+        print(f"{name:<58}{r['wall_ms']:>10.2f}{r['peak_mb']:>10.1f}{r['paths_per_sec']:>10.0f}")
+    data_names = [f"data/{kind}/assets={n}" for n in ASSET_COUNTS for kind in ("store_cold", "store_warm", "align_returns")]
+    if any(map(selected, data_names)):
+        for name, r in run_data_cases(args.repeat, args.quick).items():
+            if not selected(name):
+                continue
+            done(name, r)
+            print(f"{name:<58}{r['wall_ms']:>10.2f}{r['peak_mb']:>10.1f}{'':>10}")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="a reduced grid for a fast check")
+    parser.add_argument("--filter", default="", help="only cases whose name contains this text")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args(argv)
+
+    markets = {n: fixture_market(n) for n in (ASSET_COUNTS[:2] if args.quick else ASSET_COUNTS)}
+    markets["fx"] = fixture_fx()
+    calibration_run()
+    calibration = [calibration_sample() for _ in range(CALIBRATION_REPEAT)]
+    results = run_suite(markets, args, lambda name: args.filter in name, calibration)
+    calibration += [calibration_sample() for _ in range(CALIBRATION_REPEAT)]
+    med = statistics.median(calibration)
+    results[CALIBRATION] = {"wall_ms": med, "spread_ms": statistics.median(abs(t - med) for t in calibration)}
+    print(f"{CALIBRATION:<58}{med:>10.2f}  ({len(calibration)} samples, spread {results[CALIBRATION]['spread_ms']:.2f} ms)")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=1))
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        baseline.update({name: {k: round(v, 4) for k, v in r.items()} for name, r in results.items()})
+        baseline_path.write_text(json.dumps(baseline, indent=1, sort_keys=True) + "\n")
+        print(f"\nbaseline written: {baseline_path} ({len(results)} cases)")
+        return 0
+    if not baseline_path.exists():
+        print(f"\nno baseline at {baseline_path}; run with --save-baseline to record one")
+        return 0
+    baseline = json.loads(baseline_path.read_text())
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if regressions:
+        # Load on a shared machine comes in bursts longer than a case, so a
+        # flagged case gets a second measurement and keeps its faster one.
+        print(f"\nrechecking {len(regressions)} case(s)")
+        flagged = set(regressions)
+        for name, r in run_suite(markets, args, flagged.__contains__).items():
+            results[name] = min(results[name], r, key=lambda x: x["wall_ms"])
+        recheck = {name: results[name] for name in regressions}
+        recheck[CALIBRATION] = results[CALIBRATION]
+        regressions = compare(recheck, baseline, args.threshold, args.min_delta_ms)
+    print(f"\n{len(regressions)} regression(s) over {args.threshold:.2f}× baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
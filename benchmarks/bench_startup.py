@@ -0,0 +1,117 @@
+"""Cold-start benchmark for the Streamlit app.
+
+Every sample is a fresh interpreter that imports streamlit, pandas and numpy
+and runs the script once through streamlit's AppTest (no browser, no
+network: the first paint needs neither). Reported per sample:
+
+    import_ms   importing streamlit, pandas and numpy (streamlit itself
+                imports plotly.graph_objects)
+    run_ms      AppTest's first run: the app's own imports (invest_engine),
+                the script and streamlit's session setup
+    harness_ms  an AppTest run of an empty script in the same interpreter:
+                what every run pays before the app's first line, mostly
+                streamlit scanning installed packages for components
+    app_ms      run_ms - harness_ms, the cold-start figure we budget
+    script_ms   the script after its imports, from its INVEST_PROFILE_LOG record
+    yfinance    whether the first paint imported yfinance (it should not)
+
+An empty-script run before the app's pays the interpreter's one-time
+streamlit setup, as a server does before its first session. The background
+prewarm is off by default so it does not compete with the measured run;
+--prewarm turns it on. Exit code 1 when the median app_ms misses
+--target-ms, the first paint imported yfinance or the run raised.
+
+    python benchmarks/bench_startup.py [--runs 5] [--target-ms 750]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+COLD_START_TARGET_MS = 750.0
+
+SAMPLE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import streamlit, pandas, numpy
+t1 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+
+def timed_run(path):
+    at = AppTest.from_file(path, default_timeout=120)
+    t = time.perf_counter()
+    at.run()
+    return at, (time.perf_counter() - t) * 1e3
+
+timed_run(sys.argv[2])
+at, run_ms = timed_run(sys.argv[1])
+yfinance = "yfinance" in sys.modules
+_, harness_ms = timed_run(sys.argv[2])
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1e3,
+    "run_ms": run_ms,
+    "harness_ms": harness_ms,
+    "yfinance": yfinance,
+    "errors": len(at.exception),
+}))
+"""
+
+
+def sample(prewarm: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as tmp:
+        log = os.path.join(tmp, "profile.jsonl")
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "INVEST_PROFILE_LOG": log,
+            "INVEST_PREWARM": "1" if prewarm else "0",
+            "PRICE_STORE_DIR": os.path.join(tmp, "prices"),
+            "METADATA_PATH": os.path.join(tmp, "metadata.json"),
+        }
+        empty = os.path.join(tmp, "empty_app.py")
+        with open(empty, "w", encoding="utf-8") as fh:
+            fh.write("import streamlit as st\n")
+        proc = subprocess.run(
+            [sys.executable, "-c", SAMPLE, str(ROOT / "investment_app.py"), empty],
+            env=env, cwd=tmp, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        with open(log, encoding="utf-8") as fh:
+            counters = [r for r in map(json.loads, fh) if r["kind"] == "counters"]
+        result["script_ms"] = counters[0]["wall_ms"]
+        result["app_ms"] = result["run_ms"] - result["harness_ms"]
+        return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=COLD_START_TARGET_MS, help="median app_ms budget")
+    parser.add_argument("--prewarm", action="store_true", help="leave the background prewarm on")
+    args = parser.parse_args(argv)
+
+    samples = []
+    columns = ("import_ms", "run_ms", "harness_ms", "app_ms", "script_ms")
+    print(f"{'run':>4}" + "".join(f"{c.replace('_', ' '):>12}" for c in columns) + "  yfinance")
+    for i in range(args.runs):
+        s = sample(args.prewarm)
+        samples.append(s)
+        print(f"{i + 1:>4}" + "".join(f"{s[c]:>12.0f}" for c in columns) + f"  {s['yfinance']}")
+
+    med = {c: statistics.median(s[c] for s in samples) for c in columns}
+    print(f"{'med':>4}" + "".join(f"{med[c]:>12.0f}" for c in columns))
+    # With the prewarm on, its thread imports yfinance while the sample runs.
+    lazy = args.prewarm or not any(s["yfinance"] for s in samples)
+    ok = med["app_ms"] <= args.target_ms and lazy and not any(s["errors"] for s in samples)
+    print(f"\nfirst paint {med['app_ms']:.0f} ms vs target {args.target_ms:.0f} ms: {'ok' if ok else 'MISSED'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""Headless portfolio simulation engine.
+
+Everything the Streamlit app computes lives here, importable without
+Streamlit: a portfolio config and a :class:`MarketData` go in, a daily value
+series and a stats dict come out. ``python -m invest_engine`` runs batches of
+scenarios from a JSON/YAML file.
+"""
+
+from .barcache import BAR_TTLS, INTRADAY_PERIODS, REVALIDATE_WORKERS, BarCache, last_sessions
+from .batch import RANK_ASCENDING, RANK_METRICS, compare_portfolios, run_batch_engine
+from .cache import MONEY_STATS, SIM_CACHE_SIZE, LRUCache, scale_result, simulation_key
+from .cohorts import backtest_cohorts, monthly_growth, rolling_cohorts
+from .downsample import CHART_MAX_POINTS, downsample_indices, downsample_series, lttb_indices, minmax_indices
+from .engine import (
+    BOOTSTRAP_BLOCK_DAYS, DEPLETION_FRACTION, MC_METHODS, MC_PERCENTILES, REBALANCE_STEP_MONTHS,
+    ReturnSampler, month_boundaries, projection_segments, run_asset_monte_carlo, run_holdings_engine,
+    run_monte_carlo, scenario_returns, simulate_portfolio,
+)
+from .fx import MINOR_CURRENCIES, USDILS_TICKER, FxSeries, fx_ticker, load_fx, major_currency
+from .goalseek import (
+    GOAL_MAX_RATE, GOAL_PATHS, GOAL_RATE_TOLERANCE, GoalPaths, goal_paths, solve_deposit, solve_withdrawal_rate,
+)
+from .lots import COST_METHODS, LotBook, lot_time, taxable_gain
+from .market import MarketData, closes_in_usd, load_market_data, market_from_closes, simulation_window
+from .metadata import (
+    METADATA_FIELDS, METADATA_LOOKUP_TIMEOUT, METADATA_MISSING_TTL, METADATA_PATH, METADATA_TTL,
+    MetadataStore, SyntheticInfoProvider, YFinanceInfoProvider, presumed_usd,
+)
+from .metrics import RunningMetrics, series_metrics
+from .optimizer import TRADING_DAYS, annualized_moments, critical_line, efficient_frontier
+from .profiling import RunProfile, activate, count, current_profile, deactivate, profiled, stage
+from .shared import MARKET_CACHE_SIZE, MARKET_FILE_MAX_AGE, SharedMarketCache
+from .store import (
+    FETCH_BACKOFF, FETCH_RETRIES, FETCH_TIMEOUT, FETCH_WORKERS, PRICE_STORE_DIR,
+    PriceStore, SyntheticPriceProvider, TickerNotFound, YFinanceProvider,
+    fetch_concurrently, fetch_with_retry,
+)
+from .sweep import expand_grid, ruin_table, run_sweep, sweep_window
+from .tickers import TICKER_DB, TickerIndex
@@ -0,0 +1,135 @@
+"""Stale-while-revalidate price cache for the research views."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .profiling import count
+
+INTRADAY_PERIODS = {"1d": "5m", "5d": "60m"}  # period -> bar interval
+BAR_TTLS = {"5m": 60.0, "60m": 15 * 60.0, "1d": 6 * 3600.0}
+REVALIDATE_WORKERS = 2
+
+
+def last_sessions(bars: pd.Series, sessions: int) -> pd.Series:
+    if bars.empty:
+        return bars
+    days = bars.index.normalize()
+    return bars[days >= days.unique()[-sessions:][0]]
+
+
+class BarCache:
+    # Every read is served at once from what is cached, whatever its age;
+    # an entry older than its interval's TTL is also queued for a background
+    # refresh (one in flight per key), so a later read sees the new bars.
+    # Only a cold key blocks. Refreshes append: intraday bars are fetched
+    # from the last cached bar on (it may still have been forming), daily
+    # history goes through the PriceStore, which only fetches the tail. A
+    # daily window ending before today that the store already covers is
+    # closed and never revalidated.
+    def __init__(self, store, provider=None, ttls: dict[str, float] | None = None, workers: int = REVALIDATE_WORKERS):
+        self.store = store
+        self.provider = provider or store.provider
+        self.ttls = {**BAR_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self._entries = {}
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="price-revalidate")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses,
+                "refreshes": self.refreshes, "refresh_failures": self.refresh_failures,
+                "inflight": len(self._inflight), "entries": len(self._entries),
+            }
+
+    def _serve(self, key, ttl: float, load, refresh):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                stale = time.time() - entry[1] >= ttl
+                if stale:
+                    self.stale_hits += 1
+                else:
+                    self.hits += 1
+                revalidate = stale and key not in self._inflight
+                if revalidate:
+                    self._inflight.add(key)
+        if entry is None:
+            count("bar_cache_miss")
+            value = load()
+            with self._lock:
+                self._entries[key] = (value, time.time())
+            return value
+        count("bar_cache_stale" if stale else "bar_cache_hit")
+        if revalidate:
+            self._pool.submit(self._revalidate, key, refresh, entry[0])
+        return entry[0]
+
+    def _revalidate(self, key, refresh, old):
+        # A failed refresh keeps the old value but restamps it, so the next
+        # attempt waits another TTL instead of firing on every read.
+        try:
+            value, failed = refresh(old), False
+        except Exception:
+            value, failed = old, True
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._inflight.discard(key)
+            if failed:
+                self.refresh_failures += 1
+            else:
+                self.refreshes += 1
+
+    def intraday(self, ticker: str, period: str) -> pd.Series:
+        interval = INTRADAY_PERIODS[period]
+        sessions = int(period[:-1])
+
+        def load():
+            return last_sessions(self.provider.fetch_bars(ticker, interval, period=period), sessions)
+
+        def refresh(old: pd.Series) -> pd.Series:
+            if old.empty:
+                return load()
+            new = self.provider.fetch_bars(ticker, interval, start=old.index[-1])
+            if new.empty:
+                return old
+            return last_sessions(pd.concat([old[old.index < new.index[0]], new]), sessions)
+
+        return self._serve((ticker, interval), self.ttls[interval], load, refresh)
+
+    def daily(self, ticker: str, start, end=None) -> pd.Series:
+        today = pd.Timestamp.today().normalize()
+        end = pd.Timestamp(end) if end is not None else today + pd.Timedelta(days=1)
+        until = min(end, today)
+
+        def read() -> pd.Series:
+            dates, closes = self.store.window(ticker, start, end)
+            return pd.Series(closes, index=pd.DatetimeIndex(dates), dtype=float)
+
+        series = read()
+        if end <= today and len(series) and series.index[-1] >= until - pd.offsets.BDay(1):
+            with self._lock:
+                self.hits += 1
+            count("bar_cache_hit")
+            return series
+
+        def sync(_=None):
+            # The store has the bars; the entry only records when they were
+            # last brought up to date. Transient failures aren't cached.
+            reason = self.store.refresh([ticker], until).get(ticker)
+            if reason is not None and reason != "not found":
+                raise ConnectionError(f"{ticker}: {reason}")
+
+        self._serve((ticker, "1d"), self.ttls["1d"], sync, sync)
+        return read()
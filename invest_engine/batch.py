@@ -0,0 +1,176 @@
+"""Batched comparison of many portfolios, one return matrix per asset list."""
+
+import numpy as np
+import pandas as pd
+
+from .engine import REBALANCE_STEP_MONTHS, month_boundaries, scenario_returns
+from .lots import LotBook, lot_time
+from .metrics import series_metrics
+
+RANK_METRICS = ("end_val", "net_profit", "cagr", "sharpe", "sortino", "calmar", "max_dd", "ann_vol", "ulcer_index")
+RANK_ASCENDING = {"ann_vol", "ulcer_index"}  # lower is better; max_dd is negative, so higher is better
+
+
+def run_batch_engine(
+    asset_returns: np.ndarray,
+    index: pd.DatetimeIndex,
+    weights: np.ndarray,
+    rebalance: str | None,
+    initial: float,
+    monthly_contribution: float | np.ndarray,
+    withdrawal_rates: np.ndarray,
+    withdrawal_months: np.ndarray,
+    tax_rate: float,
+    fx: np.ndarray | None = None,
+    cost_method: str = "average",
+    inflation: float = 0.0,
+) -> tuple[np.ndarray, dict]:
+    # run_holdings_engine for a (portfolios × assets) weight matrix at once.
+    # Within a month every asset compounds the same way whatever portfolio
+    # holds it, so a month's daily values are one (days × assets) @ (assets
+    # × portfolios) product of the month's relative growth and the holdings;
+    # contributions (one amount, or one per portfolio), withdrawals (each
+    # portfolio with its own rate and month), rebalancing and tax lots (one
+    # LotBook row per portfolio) are vectorized over portfolios. Returns
+    # (days × portfolios) values and per-portfolio flow arrays.
+    growth = 1.0 + np.asarray(asset_returns, dtype=float).reshape(len(index), -1)
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    n, n_ports = len(growth), len(weights)
+    values = np.empty((n, n_ports), dtype=float)
+    if n == 0:
+        return values, {}
+    fx = np.ones(n) if fx is None else np.asarray(fx, dtype=float)
+    monthly = np.broadcast_to(np.asarray(monthly_contribution, dtype=float), (n_ports,))
+    contributes = bool((monthly > 0).any())
+    wd_frac = np.minimum(np.asarray(withdrawal_rates, dtype=float) / 100.0, 1.0)
+    withdrawal_months = np.asarray(withdrawal_months)
+
+    bounds = month_boundaries(index)
+    seg_starts = np.concatenate(([0], bounds))
+    seg_ends = np.concatenate((bounds, [n]))
+    months = index.month.to_numpy()
+    step = REBALANCE_STEP_MONTHS.get(rebalance)
+
+    times = lot_time(index)
+    holdings = float(initial) / fx[0] * weights
+    lots = LotBook(n_ports, len(seg_starts), cost_method, inflation)
+    lots.add(float(initial), float(initial), times[0])
+    total_invested = np.full(n_ports, float(initial))
+    withdrawn_gross = np.zeros(n_ports)
+    tax_paid = np.zeros(n_ports)
+    realized = np.zeros(n_ports)
+    rebalance_count = np.zeros(n_ports, dtype=int)
+    turnover_sum = np.zeros(n_ports)
+
+    for s, e in zip(seg_starts, seg_ends):
+        holdings = holdings * growth[s]
+        if s > 0:
+            if contributes:
+                lots.buy(monthly, holdings.sum(axis=1) * fx[s], times[s])
+                holdings += (monthly / fx[s])[:, None] * weights
+                total_invested += monthly
+
+            frac = np.where(withdrawal_months == months[s], wd_frac, 0.0)
+            if frac.any():
+                capital = holdings.sum(axis=1) * fx[s]
+                frac = np.where(capital > 0, frac, 0.0)
+                gain = lots.sell(frac, capital, times[s])
+                gain = np.where(frac > 0, gain, 0.0)
+                realized += gain
+                tax_paid += np.maximum(gain, 0.0) * tax_rate
+                withdrawn_gross += capital * frac
+                holdings -= holdings * frac[:, None]
+
+        block = growth[s:e].copy()
+        block[0] = 1.0
+        np.cumprod(block, axis=0, out=block)
+        values[s:e] = (block @ holdings.T) * fx[s:e, None]
+        holdings = holdings * block[-1]
+
+        if step and e < n and months[e - 1] % step == 0:
+            total = values[e - 1] / fx[e - 1]
+            target = total[:, None] * weights
+            live = total > 0
+            rebalance_count += live
+            turnover_sum += np.divide(np.abs(target - holdings).sum(axis=1) / 2.0, total, out=np.zeros(n_ports), where=live)
+            holdings = target
+
+    liquidation_gain = lots.unrealized(values[-1], times[-1])
+    return values, {
+        "total_invested": total_invested,
+        "cost_basis": lots.cost_basis,
+        "total_withdrawn_gross": withdrawn_gross,
+        "total_tax_paid": tax_paid,
+        "total_withdrawn_net": withdrawn_gross - tax_paid,
+        "realized_gain": realized,
+        "liquidation_gain": liquidation_gain,
+        "liquidation_tax": np.maximum(liquidation_gain, 0.0) * tax_rate,
+        "rebalance_count": rebalance_count,
+        "avg_turnover": np.divide(turnover_sum, rebalance_count, out=np.zeros(n_ports), where=rebalance_count > 0) * 100,
+        "holdings": holdings,
+    }
+
+
+def compare_portfolios(
+    port_cfgs: list[dict],
+    market,
+    initial: float,
+    monthly_contribution: float,
+    start_y,
+    end_y,
+    rebalance: str | None = None,
+    tax_rate: float = 0.25,
+    fx=None,
+    cost_method: str = "average",
+    inflation: float = 0.0,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Every portfolio runs on the scenario simulate_portfolio would give it
+    # alone: the returns of its own assets on the dates they all trade, with
+    # the future drawn from their mean/covariance (scenario_returns), so
+    # adding a portfolio never changes another's numbers and a young ETF
+    # only shortens the history of the portfolios holding it. Portfolios over
+    # the same asset list share that scenario and run as one batch. Missing
+    # assets are dropped and weights renormalized per portfolio, as in
+    # simulate_portfolio. Returns the daily values (one column per config,
+    # by position, NaN outside its own window) and a stats frame with one
+    # row per config: simulate_portfolio's headline stats plus net_profit,
+    # the window's first and last dates and a rank per RANK_METRICS entry.
+    # Configs left without assets or data have ok=False.
+    groups = {}
+    for i, cfg in enumerate(port_cfgs):
+        assets = tuple(a for a in cfg["assets"] if a not in market.missing(cfg["assets"]))
+        if sum(cfg["weights"].get(a, 0) for a in assets) > 0:
+            groups.setdefault(assets, []).append(i)
+
+    rows = [{"ok": False} for _ in port_cfgs]
+    columns = {}
+    for assets, members in groups.items():
+        _, combined, _ = scenario_returns(market, list(assets), start_y, end_y)
+        if combined.empty:
+            continue
+        weights = np.array([[port_cfgs[i]["weights"].get(a, 0) for a in assets] for i in members], dtype=float)
+        values, flows = run_batch_engine(
+            combined.to_numpy(dtype=float), combined.index, weights / weights.sum(axis=1, keepdims=True), rebalance,
+            initial, monthly_contribution,
+            np.array([port_cfgs[i].get("withdrawal_rate", 0.0) for i in members]),
+            np.array([port_cfgs[i].get("withdrawal_month", 1) for i in members]),
+            tax_rate, fx.asof(combined.index) if fx is not None else None, cost_method, inflation,
+        )
+        for j, i in enumerate(members):
+            metrics = series_metrics(values[:, j], combined.index, start_value=float(initial))
+            flow = {k: v[j] for k, v in flows.items() if k != "holdings"}
+            rows[i] = {
+                "ok": True, **metrics, **flow,
+                "net_profit": flow["total_withdrawn_net"] + metrics["end_val"] - flow["total_invested"] - flow["liquidation_tax"],
+                "first_date": combined.index[0], "last_date": combined.index[-1],
+                "dropped_assets": market.missing(port_cfgs[i]["assets"]),
+            }
+            columns[i] = pd.Series(values[:, j], index=combined.index)
+    if not columns:
+        return pd.DataFrame(), pd.DataFrame({"ok": np.zeros(len(port_cfgs), dtype=bool)})
+
+    stats = pd.DataFrame(rows)
+    for m in RANK_METRICS:
+        stats[f"rank_{m}"] = stats[m].where(stats["ok"]).rank(ascending=m in RANK_ASCENDING, method="min")
+    series = pd.DataFrame(columns).reindex(columns=range(len(port_cfgs)))
+    return series, stats
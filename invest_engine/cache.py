@@ -0,0 +1,102 @@
+"""Scale-normalized simulation result cache."""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+
+from .engine import scale_monte_carlo
+
+SIM_CACHE_SIZE = 64
+MONEY_STATS = (
+    "start_val", "end_val", "total_invested", "cost_basis",
+    "total_withdrawn_gross", "total_tax_paid", "total_withdrawn_net",
+    "realized_gain", "liquidation_gain", "liquidation_tax",
+)
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = SIM_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def values(self) -> list:
+        with self._lock:
+            return list(self._data.values())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def simulation_key(
+    port_cfg: dict, initial: float, monthly: float, start_y, end_y, rebalance, tax_rate: float,
+    mc_paths: int = 0, mc_method: str = "bootstrap", mc_seed: int = 42, fx_key: str | None = None,
+    cost_method: str = "average", inflation: float = 0.0, currencies: dict[str, str] | None = None,
+) -> tuple[str, float]:
+    # The engine is homogeneous in (initial, monthly): scaling both scales every
+    # money figure and leaves every ratio unchanged. Results are therefore
+    # cached per unit of capital, and a currency switch (which only rescales
+    # the USD amounts) is served by rescaling a cached result. `currencies`
+    # are the quote currencies the market data was converted from
+    # (MarketData.currencies), so a listing whose currency becomes known
+    # doesn't reuse a result priced without it.
+    scale = float(initial) if initial > 0 else (float(monthly) if monthly > 0 else 1.0)
+    assets = list(port_cfg.get("assets", []))
+    payload = {
+        "assets": assets,
+        "weights": [float(port_cfg.get("weights", {}).get(a, 0.0)) for a in assets],
+        "phase": port_cfg.get("phase"),
+        "withdrawal_rate": float(port_cfg.get("withdrawal_rate", 0.0)),
+        "withdrawal_month": int(port_cfg.get("withdrawal_month", 1)),
+        "initial": float(initial) / scale,
+        "monthly": float(monthly) / scale,
+        "years": [int(start_y), int(end_y)],
+        "rebalance": rebalance,
+        "tax_rate": float(tax_rate),
+        "cost_method": cost_method,
+        "inflation": float(inflation),
+        "mc_paths": int(mc_paths),
+        "mc_method": mc_method if mc_paths else None,
+        "mc_seed": int(mc_seed) if mc_paths else None,
+        "as_of": datetime.today().strftime("%Y-%m-%d"),
+    }
+    if fx_key:
+        payload["fx"] = fx_key
+    if currencies:
+        payload["currencies"] = [currencies.get(a) for a in assets]
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    return digest, scale
+
+
+def scale_result(series: pd.Series, stats: dict, factor: float) -> tuple[pd.Series, dict]:
+    if not stats:
+        return series, stats
+    scaled = dict(stats)
+    for k in MONEY_STATS:
+        scaled[k] = stats[k] * factor
+    mc = stats.get("monte_carlo")
+    if mc:
+        scaled["monte_carlo"] = scale_monte_carlo(mc, factor)
+    return series * factor, scaled
@@ -0,0 +1,227 @@
+"""Batch simulation runner: ``python -m invest_engine scenarios.json``.
+
+A config file is either a list of scenarios or ``{"defaults": {...},
+"scenarios": [...]}``; every scenario inherits the defaults and may override
+any field. A config with a ``"sweep"`` mapping instead runs the full grid of
+the listed axes (see :func:`invest_engine.sweep.expand_grid`) over the
+defaults, e.g. ``"sweep": {"withdrawal_rate": [3, 4], "start_year":
+[1995, 2000], "weights": [{"SPY": 60, "TLT": 40}, {"SPY": 100}]}``.
+
+A scenario with a ``"goal"`` also solves for the monthly deposit that reaches
+a target end value (``{"solve": "monthly", "target": 1000000,
+"confidence": 0.9}``) or the highest withdrawal rate that survives
+(``{"solve": "withdrawal_rate", "survival": 0.9}``, optionally with an end
+``"target"``) over ``"paths"`` Monte Carlo paths (default ``mc_paths``); see
+:mod:`invest_engine.goalseek`.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .engine import MC_METHODS, simulate_portfolio
+from .goalseek import goal_paths, solve_deposit, solve_withdrawal_rate
+from .lots import COST_METHODS
+from .market import load_market_data, simulation_window
+from .metadata import METADATA_PATH, MetadataStore, SyntheticInfoProvider
+from .store import PRICE_STORE_DIR, PriceStore, SyntheticPriceProvider
+from .sweep import expand_grid, run_sweep, sweep_window
+
+SCENARIO_DEFAULTS = {
+    "initial": 100_000.0,
+    "monthly": 0.0,
+    "start_year": 2010,
+    "end_year": 2024,
+    "rebalance": None,
+    "tax_rate": 0.25,
+    "cost_method": "average",
+    "inflation": 0.0,
+    "mc_paths": 0,
+    "mc_method": "bootstrap",
+    "mc_seed": 42,
+    "withdrawal_rate": 0.0,
+    "withdrawal_month": 1,
+}
+GOAL_SOLVES = ("monthly", "withdrawal_rate")
+REBALANCE_ALIASES = {None: None, "none": None, "monthly": "ME", "quarterly": "QE", "yearly": "YE", "ME": "ME", "QE": "QE", "YE": "YE"}
+
+
+def read_config(path: str) -> dict:
+    with open(path, encoding="utf-8") as fh:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            config = yaml.safe_load(fh)
+        else:
+            config = json.load(fh)
+    return {"scenarios": config} if isinstance(config, list) else config
+
+
+def normalize_scenario(sc: dict) -> dict:
+    if not sc.get("assets"):
+        raise ValueError(f"{sc['name']}: no assets")
+    weights = sc.get("weights") or {a: 1.0 for a in sc["assets"]}
+    if isinstance(weights, list):
+        weights = dict(zip(sc["assets"], weights))
+    sc["weights"] = {a: float(w) for a, w in weights.items()}
+    if sc["mc_method"] not in MC_METHODS:
+        raise ValueError(f"{sc['name']}: unknown mc_method {sc['mc_method']!r} (expected one of {', '.join(MC_METHODS)})")
+    if sc["cost_method"] not in COST_METHODS:
+        raise ValueError(f"{sc['name']}: unknown cost_method {sc['cost_method']!r} (expected one of {', '.join(COST_METHODS)})")
+    if sc["rebalance"] not in REBALANCE_ALIASES:
+        raise ValueError(f"{sc['name']}: unknown rebalance {sc['rebalance']!r}")
+    sc["rebalance"] = REBALANCE_ALIASES[sc["rebalance"]]
+    goal = sc.get("goal")
+    if goal is not None and goal.get("solve") not in GOAL_SOLVES:
+        raise ValueError(f"{sc['name']}: unknown goal solve {goal.get('solve')!r} (expected one of {', '.join(GOAL_SOLVES)})")
+    if goal is not None and goal["solve"] == "monthly" and "target" not in goal:
+        raise ValueError(f"{sc['name']}: a monthly goal needs a target end value")
+    return sc
+
+
+def load_config(path: str) -> list[dict]:
+    config = read_config(path)
+    defaults = {**SCENARIO_DEFAULTS, **config.get("defaults", {})}
+    scenarios = []
+    for i, raw in enumerate(config.get("scenarios", [])):
+        sc = {**defaults, **raw}
+        sc.setdefault("name", f"scenario-{i + 1}")
+        scenarios.append(normalize_scenario(sc))
+    return scenarios
+
+
+def load_sweep(path: str) -> list[dict]:
+    config = read_config(path)
+    axes = dict(config["sweep"])
+    base = {**SCENARIO_DEFAULTS, "name": "sweep", **config.get("defaults", {})}
+    if "weights" in axes:
+        axes["weights"] = [{a: float(w) for a, w in ws.items()} for ws in axes["weights"]]
+        base["weights"] = axes["weights"][0]
+        base["assets"] = list(base["weights"])
+    base = normalize_scenario(base)
+    return expand_grid(base, axes)
+
+
+def run_scenarios(scenarios: list[dict], store: PriceStore, metadata: MetadataStore | None = None):
+    # Scenarios sharing a year range share one MarketData over the union of
+    # their tickers, exactly as the app loads one universe per run (non-USD
+    # listings converted to USD when there is a metadata store; a batch run
+    # can afford to resolve their currencies up front).
+    groups = {}
+    for sc in scenarios:
+        groups.setdefault((int(sc["start_year"]), int(sc["end_year"])), []).append(sc)
+    if metadata is not None:
+        metadata.prefetch({a for sc in scenarios for a in sc["assets"]})
+    markets = {}
+    for (start_y, end_y), members in groups.items():
+        _, _, dl_start, hist_end = simulation_window(start_y, end_y)
+        universe = tuple(sorted({a for sc in members for a in sc["assets"]}))
+        markets[start_y, end_y] = load_market_data(store, universe, dl_start.strftime("%Y-%m-%d"), hist_end.strftime("%Y-%m-%d"), metadata)
+
+    for sc in scenarios:
+        market = markets[int(sc["start_year"]), int(sc["end_year"])]
+        port_cfg = {
+            "assets": list(sc["assets"]), "weights": sc["weights"],
+            "withdrawal_rate": float(sc["withdrawal_rate"]), "withdrawal_month": int(sc["withdrawal_month"]),
+        }
+        series, stats = simulate_portfolio(
+            port_cfg, market, float(sc["initial"]), float(sc["monthly"]), sc["start_year"], sc["end_year"],
+            sc["rebalance"], float(sc["tax_rate"]), int(sc["mc_paths"]), sc["mc_method"], int(sc["mc_seed"]),
+            cost_method=sc["cost_method"], inflation=float(sc["inflation"]),
+        )
+        failed = {t: market.failed[t] for t in sc["assets"] if t in market.failed}
+        goal = run_goal(sc, port_cfg, market) if sc.get("goal") and stats else None
+        yield sc, series, stats, failed, goal
+
+
+def run_goal(sc: dict, port_cfg: dict, market) -> dict:
+    goal = sc["goal"]
+    paths = goal_paths(
+        port_cfg, market, sc["start_year"], sc["end_year"], sc["rebalance"],
+        int(goal.get("paths", sc["mc_paths"])), sc["mc_method"], int(sc["mc_seed"]),
+    )
+    if goal["solve"] == "monthly":
+        return solve_deposit(paths, float(sc["initial"]), float(goal["target"]), float(sc["withdrawal_rate"]), float(goal.get("confidence", 0.5)))
+    target = goal.get("target")
+    return solve_withdrawal_rate(
+        paths, float(sc["initial"]), float(sc["monthly"]), float(goal.get("survival", 0.9)),
+        float(target) if target is not None else None,
+    )
+
+
+def to_jsonable(value):
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return to_jsonable(value.tolist())
+    if isinstance(value, pd.Series):
+        return {k.strftime("%Y-%m-%d"): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (pd.Timestamp, pd.DatetimeIndex)):
+        return value.strftime("%Y-%m-%d") if isinstance(value, pd.Timestamp) else list(value.strftime("%Y-%m-%d"))
+    if isinstance(value, (np.integer, np.floating)):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="invest_engine", description="Run portfolio simulations from a JSON/YAML scenario file.")
+    parser.add_argument("config", help="scenario file (.json, .yaml or .yml)")
+    parser.add_argument("--out", help="write JSON lines here instead of stdout")
+    parser.add_argument("--store", help=f"price store directory (default {PRICE_STORE_DIR})")
+    parser.add_argument("--synthetic", action="store_true", help="use deterministic synthetic prices (no network)")
+    parser.add_argument("--series", choices=("none", "monthly", "daily"), default="none", help="include the value series in the output")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        store = PriceStore(args.store or tempfile.mkdtemp(prefix="invest_engine_"), SyntheticPriceProvider())
+        metadata = MetadataStore(os.path.join(store.root, "metadata.json"), SyntheticInfoProvider())
+    else:
+        store = PriceStore(args.store or PRICE_STORE_DIR)
+        metadata = MetadataStore(os.path.join(args.store, "metadata.json") if args.store else METADATA_PATH)
+
+    if "sweep" in read_config(args.config):
+        return run_sweep_command(args, store, metadata)
+
+    scenarios = load_config(args.config)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    failures = 0
+    try:
+        for sc, series, stats, failed, goal in run_scenarios(scenarios, store, metadata):
+            record = {"name": sc["name"], "ok": bool(stats), "failed_tickers": failed, "stats": stats}
+            if goal is not None:
+                record["goal"] = {"solve": sc["goal"]["solve"], **goal}
+            if args.series != "none" and not series.empty:
+                record["series"] = series.resample("ME").last() if args.series == "monthly" else series
+            failures += not stats
+            out.write(json.dumps(to_jsonable(record), ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failures else 0
+
+
+def run_sweep_command(args, store: PriceStore, metadata: MetadataStore | None = None) -> int:
+    points = load_sweep(args.config)
+    universe = tuple(sorted({a for p in points for a in p["assets"]}))
+    if metadata is not None:
+        metadata.prefetch(universe)
+    market = load_market_data(store, universe, *sweep_window(points), metadata)
+    results = run_sweep(market, points)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for record in results.to_dict("records"):
+            out.write(json.dumps(to_jsonable(record), ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0 if results["ok"].all() else 1
@@ -0,0 +1,159 @@
+"""Rolling-cohort backtests: one plan replayed from every historical start month."""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .engine import DEPLETION_FRACTION, MC_PERCENTILES, REBALANCE_STEP_MONTHS, month_boundaries
+from .lots import LotBook
+
+
+def monthly_growth(asset_returns: np.ndarray, index: pd.DatetimeIndex) -> tuple[np.ndarray, np.ndarray, pd.DatetimeIndex]:
+    # Per month and asset: the first trading day's growth (applied before
+    # that month's cash flows, as in run_holdings_engine) and the growth over
+    # the rest of the month. Month-end holdings of the daily engine are
+    # exactly holdings × first × rest.
+    growth = 1.0 + np.asarray(asset_returns, dtype=float).reshape(len(index), -1)
+    starts = np.concatenate(([0], month_boundaries(index)))
+    first = growth[starts]
+    log_growth = np.log(growth)
+    csum = np.vstack([np.zeros((1, growth.shape[1])), np.cumsum(log_growth, axis=0)])
+    ends = np.append(starts[1:], len(growth))
+    rest = np.exp(csum[ends] - csum[starts + 1])
+    return first, rest, index[ends - 1]
+
+
+def rolling_cohorts(
+    asset_returns: np.ndarray,
+    index: pd.DatetimeIndex,
+    weights: np.ndarray,
+    horizon_months: int,
+    rebalance: str | None,
+    initial: float,
+    monthly_contribution: float,
+    withdrawal_rate: float,
+    withdrawal_month: int,
+    tax_rate: float,
+    cost_method: str = "average",
+    inflation: float = 0.0,
+) -> dict:
+    # Every cohort (start month) is a row of a strided (cohorts × horizon)
+    # view over the monthly growth arrays, so all cohorts advance together
+    # one month at a time instead of running one simulation each. Values are
+    # month-end values; depletion is tested at month ends. Tax lots are one
+    # LotBook with a row per cohort, timed in years since each cohort began.
+    first, rest, month_ends = monthly_growth(asset_returns, index)
+    n_months, n_assets = first.shape
+    if n_months < horizon_months or horizon_months < 1:
+        return {}
+    weights = np.asarray(weights, dtype=float)
+    cal_months = month_ends.month.to_numpy()
+    step = REBALANCE_STEP_MONTHS.get(rebalance)
+
+    first_w = sliding_window_view(first, horizon_months, axis=0)  # (cohorts, assets, horizon)
+    rest_w = sliding_window_view(rest, horizon_months, axis=0)
+    month_w = sliding_window_view(cal_months, horizon_months)  # (cohorts, horizon)
+    n_cohorts = first_w.shape[0]
+
+    holdings = np.tile(float(initial) * weights, (n_cohorts, 1))
+    lots = LotBook(n_cohorts, horizon_months, cost_method, inflation)
+    lots.add(float(initial), float(initial), 0.0)
+    withdrawn_gross = np.zeros(n_cohorts)
+    withdrawn_net = np.zeros(n_cohorts)
+    tax_paid = np.zeros(n_cohorts)
+    paths = np.empty((n_cohorts, horizon_months))
+    wd_frac = withdrawal_rate / 100.0
+
+    for k in range(horizon_months):
+        holdings *= first_w[:, :, k]
+        if k > 0:
+            if monthly_contribution > 0:
+                lots.buy(monthly_contribution, holdings.sum(axis=1), k / 12.0)
+                holdings += monthly_contribution * weights
+            if wd_frac > 0:
+                due = month_w[:, k] == withdrawal_month
+                if due.any():
+                    capital = holdings.sum(axis=1)
+                    gross = np.where(due, capital * wd_frac, 0.0)
+                    tax = np.maximum(lots.sell(np.where(due, min(wd_frac, 1.0), 0.0), capital, k / 12.0), 0.0) * tax_rate
+                    remaining = np.maximum(capital - gross, 0.0)
+                    scale = np.divide(remaining, capital, out=np.zeros(n_cohorts), where=capital > 0)
+                    holdings *= np.where(due, scale, 1.0)[:, None]
+                    withdrawn_gross += gross
+                    withdrawn_net += gross - tax
+                    tax_paid += tax
+        holdings *= rest_w[:, :, k]
+        paths[:, k] = holdings.sum(axis=1)
+        if step and k < horizon_months - 1:
+            rebal = month_w[:, k] % step == 0
+            if rebal.any():
+                holdings = np.where(rebal[:, None], paths[:, k, None] * weights, holdings)
+
+    invested = float(initial) + monthly_contribution * (horizon_months - 1)
+    years = horizon_months / 12.0
+    end_vals = paths[:, -1]
+    peak = np.maximum.accumulate(paths, axis=1)
+    ruin_level = float(initial) * DEPLETION_FRACTION
+    depleted = (paths <= ruin_level).any(axis=1) if initial > 0 else np.zeros(n_cohorts, dtype=bool)
+    liquidation_tax = np.maximum(lots.unrealized(end_vals, (horizon_months - 1) / 12.0), 0.0) * tax_rate
+
+    cohorts = pd.DataFrame({
+        "start": month_ends[:n_cohorts].to_period("M").to_timestamp(),
+        "end": month_ends[horizon_months - 1:],
+        "end_val": end_vals,
+        "min_val": paths.min(axis=1),
+        "max_dd": ((paths - peak) / np.where(peak > 0, peak, 1.0)).min(axis=1) * 100,
+        "cagr": (np.power(np.maximum(end_vals, 0.0) / initial, 1.0 / years) - 1.0) * 100 if initial > 0 else np.zeros(n_cohorts),
+        "withdrawn_net": withdrawn_net,
+        "tax_paid": tax_paid + liquidation_tax,
+        "net_profit": withdrawn_net + end_vals - invested - liquidation_tax,
+        "depleted": depleted,
+    })
+    worst = int(np.argmin(end_vals))
+    return {
+        "cohorts": cohorts,
+        "paths": paths,
+        "bands": dict(zip(MC_PERCENTILES, np.percentile(paths, MC_PERCENTILES, axis=0))),
+        "n_cohorts": n_cohorts,
+        "success_rate": float(1.0 - depleted.mean()),
+        "worst": cohorts.iloc[worst].to_dict(),
+        "median_end": float(np.median(end_vals)),
+        "total_invested": invested,
+    }
+
+
+def backtest_cohorts(
+    port_cfg: dict,
+    market,
+    initial: float,
+    monthly_contribution: float,
+    horizon_years: int,
+    rebalance: str | None = None,
+    tax_rate: float = 0.25,
+    cost_method: str = "average",
+    inflation: float = 0.0,
+) -> dict:
+    # Same portfolio handling as simulate_portfolio (missing assets dropped,
+    # weights renormalized); cohorts cover every start month in `market`
+    # that still has `horizon_years` of complete months after it.
+    assets = [a for a in port_cfg["assets"] if a in market.columns]
+    weights_dict = port_cfg["weights"]
+    total_w = sum(weights_dict.get(a, 0) for a in assets)
+    if not assets or total_w == 0:
+        return {}
+    returns_df = market.returns(assets)
+    if returns_df.empty:
+        return {}
+    today = pd.Timestamp.today()
+    if returns_df.index[-1].to_period("M") == today.to_period("M"):
+        returns_df = returns_df[returns_df.index < today.to_period("M").to_timestamp()]
+    result = rolling_cohorts(
+        returns_df.to_numpy(), returns_df.index,
+        np.array([weights_dict.get(a, 0) / total_w for a in assets]),
+        int(horizon_years) * 12, rebalance, initial, monthly_contribution,
+        port_cfg.get("withdrawal_rate", 0.0), port_cfg.get("withdrawal_month", 1), tax_rate,
+        cost_method, inflation,
+    )
+    if result:
+        result["dropped_assets"] = market.missing(port_cfg["assets"])
+    return result
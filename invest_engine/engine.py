@@ -0,0 +1,544 @@
+"""Holdings engine, Monte Carlo projection and portfolio simulation."""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .lots import LotBook, lot_time
+from .market import simulation_window
+from .metrics import series_metrics
+from .profiling import stage
+
+
+MC_PERCENTILES = (5, 25, 50, 75, 95)
+DEPLETION_FRACTION = 0.10
+
+
+def month_boundaries(index: pd.DatetimeIndex) -> np.ndarray:
+    month_key = index.year.to_numpy() * 12 + index.month.to_numpy()
+    return np.flatnonzero(month_key[1:] != month_key[:-1]) + 1
+
+
+REBALANCE_STEP_MONTHS = {"ME": 1, "QE": 3, "YE": 12}
+
+
+def run_holdings_engine(
+    asset_returns: np.ndarray,
+    index: pd.DatetimeIndex,
+    weights: np.ndarray,
+    rebalance: str | None,
+    initial: float,
+    monthly_contribution: float,
+    withdrawal_rate: float,
+    withdrawal_month: int,
+    tax_rate: float,
+    fx: np.ndarray | None = None,
+    cost_method: str = "average",
+    inflation: float = 0.0,
+) -> tuple[np.ndarray, dict]:
+    # Per-asset holdings grow as a (days × assets) cumprod between month
+    # boundaries and drift freely; contributions buy at target weights,
+    # withdrawals sell pro rata, and holdings are reset to target weights
+    # only on the last trading day of each rebalance period.
+    # With `fx` (the investor's currency per USD on each day of `index`),
+    # holdings stay in USD while every cash flow, the cost basis, the tax
+    # and the returned values are in the investor's currency, each
+    # converted at its own date's rate. The final "holdings" stay in USD.
+    # Every purchase is a tax lot (see LotBook); withdrawals realize the
+    # gains of the lots they sell, and the open lots at the end give the
+    # tax due on a final liquidation.
+    growth = 1.0 + np.asarray(asset_returns, dtype=float).reshape(len(index), -1)
+    weights = np.asarray(weights, dtype=float)
+    n = len(growth)
+    values = np.empty(n, dtype=float)
+    if n == 0:
+        return values, {}
+    fx = np.ones(n) if fx is None else np.asarray(fx, dtype=float)
+
+    bounds = month_boundaries(index)
+    seg_starts = np.concatenate(([0], bounds))
+    seg_ends = np.concatenate((bounds, [n]))
+    months = index.month.to_numpy()
+    years = index.year.to_numpy()
+    step = REBALANCE_STEP_MONTHS.get(rebalance)
+
+    times = lot_time(index)
+    holdings = float(initial) / fx[0] * weights
+    lots = LotBook(1, len(seg_starts), cost_method, inflation)
+    lots.add(float(initial), float(initial), times[0])
+    total_invested = float(initial)
+    total_withdrawn_gross = 0.0
+    total_tax_paid = 0.0
+    total_withdrawn_net = 0.0
+    withdrew_this_year = set()
+    rebalance_dates = []
+    turnover = []
+    realized_dates = []
+    realized = []
+
+    for s, e in zip(seg_starts, seg_ends):
+        holdings = holdings * growth[s]
+        if s > 0:
+            if monthly_contribution > 0:
+                lots.buy(monthly_contribution, holdings.sum() * fx[s], times[s])
+                holdings += monthly_contribution / fx[s] * weights
+                total_invested += monthly_contribution
+
+            if withdrawal_rate > 0 and months[s] == withdrawal_month and years[s] not in withdrew_this_year:
+                withdrew_this_year.add(years[s])
+                capital = holdings.sum() * fx[s]
+                gross_wd = capital * (withdrawal_rate / 100.0)
+                wd_frac = min(withdrawal_rate / 100.0, 1.0)
+                gain = float(lots.sell(wd_frac, capital, times[s])[0]) if capital > 0 else 0.0
+                tax = max(gain, 0.0) * tax_rate
+                realized_dates.append(index[s])
+                realized.append(gain)
+
+                total_withdrawn_gross += gross_wd
+                total_tax_paid += tax
+                total_withdrawn_net += gross_wd - tax
+                # capital - gross_wd, per asset, as the original loop did it.
+                holdings = holdings - holdings * wd_frac if capital > 0 else holdings * 0.0
+
+        block = growth[s:e].copy()
+        block[0] = holdings
+        np.cumprod(block, axis=0, out=block)
+        values[s:e] = block.sum(axis=1) * fx[s:e]
+        holdings = block[-1]
+
+        if step and e < n and months[e - 1] % step == 0:
+            total = values[e - 1] / fx[e - 1]
+            target = total * weights
+            if total > 0:
+                rebalance_dates.append(index[e - 1])
+                turnover.append(np.abs(target - holdings).sum() / 2.0 / total)
+            holdings = target
+
+    liquidation_gain = float(lots.unrealized(values[-1:], times[-1])[0])
+    return values, {
+        "total_invested": total_invested, "cost_basis": float(lots.cost_basis[0]),
+        "total_withdrawn_gross": total_withdrawn_gross,
+        "total_tax_paid": total_tax_paid,
+        "total_withdrawn_net": total_withdrawn_net,
+        "realized_gains": pd.Series(realized, index=pd.DatetimeIndex(realized_dates), dtype=float),
+        "liquidation_gain": liquidation_gain,
+        "liquidation_tax": max(liquidation_gain, 0.0) * tax_rate,
+        "turnover": pd.Series(turnover, index=pd.DatetimeIndex(rebalance_dates), dtype=float),
+        "holdings": holdings,
+        "lots": lots,
+    }
+
+
+def projection_segments(index: pd.DatetimeIndex, prev_date: pd.Timestamp | None, withdrawal_month: int):
+    # Month segments of a projection that continues a history ending on
+    # prev_date: the first future day opens a new month (cash flows due) only
+    # if it falls in a later month, and a withdrawal already taken this year
+    # is not repeated.
+    month_key = index.year.to_numpy() * 12 + index.month.to_numpy()
+    prev_key = prev_date.year * 12 + prev_date.month if prev_date is not None else month_key[0]
+    is_boundary = month_key != np.concatenate(([prev_key], month_key[:-1]))
+    seg_starts = np.union1d([0], np.flatnonzero(is_boundary))
+    seg_ends = np.append(seg_starts[1:], len(index))
+    skip_year = prev_date.year if prev_date is not None and prev_date.month >= withdrawal_month else None
+    return seg_starts, seg_ends, is_boundary, skip_year
+
+
+def start_lots_for(
+    start_lots: LotBook | None, n_paths: int, n_segments: int, start_capital: float, start_cost_basis: float,
+    t0: float, cost_method: str, inflation: float,
+) -> LotBook:
+    # Room for one lot per projected month on top of the starting lots.
+    if start_lots is not None:
+        return start_lots.tile(n_paths, reserve=n_segments)
+    lots = LotBook(n_paths, n_segments + 1, cost_method, inflation)
+    lots.add(float(start_capital), float(start_cost_basis), t0)
+    return lots
+
+
+def run_monte_carlo(
+    mean_daily: float,
+    std_daily: float,
+    index: pd.DatetimeIndex,
+    start_capital: float,
+    start_cost_basis: float,
+    monthly_contribution: float,
+    withdrawal_rate: float,
+    withdrawal_month: int,
+    tax_rate: float,
+    n_paths: int = 10_000,
+    seed: int = 42,
+    chunk_size: int = 2_000,
+    prev_date: pd.Timestamp | None = None,
+    cost_method: str = "average",
+    inflation: float = 0.0,
+    start_lots: LotBook | None = None,
+) -> dict:
+    # Paths are simulated chunk by chunk and month by month, so only a
+    # (chunk × days-in-month) block is alive at once; month-end values are
+    # kept for the percentile bands. Each chunk keeps its own LotBook,
+    # seeded from `start_lots` (a one-path book, e.g. the history's open
+    # lots) or else from a single lot costing start_cost_basis.
+    t0 = time.perf_counter()
+    seg_starts, seg_ends, is_boundary, skip_year = projection_segments(index, prev_date, withdrawal_month)
+    months = index.month.to_numpy()
+    years = index.year.to_numpy()
+    times = lot_time(index)
+    wd_frac = withdrawal_rate / 100.0
+    ruin_level = start_capital * DEPLETION_FRACTION
+
+    samples = np.empty((n_paths, len(seg_starts)), dtype=float)
+    depleted = np.zeros(n_paths, dtype=bool)
+    tax_paid = np.zeros(n_paths, dtype=float)
+    withdrawn_net = np.zeros(n_paths, dtype=float)
+    liquidation_tax = np.zeros(n_paths, dtype=float)
+
+    for c, p0 in enumerate(range(0, n_paths, chunk_size)):
+        p1 = min(p0 + chunk_size, n_paths)
+        rng = np.random.default_rng([seed, c])
+        capital = np.full(p1 - p0, float(start_capital))
+        lots = start_lots_for(start_lots, p1 - p0, len(seg_starts), start_capital, start_cost_basis, times[0], cost_method, inflation)
+
+        for j, (s, e) in enumerate(zip(seg_starts, seg_ends)):
+            block = rng.standard_normal((p1 - p0, e - s))
+            block *= std_daily
+            block += 1.0 + mean_daily
+            capital = capital * block[:, 0]
+
+            if is_boundary[s]:
+                if monthly_contribution > 0:
+                    lots.buy(monthly_contribution, capital, times[s])
+                    capital += monthly_contribution
+
+                if wd_frac > 0 and months[s] == withdrawal_month and years[s] != skip_year:
+                    gross_wd = capital * wd_frac
+                    tax = np.maximum(lots.sell(min(wd_frac, 1.0), capital, times[s]), 0.0) * tax_rate
+                    tax_paid[p0:p1] += tax
+                    withdrawn_net[p0:p1] += gross_wd - tax
+                    capital = np.maximum(capital - gross_wd, 0.0)
+
+            block[:, 0] = capital
+            np.cumprod(block, axis=1, out=block)
+            if wd_frac > 0:
+                depleted[p0:p1] |= block.min(axis=1) <= ruin_level
+            capital = block[:, -1].copy()
+            samples[p0:p1, j] = capital
+        liquidation_tax[p0:p1] = np.maximum(lots.unrealized(capital, times[-1]), 0.0) * tax_rate
+
+    bands = np.percentile(samples, MC_PERCENTILES, axis=0)
+    elapsed = time.perf_counter() - t0
+    return {
+        "dates": index[seg_ends - 1],
+        "bands": dict(zip(MC_PERCENTILES, bands)),
+        "ruin_prob": float(depleted.mean()) if wd_frac > 0 else None,
+        "median_end": float(np.median(samples[:, -1])),
+        "median_tax_paid": float(np.median(tax_paid)),
+        "median_withdrawn_net": float(np.median(withdrawn_net)),
+        "median_liquidation_tax": float(np.median(liquidation_tax)),
+        "n_paths": n_paths,
+        "elapsed": elapsed,
+        "paths_per_sec": n_paths / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+MC_METHODS = ("bootstrap", "normal", "single")
+BOOTSTRAP_BLOCK_DAYS = 21
+
+
+class ReturnSampler:
+    # Draws (paths × days × assets) daily return blocks, month by month, for a
+    # fixed set of paths. "bootstrap" replays historical rows in fixed-length
+    # blocks (moving-block bootstrap: fat tails, volatility clustering and
+    # cross-asset correlation come with the rows); "normal" draws correlated
+    # Gaussian rows through the Cholesky factor of the historical covariance.
+    def __init__(self, history: np.ndarray, method: str, rng: np.random.Generator, n_paths: int, block_days: int = BOOTSTRAP_BLOCK_DAYS):
+        self.history = np.ascontiguousarray(history, dtype=float)
+        self.method = method
+        self.rng = rng
+        self.n_paths = n_paths
+        self.block_days = max(1, min(int(block_days), len(self.history)))
+        self.day = 0
+        self._starts = {}
+        if method == "normal":
+            self.mean = self.history.mean(axis=0)
+            cov = np.atleast_2d(np.cov(self.history, rowvar=False))
+            # Jitter only if the covariance is singular (e.g. duplicated assets).
+            try:
+                self.chol = np.linalg.cholesky(cov)
+            except np.linalg.LinAlgError:
+                self.chol = np.linalg.cholesky(cov + np.eye(len(cov)) * 1e-12 * np.trace(cov))
+
+    def draw(self, n_days: int) -> np.ndarray:
+        # Returns a (days × paths × assets) block: each day is one contiguous
+        # (paths × assets) slab, which keeps the per-day products cheap.
+        days = np.arange(self.day, self.day + n_days)
+        self.day += n_days
+        n_assets = self.history.shape[1]
+        if self.method == "normal":
+            z = self.rng.standard_normal((n_days * self.n_paths, n_assets))
+            return (z @ self.chol.T + self.mean).reshape(n_days, self.n_paths, n_assets)
+        blocks, offsets = np.divmod(days, self.block_days)
+        for b in np.unique(blocks):
+            if b not in self._starts:
+                self._starts[b] = self.rng.integers(0, len(self.history) - self.block_days + 1, self.n_paths)
+        for b in [b for b in self._starts if b < blocks[0]]:
+            del self._starts[b]
+        rows = np.stack([self._starts[b] for b in blocks]) + offsets[:, None]
+        return np.take(self.history, rows, axis=0)
+
+
+def run_asset_monte_carlo(
+    history: np.ndarray,
+    weights: np.ndarray,
+    rebalance: str | None,
+    index: pd.DatetimeIndex,
+    start_holdings: np.ndarray,
+    start_cost_basis: float,
+    monthly_contribution: float,
+    withdrawal_rate: float,
+    withdrawal_month: int,
+    tax_rate: float,
+    n_paths: int = 10_000,
+    seed: int = 42,
+    method: str = "bootstrap",
+    block_days: int = BOOTSTRAP_BLOCK_DAYS,
+    chunk_size: int = 2_000,
+    prev_date: pd.Timestamp | None = None,
+    cost_method: str = "average",
+    inflation: float = 0.0,
+    start_lots: LotBook | None = None,
+) -> dict:
+    # Same cash-flow, lot and rebalancing rules as run_holdings_engine, applied to
+    # a (paths × assets) holdings matrix, so drift between rebalances and the
+    # cross-asset correlation both shape the outcome. Output matches
+    # run_monte_carlo's dict.
+    t0 = time.perf_counter()
+    weights = np.asarray(weights, dtype=float)
+    seg_starts, seg_ends, is_boundary, skip_year = projection_segments(index, prev_date, withdrawal_month)
+    months = index.month.to_numpy()
+    years = index.year.to_numpy()
+    times = lot_time(index)
+    step = REBALANCE_STEP_MONTHS.get(rebalance)
+    n_segments = len(seg_starts)
+
+    start_holdings = np.asarray(start_holdings, dtype=float)
+    start_capital = float(start_holdings.sum())
+    n_assets = len(weights)
+    ones = np.ones(n_assets)
+    if step and prev_date is not None and is_boundary[0] and prev_date.month % step == 0:
+        start_holdings = start_capital * weights
+    wd_frac = withdrawal_rate / 100.0
+    ruin_level = start_capital * DEPLETION_FRACTION
+
+    samples = np.empty((n_paths, n_segments), dtype=float)
+    depleted = np.zeros(n_paths, dtype=bool)
+    tax_paid = np.zeros(n_paths, dtype=float)
+    withdrawn_net = np.zeros(n_paths, dtype=float)
+    liquidation_tax = np.zeros(n_paths, dtype=float)
+
+    for c, p0 in enumerate(range(0, n_paths, chunk_size)):
+        p1 = min(p0 + chunk_size, n_paths)
+        sampler = ReturnSampler(history, method, np.random.default_rng([seed, c]), p1 - p0, block_days)
+        holdings = np.tile(start_holdings, (p1 - p0, 1))
+        lots = start_lots_for(start_lots, p1 - p0, n_segments, start_capital, start_cost_basis, times[0], cost_method, inflation)
+
+        for j, (s, e) in enumerate(zip(seg_starts, seg_ends)):
+            growth = sampler.draw(e - s)
+            growth += 1.0
+            holdings *= growth[0]
+
+            if is_boundary[s]:
+                if monthly_contribution > 0:
+                    lots.buy(monthly_contribution, holdings @ ones, times[s])
+                    holdings += monthly_contribution * weights
+
+                if wd_frac > 0 and months[s] == withdrawal_month and years[s] != skip_year:
+                    capital = holdings.sum(axis=1)
+                    gross_wd = capital * wd_frac
+                    tax = np.maximum(lots.sell(min(wd_frac, 1.0), capital, times[s]), 0.0) * tax_rate
+                    tax_paid[p0:p1] += tax
+                    withdrawn_net[p0:p1] += gross_wd - tax
+                    remaining = np.maximum(capital - gross_wd, 0.0)
+                    holdings *= np.divide(remaining, capital, out=np.zeros_like(capital), where=capital > 0)[:, None]
+
+            if wd_frac > 0:
+                # Depletion is checked on every day, so the daily values are needed.
+                growth[0] = holdings
+                np.cumprod(growth, axis=0, out=growth)
+                values = growth.reshape(-1, n_assets) @ ones
+                depleted[p0:p1] |= values.reshape(e - s, -1).min(axis=0) <= ruin_level
+                holdings = growth[-1].copy()
+            elif e - s > 1:
+                holdings *= growth[1:].prod(axis=0)
+            samples[p0:p1, j] = holdings @ ones
+
+            if step and j < n_segments - 1 and months[e - 1] % step == 0:
+                holdings = samples[p0:p1, j, None] * weights
+        liquidation_tax[p0:p1] = np.maximum(lots.unrealized(samples[p0:p1, -1], times[-1]), 0.0) * tax_rate
+
+    bands = np.percentile(samples, MC_PERCENTILES, axis=0)
+    elapsed = time.perf_counter() - t0
+    return {
+        "dates": index[seg_ends - 1],
+        "bands": dict(zip(MC_PERCENTILES, bands)),
+        "ruin_prob": float(depleted.mean()) if wd_frac > 0 else None,
+        "median_end": float(np.median(samples[:, -1])),
+        "median_tax_paid": float(np.median(tax_paid)),
+        "median_withdrawn_net": float(np.median(withdrawn_net)),
+        "median_liquidation_tax": float(np.median(liquidation_tax)),
+        "n_paths": n_paths,
+        "method": method,
+        "elapsed": elapsed,
+        "paths_per_sec": n_paths / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+def scale_monte_carlo(mc: dict, factor: float) -> dict:
+    return {
+        **mc,
+        "bands": {p: band * factor for p, band in mc["bands"].items()},
+        "median_end": mc["median_end"] * factor,
+        "median_tax_paid": mc["median_tax_paid"] * factor,
+        "median_withdrawn_net": mc["median_withdrawn_net"] * factor,
+        "median_liquidation_tax": mc.get("median_liquidation_tax", 0.0) * factor,
+    }
+
+
+def scenario_returns(
+    market, assets: list[str], start_y, end_y, seed: int = 42
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DatetimeIndex]:
+    # The daily asset returns a simulation runs on: the history from the
+    # start year, then (past today) a future drawn from the assets'
+    # historical mean/covariance by a generator of its own, seeded with
+    # `seed`, so the draw neither depends on nor disturbs numpy's global
+    # state. Also returns the whole return history and the future's dates
+    # (empty when there is none).
+    today = datetime.today()
+    sim_start, sim_end, _, _ = simulation_window(start_y, end_y)
+    returns_df = market.returns(assets)
+    if returns_df.empty:
+        return returns_df, returns_df, pd.DatetimeIndex([])
+    hist_returns = returns_df[returns_df.index >= pd.Timestamp(sim_start)]
+    if sim_end <= today:
+        return returns_df, hist_returns, pd.DatetimeIndex([])
+    future_days = pd.bdate_range(start=today + timedelta(days=1), end=sim_end)
+    rng = np.random.default_rng(seed)
+    future_returns = rng.multivariate_normal(returns_df.mean().to_numpy(), returns_df.cov().to_numpy(), len(future_days))
+    combined_returns = pd.concat([hist_returns, pd.DataFrame(future_returns, index=future_days, columns=returns_df.columns)])
+    return returns_df, combined_returns, future_days
+
+
+def simulate_portfolio(
+    port_cfg: dict,
+    market,
+    initial: float,
+    monthly_contribution: float,
+    start_y,
+    end_y,
+    rebalance: str | None = None,
+    tax_rate: float = 0.25,
+    mc_paths: int = 0,
+    mc_method: str = "bootstrap",
+    mc_seed: int = 42,
+    fx=None,
+    cost_method: str = "average",
+    inflation: float = 0.0,
+) -> tuple[pd.Series, dict]:
+    # Pure entry point: portfolio config + MarketData in, daily value series
+    # and summary stats out. Future years (past today) are drawn from the
+    # assets' historical mean/covariance with a fixed seed; with mc_paths the
+    # future is also projected as a Monte Carlo fan (see MC_METHODS).
+    # With an FxSeries, `initial`/`monthly_contribution` and every money
+    # figure out are in its currency, converted at each date's own rate;
+    # the Monte Carlo fan holds the latest rate. Gains are taxed per lot
+    # (cost_method "fifo" or "average", costs indexed by `inflation`).
+    assets = port_cfg["assets"]
+    weights_dict = port_cfg["weights"]
+    withdrawal_rate = port_cfg.get("withdrawal_rate", 0.0)
+    withdrawal_month = port_cfg.get("withdrawal_month", 1)
+
+    if not assets or not weights_dict:
+        return pd.Series(dtype=float), {}
+    dropped = market.missing(assets)
+    assets = [a for a in assets if a not in dropped]
+    total_w = sum(weights_dict.get(a, 0) for a in assets)
+    if not assets or total_w == 0:
+        return pd.Series(dtype=float), {}
+
+    norm_weights = np.array([weights_dict.get(a, 0) / total_w for a in assets])
+    today = datetime.today()
+
+    with stage("returns"):
+        returns_df, combined_returns, future_days = scenario_returns(market, assets, start_y, end_y)
+        if returns_df.empty:
+            return pd.Series(dtype=float), {}
+        if len(future_days):
+            port_daily_returns = (returns_df * norm_weights).sum(axis=1)
+            mean_daily = port_daily_returns.mean()
+            std_daily = port_daily_returns.std()
+
+    if combined_returns.empty:
+        return pd.Series(dtype=float), {}
+
+    fx_rates = fx.asof(combined_returns.index) if fx is not None else None
+
+    with stage("holdings_engine"):
+        values, flows = run_holdings_engine(
+            combined_returns.to_numpy(dtype=float), combined_returns.index, norm_weights, rebalance,
+            initial, monthly_contribution, withdrawal_rate, withdrawal_month, tax_rate, fx_rates, cost_method, inflation,
+        )
+        series = pd.Series(values, index=combined_returns.index)
+
+    monte_carlo = None
+    if mc_paths and len(future_days):
+        hist_n = int((combined_returns.index <= pd.Timestamp(today)).sum())
+        # The projection runs in USD at the latest rate and is converted back.
+        mc_rate = 1.0 if fx_rates is None else float(fx_rates[max(hist_n - 1, 0)])
+        if hist_n:
+            _, hist_flows = run_holdings_engine(
+                combined_returns.to_numpy(dtype=float)[:hist_n], combined_returns.index[:hist_n], norm_weights, rebalance,
+                initial, monthly_contribution, withdrawal_rate, withdrawal_month, tax_rate,
+                None if fx_rates is None else fx_rates[:hist_n], cost_method, inflation,
+            )
+            mc_holdings, mc_cost_basis = hist_flows["holdings"], hist_flows["cost_basis"] / mc_rate
+            mc_lots = hist_flows["lots"].tile(1, scale=1.0 / mc_rate)
+            prev_date = combined_returns.index[hist_n - 1]
+        else:
+            mc_holdings, mc_cost_basis, prev_date = float(initial) / mc_rate * norm_weights, float(initial) / mc_rate, None
+            mc_lots = None
+        with stage("monte_carlo"):
+            if mc_method == "single":
+                monte_carlo = run_monte_carlo(
+                    mean_daily, std_daily, future_days, float(mc_holdings.sum()), mc_cost_basis,
+                    monthly_contribution / mc_rate, withdrawal_rate, withdrawal_month, tax_rate,
+                    n_paths=mc_paths, seed=mc_seed, prev_date=prev_date,
+                    cost_method=cost_method, inflation=inflation, start_lots=mc_lots,
+                )
+            else:
+                monte_carlo = run_asset_monte_carlo(
+                    returns_df.to_numpy(), norm_weights, rebalance, future_days, mc_holdings, mc_cost_basis,
+                    monthly_contribution / mc_rate, withdrawal_rate, withdrawal_month, tax_rate,
+                    n_paths=mc_paths, seed=mc_seed, method=mc_method, prev_date=prev_date,
+                    cost_method=cost_method, inflation=inflation, start_lots=mc_lots,
+                )
+        if mc_rate != 1.0:
+            monte_carlo = scale_monte_carlo(monte_carlo, mc_rate)
+
+    with stage("metrics"):
+        metrics = series_metrics(values, combined_returns.index, start_value=float(initial))
+
+    return series, {
+        **metrics,
+        "total_invested": flows["total_invested"], "cost_basis": flows["cost_basis"],
+        "total_withdrawn_gross": flows["total_withdrawn_gross"],
+        "total_tax_paid": flows["total_tax_paid"],
+        "total_withdrawn_net": flows["total_withdrawn_net"],
+        "realized_gain": float(flows["realized_gains"].sum()),
+        "liquidation_gain": flows["liquidation_gain"],
+        "liquidation_tax": flows["liquidation_tax"],
+        "rebalance_count": len(flows["turnover"]),
+        "avg_turnover": float(flows["turnover"].mean() * 100) if len(flows["turnover"]) else 0.0,
+        "monte_carlo": monte_carlo,
+        "dropped_assets": dropped,
+    }
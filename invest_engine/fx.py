@@ -0,0 +1,66 @@
+"""Daily exchange-rate history with as-of lookup."""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Quote currencies in minor units (pence, agorot, cents) and their major
+# currency; Yahoo quotes LSE in GBp and TASE in ILA.
+MINOR_CURRENCIES = {"GBp": ("GBP", 100.0), "GBX": ("GBP", 100.0), "ILA": ("ILS", 100.0), "ZAc": ("ZAR", 100.0)}
+
+
+def fx_ticker(currency: str) -> str:
+    return f"USD{currency}=X"
+
+
+def major_currency(currency: str) -> tuple[str, float]:
+    return MINOR_CURRENCIES.get(currency, (currency, 1.0))
+
+
+USDILS_TICKER = fx_ticker("ILS")
+
+
+class FxSeries:
+    # Units of the investor's currency per USD, one rate per quote date.
+    # Lookups are as-of: a date takes the last rate on or before it, dates
+    # before the history take the first rate and dates after it (weekends,
+    # holidays, the projected future) carry the latest one forward.
+    def __init__(self, dates, rates, ticker: str = USDILS_TICKER):
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        rates = np.asarray(rates, dtype=np.float64)
+        valid = np.isfinite(rates) & (rates > 0)
+        if not valid.any():
+            raise ValueError(f"no usable {ticker} rates")
+        self.ticker = ticker
+        self.dates = dates[valid]
+        self.rates = rates[valid]
+        self.key = hashlib.sha1(self.dates.tobytes() + self.rates.tobytes()).hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.rates)
+
+    @property
+    def first_date(self) -> pd.Timestamp:
+        return pd.Timestamp(self.dates[0])
+
+    @property
+    def latest(self) -> float:
+        return float(self.rates[-1])
+
+    def asof(self, index) -> np.ndarray:
+        days = pd.DatetimeIndex(index).to_numpy(dtype="datetime64[D]")
+        pos = np.searchsorted(self.dates, days, side="right") - 1
+        return self.rates[np.clip(pos, 0, None)]
+
+    def convert(self, series: pd.Series) -> pd.Series:
+        # USD series → investor's currency, each point at its own date's rate.
+        return series * self.asof(series.index)
+
+
+def load_fx(store, ticker: str = USDILS_TICKER) -> FxSeries:
+    # The whole history in one read: the store fetches it once and only the
+    # tail afterwards, so every portfolio and rerun shares the same vector.
+    store.refresh([ticker], pd.Timestamp.today().normalize())
+    dates, rates = store.window(ticker, "1900-01-01", pd.Timestamp.today() + pd.Timedelta(days=1))
+    return FxSeries(np.array(dates), np.array(rates), ticker)
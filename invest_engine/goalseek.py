@@ -0,0 +1,212 @@
+"""Goal seeking: the monthly deposit or withdrawal rate that meets a target."""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from .cohorts import monthly_growth
+from .engine import DEPLETION_FRACTION, REBALANCE_STEP_MONTHS, ReturnSampler, month_boundaries, scenario_returns
+
+GOAL_PATHS = 1_000
+GOAL_RATE_TOLERANCE = 0.01  # percentage points
+GOAL_MAX_RATE = 100.0
+
+
+class GoalPaths:
+    # A scenario's returns preloaded once as month-level growth (see
+    # monthly_growth), so every solver iteration is a single pass over
+    # months with no return drawing or daily products. The first
+    # `n_shared` months are common to all paths (the history, or the whole
+    # scenario when there is a single path) and stored once as (months ×
+    # assets); the rest are (months × paths × assets).
+    def __init__(
+        self, shared_first: np.ndarray, shared_rest: np.ndarray, first: np.ndarray, rest: np.ndarray,
+        month_ends: pd.DatetimeIndex, flow_fx: np.ndarray, end_fx: np.ndarray, weights: np.ndarray,
+        rebalance: str | None, withdrawal_month: int,
+    ):
+        self.shared_first, self.shared_rest = shared_first, shared_rest
+        self.first, self.rest = first, rest
+        self.month_ends = month_ends
+        self.flow_fx, self.end_fx = flow_fx, end_fx
+        self.weights = np.asarray(weights, dtype=float)
+        self.n_shared = len(shared_first)
+        self.n_months = self.n_shared + len(first)
+        self.n_paths = first.shape[1] if len(first) else 1
+        months = month_ends.month.to_numpy()
+        step = REBALANCE_STEP_MONTHS.get(rebalance)
+        self.withdraw = (months == withdrawal_month) & (np.arange(self.n_months) > 0)
+        self.rebalance = np.zeros(self.n_months, dtype=bool)
+        if step:
+            self.rebalance[:-1] = months[:-1] % step == 0
+
+    def run(self, initial: float, monthly_contribution: float, withdrawal_rate: float) -> tuple[np.ndarray, np.ndarray]:
+        # End value and lowest month-end value per path, under the cash-flow
+        # and rebalancing rules of run_holdings_engine. End values match the
+        # daily engine exactly; depletion is only seen at month ends, as in
+        # rolling_cohorts.
+        keep = 1.0 - min(withdrawal_rate / 100.0, 1.0)
+        buy = self.weights[None, :]
+        holdings = float(initial) / self.flow_fx[0] * buy
+        low = np.full(self.n_paths, np.inf)
+        for k in range(self.n_months):
+            if k < self.n_shared:
+                first, rest = self.shared_first[k], self.shared_rest[k]
+            else:
+                first, rest = self.first[k - self.n_shared], self.rest[k - self.n_shared]
+            holdings = holdings * first
+            if k > 0:
+                if monthly_contribution > 0:
+                    holdings = holdings + monthly_contribution / self.flow_fx[k] * buy
+                if keep < 1.0 and self.withdraw[k]:
+                    holdings = holdings * keep
+            holdings = holdings * rest
+            value = holdings.sum(axis=1) * self.end_fx[k]
+            np.minimum(low, value, out=low)
+            if self.rebalance[k]:
+                holdings = (value / self.end_fx[k])[:, None] * buy
+        return np.broadcast_to(value, low.shape).copy(), low
+
+
+def goal_paths(
+    port_cfg: dict,
+    market,
+    start_y,
+    end_y,
+    rebalance: str | None = None,
+    n_paths: int = 0,
+    method: str = "bootstrap",
+    seed: int = 42,
+    fx=None,
+) -> GoalPaths | None:
+    # Same portfolio handling and scenario as simulate_portfolio (missing
+    # assets dropped, weights renormalized). Without n_paths, or with no
+    # future in the window, the solver sees that one scenario; with n_paths
+    # the future is replaced by n_paths draws of the Monte Carlo model
+    # (run_asset_monte_carlo's sampler and seed; "single" draws one normal
+    # portfolio return per day). With an FxSeries, cash flows and values are
+    # in its currency at each month's rate, as in simulate_portfolio.
+    assets = [a for a in port_cfg["assets"] if a not in market.missing(port_cfg["assets"])]
+    weights_dict = port_cfg["weights"]
+    total_w = sum(weights_dict.get(a, 0) for a in assets)
+    if not assets or total_w == 0:
+        return None
+    weights = np.array([weights_dict.get(a, 0) / total_w for a in assets])
+    returns_df, combined, future_days = scenario_returns(market, assets, start_y, end_y)
+    if combined.empty:
+        return None
+
+    index = combined.index
+    growth = 1.0 + combined.to_numpy(dtype=float)
+    first, rest, month_ends = monthly_growth(combined.to_numpy(dtype=float), index)
+    starts = np.concatenate(([0], month_boundaries(index)))
+    ends = np.append(starts[1:], len(index))
+    hist_n = len(index) - len(future_days)
+    n_shared = len(starts) if not n_paths or not len(future_days) else int((ends <= hist_n).sum())
+
+    drawn_first, drawn_rest = [], []
+    if n_shared < len(starts):
+        rng = np.random.default_rng([seed, 0])
+        history = returns_df.to_numpy()
+        if method == "single":
+            port = history @ weights
+            mean, std = port.mean(), port.std(ddof=1)
+        else:
+            sampler = ReturnSampler(history, method, rng, n_paths)
+        for s, e in zip(starts[n_shared:], ends[n_shared:]):
+            n_days = e - max(s, hist_n)
+            if method == "single":
+                g = rng.standard_normal((n_days, n_paths)) * std + (1.0 + mean)
+                g = np.broadcast_to(g[:, :, None], (n_days, n_paths, len(assets)))
+            else:
+                g = sampler.draw(n_days)
+                g += 1.0
+            if s < hist_n:
+                # The month today falls in: its first days are history.
+                drawn_first.append(np.broadcast_to(growth[s], (n_paths, growth.shape[1])))
+                drawn_rest.append(growth[s + 1:hist_n].prod(axis=0) * g.prod(axis=0))
+            else:
+                drawn_first.append(g[0])
+                drawn_rest.append(g[1:].prod(axis=0))
+
+    if fx is not None:
+        flow_fx, end_fx = fx.asof(index[starts]), fx.asof(index[ends - 1])
+    else:
+        flow_fx = end_fx = np.ones(len(starts))
+    return GoalPaths(
+        first[:n_shared], rest[:n_shared],
+        np.stack(drawn_first) if drawn_first else np.empty((0, 1, len(assets))),
+        np.stack(drawn_rest) if drawn_rest else np.empty((0, 1, len(assets))),
+        month_ends, flow_fx, end_fx, weights, rebalance, port_cfg.get("withdrawal_month", 1),
+    )
+
+
+def solve_deposit(
+    paths: GoalPaths, initial: float, target: float, withdrawal_rate: float = 0.0, confidence: float = 0.5,
+) -> dict:
+    # Smallest monthly deposit that ends at or above `target` on at least
+    # `confidence` of the paths. Every rule is proportional to the money in,
+    # so a path ends at base + deposit × per_unit: two runs give each path's
+    # break-even deposit and the answer is their `confidence` quantile, with
+    # no search at all. None when no deposit gets there.
+    t0 = time.perf_counter()
+    base, _ = paths.run(initial, 0.0, withdrawal_rate)
+    per_unit, _ = paths.run(0.0, 1.0, withdrawal_rate)
+    need = np.divide(target - base, per_unit, out=np.full(paths.n_paths, np.inf), where=per_unit > 0)
+    need[base >= target] = 0.0
+    deposit = float(np.quantile(need, confidence, method="inverted_cdf"))
+    found = np.isfinite(deposit)
+    return {
+        "value": deposit if found else None,
+        "success": float((need <= deposit).mean()) if found else float((need == 0).mean()),
+        "evaluations": 2,
+        "n_paths": paths.n_paths,
+        "elapsed": time.perf_counter() - t0,
+    }
+
+
+def solve_withdrawal_rate(
+    paths: GoalPaths, initial: float, monthly_contribution: float, survival: float = 0.9,
+    target_end: float | None = None, tolerance: float = GOAL_RATE_TOLERANCE,
+) -> dict:
+    # Highest annual withdrawal rate (%) at which at least `survival` of the
+    # paths never fall below DEPLETION_FRACTION of the initial capital and,
+    # with target_end, still end at or above it. Both only get harder as the
+    # rate rises, but the success share is a step function over paths, so
+    # bisection (not secant) over [0, GOAL_MAX_RATE] down to `tolerance`.
+    # None when even no withdrawals miss the target.
+    t0 = time.perf_counter()
+    ruin_level = float(initial) * DEPLETION_FRACTION
+    evaluations = 0
+
+    def success(rate: float) -> float:
+        nonlocal evaluations
+        evaluations += 1
+        end, low = paths.run(initial, monthly_contribution, rate)
+        ok = low > ruin_level if initial > 0 else np.ones(paths.n_paths, dtype=bool)
+        if target_end is not None:
+            ok &= end >= target_end
+        return float(ok.mean())
+
+    lo, hi = 0.0, GOAL_MAX_RATE
+    lo_share = success(lo)
+    if lo_share < survival:
+        rate, share = None, lo_share
+    elif (hi_share := success(hi)) >= survival:
+        rate, share = hi, hi_share
+    else:
+        while hi - lo > tolerance:
+            mid = (lo + hi) / 2.0
+            mid_share = success(mid)
+            if mid_share >= survival:
+                lo, lo_share = mid, mid_share
+            else:
+                hi = mid
+        rate, share = lo, lo_share
+    return {
+        "value": rate,
+        "success": share,
+        "evaluations": evaluations,
+        "n_paths": paths.n_paths,
+        "elapsed": time.perf_counter() - t0,
+    }
@@ -0,0 +1,206 @@
+"""Per-lot cost basis and realized capital gains."""
+
+import numpy as np
+import pandas as pd
+
+COST_METHODS = ("fifo", "average")
+LOT_BLOCK = 32
+YEAR_NS = 365.25 * 86_400 * 1e9
+
+
+def lot_time(dates) -> np.ndarray:
+    # Dates → fractional years, the clock lot indexation runs on.
+    return pd.DatetimeIndex(dates).asi8 / YEAR_NS
+
+
+def taxable_gain(proceeds: np.ndarray, cost: np.ndarray, indexed_cost: np.ndarray) -> np.ndarray:
+    # Only the real gain over the indexed cost is taxed; a loss is the
+    # nominal loss below cost, and in between there is neither. Summed over
+    # the last axis (lots).
+    gain = proceeds - indexed_cost
+    np.maximum(gain, 0.0, out=gain)
+    loss = proceeds - cost
+    np.minimum(loss, 0.0, out=loss)
+    return gain.sum(axis=-1) + loss.sum(axis=-1)
+
+
+class LotBook:
+    # Open tax lots for a batch of paths as (paths × lots) arrays of units and
+    # cost; every path buys on the same dates, so purchase times are one
+    # shared vector. Units are shares of the whole portfolio (unit value =
+    # portfolio value / total units), which holds because withdrawals sell
+    # assets pro rata and rebalancing is not a taxable sale here.
+    #
+    # "fifo" sells the oldest lots first; fully sold lots move behind `head`
+    # and a sale only scans lots from there, LOT_BLOCK lots at a time, until
+    # the requested units are covered. "average" sells the same fraction of
+    # every lot, so a sale only rescales a per-path `factor` (stored
+    # units/cost × factor = actual) and never touches the lot arrays.
+    #
+    # With `inflation` (annual), lot costs are indexed for the years held
+    # before gains are taxed. Without it gains are linear and pricing a sale
+    # needs no per-lot pass. With it, a lot above its indexed cost still
+    # contributes linearly; only lots that may sit below it need the exact
+    # rule. Each block of LOT_BLOCK lots keeps, per path, the highest real
+    # (deflated) unit cost bought into it, so only (path, block) pairs
+    # whose unit price is under that bound get the exact per-lot pass.
+    def __init__(self, n_paths: int, capacity: int = 16, method: str = "average", inflation: float = 0.0):
+        if method not in COST_METHODS:
+            raise ValueError(f"unknown cost method {method!r} (expected one of {', '.join(COST_METHODS)})")
+        if inflation < 0:
+            raise ValueError("inflation indexing only applies to rising prices (inflation >= 0)")
+        self.method = method
+        self.inflation = float(inflation)
+        n_blocks = max(-(-int(capacity) // LOT_BLOCK), 1)
+        self.units = np.zeros((n_paths, n_blocks * LOT_BLOCK))
+        self.cost = np.zeros_like(self.units)
+        self.deflator = np.ones(self.units.shape[1])  # 1 / index level at purchase
+        self.block_max = np.zeros((n_paths, n_blocks))  # highest real unit cost per block
+        self.factor = np.ones(n_paths)
+        self.total_units = np.zeros(n_paths)
+        self.stored_cost = np.zeros(n_paths)
+        self.real_cost = np.zeros(n_paths)  # Σ cost × deflator, stored units
+        self.head = 0
+        self.n = 0
+
+    @property
+    def n_paths(self) -> int:
+        return len(self.total_units)
+
+    @property
+    def cost_basis(self) -> np.ndarray:
+        return self.stored_cost * self.factor
+
+    def reserve(self, n_lots: int):
+        need = self.n + int(n_lots)
+        if need > self.units.shape[1]:
+            extra = -(-(max(need, 2 * self.units.shape[1]) - self.units.shape[1]) // LOT_BLOCK)
+            self.units = np.pad(self.units, ((0, 0), (0, extra * LOT_BLOCK)))
+            self.cost = np.pad(self.cost, ((0, 0), (0, extra * LOT_BLOCK)))
+            self.deflator = np.pad(self.deflator, (0, extra * LOT_BLOCK), constant_values=1.0)
+            self.block_max = np.pad(self.block_max, ((0, 0), (0, extra)))
+
+    def index_level(self, t: float) -> float:
+        return (1.0 + self.inflation) ** t if self.inflation else 1.0
+
+    def add(self, units, cost, t: float):
+        self.reserve(1)
+        deflator = 1.0 / self.index_level(t)
+        units = np.broadcast_to(np.asarray(units, dtype=float), self.total_units.shape)
+        cost = np.broadcast_to(np.asarray(cost, dtype=float), self.total_units.shape)
+        self.units[:, self.n] = units / self.factor
+        self.cost[:, self.n] = cost / self.factor
+        self.deflator[self.n] = deflator
+        self.total_units += units
+        self.stored_cost += cost / self.factor
+        self.real_cost += cost * deflator / self.factor
+        if self.inflation:
+            unit_cost = np.divide(cost, units, out=np.zeros(self.n_paths), where=units > 0) * deflator
+            block = self.block_max[:, self.n // LOT_BLOCK]
+            np.maximum(block, unit_cost, out=block)
+        self.n += 1
+
+    def buy(self, amount, value, t: float):
+        # `amount` of new money into a portfolio worth `value` just before
+        # the purchase; an empty portfolio restarts at one unit per money unit.
+        value = np.broadcast_to(np.asarray(value, dtype=float), self.total_units.shape)
+        price = np.divide(value, self.total_units, out=np.ones(self.n_paths), where=(self.total_units > 0) & (value > 0))
+        self.add(amount / price, amount, t)
+
+    def _price(self, value) -> np.ndarray:
+        value = np.broadcast_to(np.asarray(value, dtype=float), self.total_units.shape)
+        return np.divide(value, self.total_units, out=np.zeros(self.n_paths), where=self.total_units > 0)
+
+    def _gain(self, proceeds: np.ndarray, cost: np.ndarray, lo: int, hi: int, t: float) -> np.ndarray:
+        # Summed taxable gain of lots lo:hi (columns of proceeds/cost).
+        if not self.inflation:
+            return proceeds.sum(axis=1) - cost.sum(axis=1)
+        indexed = cost * np.maximum(self.deflator[lo:hi] * self.index_level(t), 1.0)
+        return taxable_gain(proceeds, cost, indexed)
+
+    def unrealized(self, value, t: float) -> np.ndarray:
+        # Taxable gain per path if everything were sold now at `value`.
+        value = np.broadcast_to(np.asarray(value, dtype=float), self.total_units.shape)
+        held = self.total_units > 0
+        if not self.inflation:
+            return np.where(held, value - self.cost_basis, 0.0)
+        level = self.index_level(t)
+        price = self._price(value)
+        gain = np.where(held, value - self.real_cost * self.factor * level, 0.0)
+        b0, b1 = self.head // LOT_BLOCK, -(-self.n // LOT_BLOCK)
+        rows, blocks = np.nonzero(held[:, None] & (self.block_max[:, b0:b1] * level > price[:, None]))
+        if len(rows):
+            # Replace the linear estimate of each flagged block by the exact
+            # rule. Both are homogeneous per path, so they run on the stored
+            # arrays and are scaled by `factor` afterwards.
+            cols = (blocks + b0)[:, None] * LOT_BLOCK + np.arange(LOT_BLOCK)
+            proceeds = self.units[rows[:, None], cols] * price[rows, None]
+            cost = self.cost[rows[:, None], cols]
+            deflator = self.deflator[cols]
+            exact = taxable_gain(proceeds, cost, cost * np.maximum(deflator * level, 1.0))
+            linear = proceeds.sum(axis=1) - (cost * deflator).sum(axis=1) * level
+            gain += np.bincount(rows, (exact - linear) * self.factor[rows], minlength=self.n_paths)
+        return gain
+
+    def sell(self, frac, value, t: float) -> np.ndarray:
+        # Sells `frac` of each path's position (portfolio worth `value`) and
+        # returns the realized taxable gain per path (negative = net loss).
+        frac = np.broadcast_to(np.asarray(frac, dtype=float), self.total_units.shape)
+        if self.method == "average":
+            # Gains are homogeneous in the lot sizes: selling a fraction of
+            # every lot realizes that fraction of the unrealized gain.
+            gain = frac * self.unrealized(value, t)
+            self.factor = self.factor * (1.0 - frac)
+            self.total_units = self.total_units * (1.0 - frac)
+            emptied = self.factor <= 0
+            if emptied.any():
+                self.units[emptied] = 0.0
+                self.cost[emptied] = 0.0
+                self.stored_cost[emptied] = 0.0
+                self.real_cost[emptied] = 0.0
+                self.block_max[emptied] = 0.0
+                self.factor[emptied] = 1.0
+            return gain
+
+        price = self._price(value)
+        left = self.total_units * frac
+        gain = np.zeros(self.n_paths)
+        lo = self.head
+        while lo < self.n and (left > 0).any():
+            hi = min(lo + LOT_BLOCK, self.n)
+            units = self.units[:, lo:hi]
+            cost = self.cost[:, lo:hi]
+            before = np.cumsum(units, axis=1) - units
+            sold = np.clip(left[:, None] - before, 0.0, units)
+            sold_cost = cost * np.divide(sold, units, out=np.zeros_like(sold), where=units > 0)
+            gain += self._gain(sold * price[:, None], sold_cost, lo, hi, t)
+            units -= sold
+            cost -= sold_cost
+            sold_units = sold.sum(axis=1)
+            left -= sold_units
+            self.total_units -= sold_units
+            self.stored_cost -= sold_cost.sum(axis=1)
+            self.real_cost -= sold_cost @ self.deflator[lo:hi]
+            lo = hi
+        while self.head < self.n and not (self.units[:, self.head] > 1e-12).any():
+            self.head += 1
+        return gain
+
+    def tile(self, n_paths: int, scale: float = 1.0, reserve: int = 0) -> "LotBook":
+        # A single-path book (e.g. the end of the history) copied onto
+        # n_paths, costs scaled by `scale`, with room for `reserve` more lots.
+        lo, hi = self.head, self.n
+        book = LotBook(n_paths, hi - lo + reserve, self.method, self.inflation)
+        book.n = hi - lo
+        book.units[:, :book.n] = self.units[0, lo:hi] * self.factor[0]
+        book.cost[:, :book.n] = self.cost[0, lo:hi] * self.factor[0] * scale
+        book.deflator[:book.n] = self.deflator[lo:hi]
+        book.total_units[:] = self.total_units[0]
+        book.stored_cost[:] = self.stored_cost[0] * self.factor[0] * scale
+        book.real_cost[:] = self.real_cost[0] * self.factor[0] * scale
+        if self.inflation:
+            units, real = book.units[0, :book.n], book.cost[0, :book.n] * book.deflator[:book.n]
+            unit_cost = np.zeros(book.units.shape[1])
+            np.divide(real, units, out=unit_cost[:book.n], where=units > 0)
+            book.block_max[:] = unit_cost.reshape(-1, LOT_BLOCK).max(axis=1)
+        return book
@@ -0,0 +1,121 @@
+"""Aligned multi-ticker price matrices."""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .fx import fx_ticker, load_fx, major_currency
+
+
+class MarketData:
+    # Closes for the union of all portfolio tickers, aligned once on a shared
+    # date axis as a (dates × tickers) float32 matrix; portfolios pick columns.
+    # `currencies` records the quote currency each column was converted from.
+    def __init__(
+        self, dates: pd.DatetimeIndex, tickers: list[str], closes: np.ndarray,
+        failed: dict[str, str] | None = None, currencies: dict[str, str] | None = None,
+    ):
+        self.dates = dates
+        self.tickers = tickers
+        self.closes = closes
+        self.failed = failed or {}
+        self.currencies = currencies or {}
+        self.columns = {t: j for j, t in enumerate(tickers)}
+        self._returns = {}
+
+    def missing(self, assets) -> list[str]:
+        return [a for a in assets if a not in self.columns]
+
+    def returns(self, assets) -> pd.DataFrame:
+        # Memoized per asset list: sweeps and repeated portfolios over the
+        # same assets reuse one frame. Callers must not mutate it.
+        key = tuple(assets)
+        cached = self._returns.get(key)
+        if cached is not None:
+            return cached
+        sub = self.closes[:, [self.columns[a] for a in assets]].astype(np.float64)
+        valid = ~np.isnan(sub).any(axis=1)
+        sub, dates = sub[valid], self.dates[valid]
+        if len(sub) < 2:
+            result = pd.DataFrame()
+        else:
+            result = pd.DataFrame(sub[1:] / sub[:-1] - 1.0, index=dates[1:], columns=list(key))
+        self._returns[key] = result
+        return result
+
+    def window(self, start, end) -> "MarketData":
+        # Rows in [start, end) — the same slice PriceStore.load would return
+        # for that range — as a view. Tickers with no prices inside the window
+        # move to `failed`, as they would on a fresh load.
+        lo, hi = self.dates.searchsorted([pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()])
+        closes = self.closes[lo:hi]
+        has_data = ~np.isnan(closes).all(axis=0) if len(closes) else np.zeros(len(self.tickers), dtype=bool)
+        failed = dict(self.failed)
+        if has_data.all():
+            return MarketData(self.dates[lo:hi], self.tickers, closes, failed, self.currencies)
+        failed.update({t: "no data" for t, ok in zip(self.tickers, has_data) if not ok})
+        keep = np.flatnonzero(has_data)
+        rows = ~np.isnan(closes[:, keep]).all(axis=1)
+        return MarketData(self.dates[lo:hi][rows], [self.tickers[j] for j in keep], closes[rows][:, keep], failed, self.currencies)
+
+
+def simulation_window(start_y, end_y) -> tuple[datetime, datetime, datetime, datetime]:
+    today = datetime.today()
+    sim_start = datetime(int(start_y), 1, 1)
+    sim_end = datetime(int(end_y), 12, 31)
+    hist_end = min(sim_end, today)
+    dl_start = sim_start if sim_start < today else today - timedelta(days=10 * 365)
+    return sim_start, sim_end, dl_start, hist_end
+
+
+def market_from_closes(closes: pd.DataFrame, failed: dict[str, str] | None = None, currencies: dict[str, str] | None = None) -> MarketData:
+    if closes.empty:
+        return MarketData(pd.DatetimeIndex([]), [], np.empty((0, 0), dtype=np.float32), failed)
+    closes = closes.sort_index()
+    currencies = {t: currencies[t] for t in closes.columns if t in currencies} if currencies else None
+    return MarketData(closes.index, list(closes.columns), closes.to_numpy(dtype=np.float32), failed, currencies)
+
+
+def closes_in_usd(store, closes: pd.DataFrame, currencies: dict[str, str]) -> tuple[pd.DataFrame, dict[str, str]]:
+    # The engine works in USD; columns quoted in another currency are
+    # converted at each date's USD{CUR}=X rate from the store (minor units
+    # such as pence or agorot scaled to the major first). Columns whose rate
+    # history can't be loaded are dropped and reported as "no fx", and
+    # columns with no known currency as "unknown currency": priced as USD, a
+    # TASE listing in agorot would be off by a factor of ~370.
+    failed, rates, converted = {}, {}, {}
+    for ticker in closes.columns:
+        if currencies.get(ticker) is None:
+            failed[ticker] = "unknown currency"
+            continue
+        currency, divisor = major_currency(currencies[ticker])
+        if currency == "USD":
+            if divisor != 1.0:
+                converted[ticker] = closes[ticker] / divisor
+            continue
+        if currency not in rates:
+            try:
+                rates[currency] = load_fx(store, fx_ticker(currency))
+            except Exception:
+                rates[currency] = None
+        fx = rates[currency]
+        if fx is None:
+            failed[ticker] = "no fx"
+            continue
+        converted[ticker] = closes[ticker] / (divisor * fx.asof(closes.index))
+    if not converted and not failed:
+        return closes, {}
+    return closes.drop(columns=list(failed)).assign(**converted), failed
+
+
+def load_market_data(store, tickers, start_date, end_date, metadata=None) -> MarketData:
+    # With a MetadataStore, non-USD listings are converted to USD first, by
+    # the currencies it resolves (see MetadataStore.currencies).
+    closes, failed = store.load(tickers, start_date, end_date)
+    currencies = None
+    if metadata is not None and not closes.empty:
+        currencies = metadata.currencies(list(closes.columns))
+        closes, no_fx = closes_in_usd(store, closes, currencies)
+        failed = {**failed, **no_fx}
+    return market_from_closes(closes, failed, currencies)
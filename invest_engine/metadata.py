@@ -0,0 +1,177 @@
+"""Cached asset metadata: name, currency, exchange, asset class, expense ratio."""
+
+import json
+import os
+import threading
+import time
+
+from .profiling import count, stage
+from .store import TickerNotFound, fetch_concurrently
+from .tickers import TICKER_DB
+
+METADATA_PATH = os.environ.get(
+    "METADATA_PATH", os.path.join(os.path.expanduser("~"), ".cache", "investment_app", "metadata.json"),
+)
+METADATA_TTL = 30 * 86400.0
+METADATA_MISSING_TTL = 86400.0
+METADATA_FIELDS = ("name", "currency", "exchange", "asset_class", "expense_ratio")
+METADATA_LOOKUP_TIMEOUT = 3.0
+
+
+def presumed_usd(ticker: str) -> bool:
+    # US listings carry no exchange suffix (".TA", ".L"), index caret or
+    # "=X" rate marker; their quote currency is USD without a lookup.
+    return ticker in TICKER_DB or not any(c in ticker for c in ".^=")
+
+
+class YFinanceInfoProvider:
+    # fetch() has the price providers' signature (the start date is
+    # ignored), so fetch_concurrently's workers, retries and timeout apply.
+    def fetch(self, ticker: str, start=None) -> dict:
+        import yfinance as yf
+
+        info = yf.Ticker(ticker).info or {}
+        if info.get("quoteType") in (None, "NONE"):
+            raise TickerNotFound(ticker)
+        expense = info.get("netExpenseRatio")  # already in percent
+        if expense is None and info.get("annualReportExpenseRatio") is not None:
+            expense = info["annualReportExpenseRatio"] * 100
+        return {
+            "name": info.get("shortName") or info.get("longName") or ticker,
+            "currency": info.get("currency"),
+            "exchange": info.get("exchange"),
+            "asset_class": info.get("quoteType"),
+            "expense_ratio": expense,
+        }
+
+
+class SyntheticInfoProvider:
+    # Offline metadata for tests and benchmarks: TICKER_DB names, USD unless
+    # `currencies` says otherwise (".TA" symbols default to agorot), and
+    # tickers in `missing` never resolve.
+    def __init__(self, currencies: dict[str, str] | None = None, missing=(), latency: float = 0.0):
+        self.currencies = dict(currencies or {})
+        self.missing = set(missing)
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def fetch(self, ticker: str, start=None) -> dict:
+        with self._lock:
+            self.calls.append(ticker)
+        if self.latency:
+            time.sleep(self.latency)
+        if ticker in self.missing:
+            raise TickerNotFound(ticker)
+        name = TICKER_DB.get(ticker, ticker)
+        return {
+            "name": name,
+            "currency": self.currencies.get(ticker, "ILA" if ticker.endswith(".TA") else "USD"),
+            "exchange": "TLV" if ticker.endswith(".TA") else "NYQ",
+            "asset_class": "ETF" if "ETF" in name else "EQUITY",
+            "expense_ratio": None,
+        }
+
+
+class MetadataStore:
+    # One JSON file of per-ticker records, each stamped with its fetch time.
+    # Records are refetched after `ttl`; symbols the provider can't resolve
+    # are cached as missing for `missing_ttl`, so a mistyped ticker costs one
+    # lookup a day rather than one per rerun. Transient failures are not
+    # cached. Fetches run outside the lock, so a long prefetch never blocks
+    # a single lookup; writes merge with the file, newest record winning,
+    # so concurrent processes don't drop each other's entries.
+    def __init__(self, path: str, provider=None, ttl: float = METADATA_TTL, missing_ttl: float = METADATA_MISSING_TTL):
+        self.path = path
+        self.provider = provider or YFinanceInfoProvider()
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self._lock = threading.Lock()
+        self._records = self._read()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                records = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        return records if isinstance(records, dict) else {}
+
+    def _save(self):
+        merged = self._read()
+        for ticker, record in self._records.items():
+            if record["fetched_at"] >= merged.get(ticker, {}).get("fetched_at", 0.0):
+                merged[ticker] = record
+        self._records = merged
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(merged, fh, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _fresh(self, record: dict | None, now: float) -> bool:
+        if record is None:
+            return False
+        return now - record["fetched_at"] < (self.missing_ttl if record.get("missing") else self.ttl)
+
+    def lookup(self, tickers, timeout: float | None = None) -> dict[str, dict | None]:
+        # Records for `tickers`, fetching only the absent or expired ones in
+        # one concurrent batch, waiting at most `timeout` seconds (default:
+        # fetch_concurrently's). None for symbols that don't resolve; a
+        # transient failure or timeout falls back to the expired record, if
+        # any.
+        now = time.time()
+        tickers = list(dict.fromkeys(tickers))
+        with self._lock:
+            stale = {t: None for t in tickers if not self._fresh(self._records.get(t), now)}
+        count("metadata_hit", len(tickers) - len(stale))
+        if stale:
+            count("metadata_miss", len(stale))
+            with stage("fetch_metadata"):
+                fetched, failures = fetch_concurrently(self.provider, stale, timeout=timeout)
+            updates = {t: {**{k: info.get(k) for k in METADATA_FIELDS}, "fetched_at": now} for t, info in fetched.items()}
+            updates.update({t: {"missing": True, "fetched_at": now} for t, reason in failures.items() if reason == "not found"})
+            if updates:
+                with self._lock:
+                    self._records.update(updates)
+                    try:
+                        self._save()
+                    except OSError:
+                        pass
+        with self._lock:
+            records = {t: self._records.get(t) for t in tickers}
+        return {t: None if r is None or r.get("missing") else {k: r.get(k) for k in METADATA_FIELDS} for t, r in records.items()}
+
+    def get(self, ticker: str) -> dict | None:
+        return self.lookup([ticker])[ticker]
+
+    def name(self, ticker: str) -> str:
+        record = self.get(ticker)
+        return record["name"] if record else ticker
+
+    def prefetch(self, tickers=None) -> int:
+        # Warms the store for `tickers` (default: all of TICKER_DB); returns
+        # how many resolve.
+        return sum(r is not None for r in self.lookup(TICKER_DB if tickers is None else tickers).values())
+
+    def currencies(self, tickers, timeout: float = METADATA_LOOKUP_TIMEOUT) -> dict[str, str | None]:
+        # Quote currency per ticker from the cached records, whatever their
+        # age (a listing's currency doesn't change). Absent tickers are
+        # looked for in the file too, in case another process has fetched
+        # them since. Uncached US symbols are USD (presumed_usd); other
+        # listings are looked up here, waiting at most `timeout` seconds.
+        # None for those still unresolved: callers must not take them for
+        # USD.
+        tickers = list(dict.fromkeys(tickers))
+        with self._lock:
+            if any(t not in self._records for t in tickers):
+                for ticker, record in self._read().items():
+                    if record["fetched_at"] >= self._records.get(ticker, {}).get("fetched_at", 0.0):
+                        self._records[ticker] = record
+            records = {t: self._records.get(t) or {} for t in tickers}
+        currencies = {t: r.get("currency") or ("USD" if presumed_usd(t) else None) for t, r in records.items()}
+        unknown = [t for t, currency in currencies.items() if currency is None]
+        if unknown and timeout > 0:
+            found = self.lookup(unknown, timeout=timeout)
+            currencies.update({t: r["currency"] for t, r in found.items() if r and r.get("currency")})
+        return currencies
@@ -0,0 +1,136 @@
+"""Risk/return metrics of a value series, accumulated incrementally."""
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class RunningMetrics:
+    # Return moments (merged Welford-style), downside deviation, running peak,
+    # worst drawdown with its peak/trough/recovery dates and the ulcer sum are
+    # kept as a few scalars, so appending new days costs O(new days) and never
+    # revisits history. Formulas follow simulate_portfolio's original pandas
+    # code: returns are pct_change().dropna() and the drawdown curve is the
+    # compounded returns, i.e. the values from the second day on.
+    def __init__(self, start_value: float | None = None):
+        self.start_value = start_value
+        self.first_date = None
+        self.last_date = None
+        self.last_value = None
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_ss = 0.0
+        self.n_curve = 0
+        self.peak = -np.inf
+        self.peak_date = None
+        self.max_dd = 0.0
+        self.max_dd_peak = None
+        self.max_dd_trough = None
+        self.max_dd_recovery = None
+        self._recovery_level = None
+        self.ulcer_ss = 0.0
+
+    def update(self, values, dates) -> "RunningMetrics":
+        v = np.asarray(values, dtype=np.float64)
+        dates = pd.DatetimeIndex(dates)
+        if len(v) == 0:
+            return self
+        if self.last_value is None:
+            if self.start_value is None:
+                self.start_value = float(v[0])
+            self.first_date = dates[0]
+            prev, curve, curve_dates = v[:-1], v[1:], dates[1:]
+        else:
+            prev, curve, curve_dates = np.concatenate(([self.last_value], v[:-1])), v, dates
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = curve / prev - 1.0
+        self.last_value = float(v[-1])
+        self.last_date = dates[-1]
+        valid = ~np.isnan(returns)
+        if not valid.all():
+            returns, curve, curve_dates = returns[valid], curve[valid], curve_dates[valid]
+        self._add_returns(returns)
+        self._add_curve(curve, curve_dates)
+        return self
+
+    def _add_returns(self, r: np.ndarray):
+        nb = len(r)
+        if nb == 0:
+            return
+        mean_b = r.mean()
+        dev = r - mean_b
+        m2_b = float(dev @ dev)
+        n = self.n + nb
+        delta = mean_b - self.mean
+        self.m2 += m2_b + delta * delta * self.n * nb / n
+        self.mean += delta * nb / n
+        self.n = n
+        down = np.minimum(r, 0.0)
+        self.downside_ss += float(down @ down)
+
+    def _add_curve(self, c: np.ndarray, dates: pd.DatetimeIndex):
+        if len(c) == 0:
+            return
+        if self._recovery_level is not None:
+            hit = np.flatnonzero(c >= self._recovery_level)
+            if len(hit):
+                self.max_dd_recovery = dates[hit[0]]
+                self._recovery_level = None
+
+        peak = np.maximum.accumulate(c)
+        np.maximum(peak, self.peak, out=peak)
+        dd = c / peak - 1.0
+        new_high = c >= peak
+        last_high = np.maximum.accumulate(np.where(new_high, np.arange(len(c)), -1))
+
+        j = int(np.argmin(dd))
+        if dd[j] < self.max_dd:
+            self.max_dd = float(dd[j])
+            self.max_dd_peak = dates[last_high[j]] if last_high[j] >= 0 else self.peak_date
+            self.max_dd_trough = dates[j]
+            hit = np.flatnonzero(c[j + 1:] >= peak[j])
+            if len(hit):
+                self.max_dd_recovery = dates[j + 1 + hit[0]]
+                self._recovery_level = None
+            else:
+                self.max_dd_recovery = None
+                self._recovery_level = float(peak[j])
+
+        if last_high[-1] >= 0:
+            self.peak_date = dates[last_high[-1]]
+        self.peak = float(peak[-1])
+        self.ulcer_ss += float(dd @ dd) * 1e4
+        self.n_curve += len(c)
+
+    def result(self) -> dict:
+        start_val = float(self.start_value or 0.0)
+        end_val = self.last_value if self.last_value is not None else start_val
+        n_years = max((self.last_date - self.first_date).days / 365.25, 0.01) if self.first_date is not None else 0.01
+        std = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+        downside = np.sqrt(self.downside_ss / self.n) if self.n else 0.0
+        cagr = ((end_val / start_val) ** (1 / n_years) - 1) * 100 if start_val > 0 else 0
+        max_dd = self.max_dd * 100 if self.n_curve else 0
+        dd_end = self.max_dd_recovery if self.max_dd_recovery is not None else self.last_date
+        return {
+            "start_val": start_val,
+            "end_val": end_val,
+            "n_years": n_years,
+            "total_return_pct": ((end_val / start_val) - 1) * 100 if start_val > 0 else 0,
+            "cagr": cagr,
+            "ann_vol": std * np.sqrt(TRADING_DAYS_PER_YEAR) * 100,
+            "sharpe": (self.mean / std * np.sqrt(TRADING_DAYS_PER_YEAR)) if std > 0 else 0,
+            "sortino": (self.mean / downside * np.sqrt(TRADING_DAYS_PER_YEAR)) if downside > 0 else 0,
+            "max_dd": max_dd,
+            "calmar": cagr / abs(max_dd) if max_dd < 0 else 0,
+            "ulcer_index": np.sqrt(self.ulcer_ss / self.n_curve) if self.n_curve else 0,
+            "max_dd_peak": self.max_dd_peak,
+            "max_dd_trough": self.max_dd_trough,
+            "max_dd_recovery": self.max_dd_recovery,
+            "max_dd_days": (dd_end - self.max_dd_peak).days if self.max_dd_peak is not None else 0,
+        }
+
+
+def series_metrics(values, dates, start_value: float | None = None) -> dict:
+    return RunningMetrics(start_value).update(values, dates).result()
@@ -0,0 +1,139 @@
+"""Mean-variance efficient frontier (critical line algorithm)."""
+
+import numpy as np
+
+
+TRADING_DAYS = 252
+
+
+def annualized_moments(returns: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    returns = np.asarray(returns, dtype=np.float64)
+    mean = returns.mean(axis=0)
+    centered = returns - mean
+    covar = centered.T @ centered / max(len(returns) - 1, 1)
+    return mean * TRADING_DAYS, covar * TRADING_DAYS
+
+
+def critical_line(mean: np.ndarray, covar: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> list[np.ndarray]:
+    # Markowitz critical line algorithm: returns the turning points of the
+    # bounded efficient frontier, from the max-return corner down to the
+    # global minimum-variance portfolio. Between consecutive turning points
+    # the frontier weights are a linear interpolation.
+    n = len(mean)
+    order = np.argsort(-mean, kind="stable")
+    w = lower.astype(np.float64).copy()
+    for i in order:
+        w[i] = upper[i]
+        if w.sum() >= 1.0:
+            w[i] += 1.0 - w.sum()
+            break
+    free = [int(i)]
+    turning, lambdas = [w.copy()], [None]
+
+    def split(f, w_cur):
+        b = [j for j in range(n) if j not in f]
+        return covar[np.ix_(f, f)], covar[np.ix_(f, b)], mean[f], w_cur[b]
+
+    def solve_lambda(inv, cov_fb, mean_f, w_b, j, bound):
+        ones_f = np.ones(len(mean_f))
+        c1 = ones_f @ inv @ ones_f
+        c2 = inv @ mean_f
+        c3 = ones_f @ inv @ mean_f
+        c4 = inv @ ones_f
+        c = -c1 * c2[j] + c3 * c4[j]
+        if c == 0:
+            return None, None
+        if isinstance(bound, tuple):
+            bound = bound[1] if c > 0 else bound[0]
+        if len(w_b) == 0:
+            return (c4[j] - c1 * bound) / c, bound
+        l2 = inv @ cov_fb @ w_b
+        return ((1 - w_b.sum() + ones_f @ l2) * c4[j] - c1 * (bound + l2[j])) / c, bound
+
+    while True:
+        l_in = l_out = None
+        if len(free) > 1:
+            cov_f, cov_fb, mean_f, w_b = split(free, w)
+            inv = np.linalg.inv(cov_f)
+            for j, i in enumerate(free):
+                lam, bound = solve_lambda(inv, cov_fb, mean_f, w_b, j, (lower[i], upper[i]))
+                if lam is not None and (l_in is None or lam > l_in):
+                    l_in, i_in, bound_in = lam, i, bound
+        if len(free) < n:
+            for i in (j for j in range(n) if j not in free):
+                cov_f, cov_fb, mean_f, w_b = split(free + [i], w)
+                inv = np.linalg.inv(cov_f)
+                lam, _ = solve_lambda(inv, cov_fb, mean_f, w_b, len(mean_f) - 1, w[i])
+                if lam is not None and (lambdas[-1] is None or lam < lambdas[-1]) and (l_out is None or lam > l_out):
+                    l_out, i_out = lam, i
+
+        if (l_in is None or l_in < 0) and (l_out is None or l_out < 0):
+            lambdas.append(0.0)
+            cov_f, cov_fb, mean_f, w_b = split(free, w)
+            mean_f = np.zeros(len(free))
+        else:
+            if l_in is not None and (l_out is None or l_in > l_out):
+                lambdas.append(l_in)
+                free.remove(i_in)
+                w[i_in] = bound_in
+            else:
+                lambdas.append(l_out)
+                free.append(i_out)
+            cov_f, cov_fb, mean_f, w_b = split(free, w)
+
+        inv = np.linalg.inv(cov_f)
+        ones_f = np.ones(len(free))
+        g1, g2 = ones_f @ inv @ mean_f, ones_f @ inv @ ones_f
+        if len(w_b) == 0:
+            gamma, w1 = -lambdas[-1] * g1 / g2 + 1 / g2, 0.0
+        else:
+            w1 = inv @ cov_fb @ w_b
+            gamma = -lambdas[-1] * g1 / g2 + (1 - w_b.sum() + ones_f @ w1) / g2
+        w[free] = -w1 + gamma * (inv @ ones_f) + lambdas[-1] * (inv @ mean_f)
+        turning.append(w.copy())
+        if lambdas[-1] == 0:
+            break
+
+    tol = 1e-9
+    points = [p for p in turning if abs(p.sum() - 1) < tol and np.all(p >= lower - tol) and np.all(p <= upper + tol)]
+    frontier = []
+    for p in points:
+        if not frontier or p @ mean <= frontier[-1] @ mean + tol:
+            frontier.append(p)
+    return frontier
+
+
+def efficient_frontier(
+    mean: np.ndarray,
+    covar: np.ndarray,
+    cap: float = 1.0,
+    long_only: bool = True,
+    n_points: int = 200,
+    risk_free: float = 0.0,
+) -> dict:
+    n = len(mean)
+    cap = max(cap, 1.0 / n)
+    lower = np.zeros(n) if long_only else np.full(n, -cap)
+    upper = np.full(n, cap)
+    corners = np.array(critical_line(mean, covar, lower, upper))
+
+    # Interpolate between turning points, spreading n_points over the segments.
+    if len(corners) == 1:
+        weights = corners
+    else:
+        per_seg = max(int(np.ceil(n_points / (len(corners) - 1))), 2)
+        alpha = np.linspace(0.0, 1.0, per_seg, endpoint=False)[None, :, None]
+        weights = ((1 - alpha) * corners[:-1, None, :] + alpha * corners[1:, None, :]).reshape(-1, n)
+        weights = np.vstack([weights, corners[-1]])
+
+    rets = weights @ mean
+    vols = np.sqrt(np.maximum(np.einsum("ij,jk,ik->i", weights, covar, weights), 0.0))
+    sharpe = np.divide(rets - risk_free, vols, out=np.full_like(rets, -np.inf), where=vols > 0)
+    best = int(np.argmax(sharpe))
+    min_var = int(np.argmin(vols))
+    return {
+        "weights": weights, "returns": rets, "vols": vols, "sharpe": sharpe,
+        "max_sharpe": weights[best], "min_variance": weights[min_var],
+        "max_sharpe_idx": best, "min_variance_idx": min_var,
+        "corners": corners,
+    }
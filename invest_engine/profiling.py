@@ -0,0 +1,157 @@
+"""Per-run stage timers, counters and optional cProfile capture."""
+
+import cProfile
+import io
+import json
+import pstats
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+import pandas as pd
+
+PROFILE_TOP_FUNCTIONS = 15
+
+_active = ContextVar("invest_engine_profile", default=None)
+
+
+class RunProfile:
+    # Stages nest: a stage opened inside another is recorded under the path
+    # "outer/inner", so the breakdown reads like a flattened flame graph
+    # (total = wall time incl. children, self = minus timed children).
+    # Counters are free-form (cache hits, bytes fetched, ...). With
+    # profile_calls, stages opened with profile=True also run under cProfile
+    # and keep their hottest functions; only the outermost one profiles,
+    # since cProfile sessions cannot nest.
+    def __init__(self, label: str = "", profile_calls: bool = False):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.started = time.time()
+        self.profile_calls = profile_calls
+        self.stages = defaultdict(lambda: {"calls": 0, "total": 0.0, "child": 0.0, "depth": 0})
+        self.counters = defaultdict(int)
+        self.call_stats = {}
+        self._stack = []
+        self._profiling = False
+        self._t0 = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1e3
+
+    @contextmanager
+    def stage(self, name: str, profile: bool = False):
+        path = "/".join([*self._stack, name])
+        entry = self.stages[path]  # created on entry, so rows come in call order
+        entry["depth"] = len(self._stack)
+        self._stack.append(name)
+        profiler = None
+        if profile and self.profile_calls and not self._profiling:
+            profiler = cProfile.Profile()
+            self._profiling = True
+            profiler.enable()
+        t0 = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - t0
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                self.call_stats[path] = top_functions(profiler)
+            self._stack.pop()
+            entry["calls"] += 1
+            entry["total"] += elapsed
+            if self._stack:
+                self.stages["/".join(self._stack)]["child"] += elapsed
+
+    def count(self, name: str, n: float = 1):
+        self.counters[name] += n
+
+    def breakdown(self) -> pd.DataFrame:
+        # Shares are of the run's wall time so far; whatever no stage covers
+        # shows up as the "(untimed)" row.
+        rows = [
+            {
+                "stage": path, "depth": s["depth"], "calls": s["calls"],
+                "total_ms": s["total"] * 1e3, "self_ms": (s["total"] - s["child"]) * 1e3,
+            }
+            for path, s in self.stages.items()
+        ]
+        wall = self.elapsed_ms()
+        timed = sum(r["total_ms"] for r in rows if r["depth"] == 0)
+        rows.append({"stage": "(untimed)", "depth": 0, "calls": 1, "total_ms": max(wall - timed, 0.0), "self_ms": max(wall - timed, 0.0)})
+        df = pd.DataFrame(rows)
+        df["share"] = df["self_ms"] / wall if wall > 0 else 0.0
+        return df
+
+    def records(self) -> list[dict]:
+        # One JSON-able record per stage and one for the counters, all
+        # tagged with the run id so a monitoring pipeline can regroup them.
+        base = {"run_id": self.run_id, "label": self.label, "ts": self.started}
+        out = [{**base, "kind": "stage", **row} for row in self.breakdown().to_dict("records")]
+        out.append({**base, "kind": "counters", "wall_ms": self.elapsed_ms(), **dict(self.counters)})
+        for path, funcs in self.call_stats.items():
+            out.append({**base, "kind": "profile", "stage": path, "functions": funcs})
+        return out
+
+    def to_jsonl(self) -> str:
+        return "".join(json.dumps(r, default=str) + "\n" for r in self.records())
+
+    def append_jsonl(self, path: str):
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(self.to_jsonl())
+
+
+def top_functions(profiler: cProfile.Profile, limit: int = PROFILE_TOP_FUNCTIONS) -> list[dict]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = [
+        {
+            "function": f"{func[2]} ({func[0].rsplit('/', 1)[-1]}:{func[1]})",
+            "calls": nc, "tottime_ms": tt * 1e3, "cumtime_ms": ct * 1e3,
+        }
+        for func, (_, nc, tt, ct, _) in stats.stats.items()
+    ]
+    return sorted(rows, key=lambda r: r["cumtime_ms"], reverse=True)[:limit]
+
+
+def activate(profile: RunProfile):
+    # Make `profile` the target of stage()/count() in this context (thread);
+    # returns a token for deactivate().
+    return _active.set(profile)
+
+
+def deactivate(token):
+    _active.reset(token)
+
+
+def current_profile() -> RunProfile | None:
+    return _active.get()
+
+
+def stage(name: str, profile: bool = False):
+    # No-op unless a RunProfile is active in this context, so library code
+    # can mark its stages unconditionally.
+    prof = _active.get()
+    return prof.stage(name, profile) if prof is not None else nullcontext()
+
+
+def count(name: str, n: float = 1):
+    prof = _active.get()
+    if prof is not None:
+        prof.count(name, n)
+
+
+def profiled(name: str | None = None):
+    # Decorator form of stage(name, profile=True).
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(label, profile=True):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,117 @@
+"""Process-wide market matrices backed by memory-mapped files."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache
+from .market import MarketData, closes_in_usd, market_from_closes
+from .profiling import count, stage
+
+MARKET_CACHE_SIZE = 16
+MARKET_FILE_MAX_AGE = 7 * 86400.0
+
+
+class SharedMarketCache:
+    # One read-only MarketData per (tickers, window, currencies, stored
+    # history) per process. Its close matrix is an .npy file under the
+    # store's "markets" directory opened as a read-only memory map, so every
+    # session in the process holds the same object (and its memoized
+    # returns), and every worker process on the host maps the same page-cache
+    # pages instead of holding a private copy. Files are keyed by the store's
+    # version of each ticker, so a refresh that adds a day builds a new file;
+    # files unused for MARKET_FILE_MAX_AGE are pruned when one is built.
+    def __init__(self, store, maxsize: int = MARKET_CACHE_SIZE):
+        self.store = store
+        self.root = os.path.join(store.root, "markets")
+        self.builds = 0
+        self._markets = LRUCache(maxsize)
+        os.makedirs(self.root, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._markets)
+
+    @property
+    def hits(self) -> int:
+        return self._markets.hits
+
+    @property
+    def misses(self) -> int:
+        return self._markets.misses
+
+    def mapped_bytes(self) -> int:
+        return sum(m.closes.nbytes for m in self._markets.values())
+
+    def market(self, tickers, start, end, metadata=None) -> MarketData:
+        tickers = list(dict.fromkeys(tickers))
+        until = min(pd.Timestamp(end), pd.Timestamp.today().normalize())
+        failures = self.store.refresh(tickers, until)
+        currencies = metadata.currencies(tickers) if metadata is not None else {}
+        key = hashlib.sha1(json.dumps(
+            [tickers, str(start), str(end), currencies, self.store.version(tickers)], sort_keys=True, default=str,
+        ).encode()).hexdigest()[:20]
+        market = self._markets.get(key)
+        count("market_cache_hit" if market is not None else "market_cache_miss")
+        if market is None:
+            with stage("shared_market"):
+                market = self._open(key) or self._build(key, tickers, start, end, currencies, failures)
+            self._markets.put(key, market)
+        return market
+
+    def _paths(self, key: str) -> tuple[str, str, str]:
+        base = os.path.join(self.root, key)
+        return f"{base}.dates.npy", f"{base}.close.npy", f"{base}.json"
+
+    def _open(self, key: str) -> MarketData | None:
+        dates_path, close_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as fh:
+                meta = json.load(fh)
+            closes = np.load(close_path, mmap_mode="r")
+            dates = pd.DatetimeIndex(np.load(dates_path))
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return MarketData(dates, meta["tickers"], closes, meta["failed"], meta.get("currencies"))
+
+    def _build(self, key: str, tickers, start, end, currencies: dict[str, str | None], failures: dict[str, str]) -> MarketData:
+        # Written to temp files and renamed, the metadata last, so a process
+        # racing on the same key either finds all three files or none.
+        closes, failed = self.store.frame(tickers, start, end, failures)
+        if currencies and not closes.empty:
+            closes, no_fx = closes_in_usd(self.store, closes, currencies)
+            failed = {**failed, **no_fx}
+        market = market_from_closes(closes, failed, currencies)
+        if not market.tickers:
+            return market
+        self.builds += 1
+        dates_path, close_path, meta_path = self._paths(key)
+        tag = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        for path, arr in ((dates_path, market.dates.to_numpy(dtype="datetime64[D]")), (close_path, market.closes)):
+            with open(f"{path}.{tag}", "wb") as fh:
+                np.save(fh, arr)
+            os.replace(f"{path}.{tag}", path)
+        with open(f"{meta_path}.{tag}", "w", encoding="utf-8") as fh:
+            json.dump({"tickers": market.tickers, "failed": market.failed, "currencies": market.currencies}, fh)
+        os.replace(f"{meta_path}.{tag}", meta_path)
+        self._prune()
+        return self._open(key) or market
+
+    def _prune(self):
+        cutoff = time.time() - MARKET_FILE_MAX_AGE
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(meta_path) >= cutoff:
+                    continue
+                for path in self._paths(name[:-len(".json")]):
+                    os.remove(path)
+            except OSError:
+                pass
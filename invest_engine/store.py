@@ -0,0 +1,363 @@
+"""On-disk price store and concurrent price fetching."""
+
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from .profiling import count, stage
+
+
+PRICE_STORE_DIR = os.environ.get(
+    "PRICE_STORE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "investment_app", "prices"),
+)
+
+
+FETCH_WORKERS = 8
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.5
+FETCH_TIMEOUT = 20.0
+
+
+class TickerNotFound(LookupError):
+    pass
+
+
+class YFinanceProvider:
+    def fetch(self, ticker: str, start: pd.Timestamp | None = None) -> pd.Series:
+        import yfinance as yf
+        from yfinance.exceptions import YFPricesMissingError, YFTickerMissingError, YFTzMissingError
+
+        kwargs = {"period": "max"} if start is None else {"start": start.strftime("%Y-%m-%d")}
+        try:
+            data = yf.Ticker(ticker).history(auto_adjust=True, timeout=FETCH_TIMEOUT, raise_errors=True, **kwargs)
+        except (YFPricesMissingError, YFTickerMissingError, YFTzMissingError) as exc:
+            raise TickerNotFound(ticker) from exc
+        if data.empty:
+            raise TickerNotFound(ticker)
+        close = data["Close"].dropna()
+        if close.index.tz is not None:
+            close.index = close.index.tz_localize(None)
+        close.index = close.index.normalize()
+        return close
+
+    def fetch_bars(self, ticker: str, interval: str, period: str | None = None, start: pd.Timestamp | None = None) -> pd.Series:
+        # Intraday closes at exchange wall-clock time, for the last `period`
+        # or from `start` on.
+        import yfinance as yf
+
+        kwargs = {"period": period} if start is None else {"start": start}
+        data = yf.Ticker(ticker).history(interval=interval, auto_adjust=True, timeout=FETCH_TIMEOUT, **kwargs)
+        if data.empty:
+            raise TickerNotFound(ticker)
+        close = data["Close"].dropna()
+        if close.index.tz is not None:
+            close.index = close.index.tz_localize(None)
+        return close
+
+
+class SyntheticPriceProvider:
+    # Deterministic offline prices (geometric random walk seeded by ticker),
+    # for tests and benchmarks that must not touch the network. History runs
+    # to `last_date` (default: today). `latency` delays every call,
+    # `failures` maps a ticker to how many calls fail before it succeeds,
+    # and tickers in `missing` are never found.
+    def __init__(
+        self,
+        first_date: str = "1993-01-29",
+        last_date: str | None = None,
+        drift: float = 0.0003,
+        vol: float = 0.011,
+        latency: float = 0.0,
+        failures: dict[str, int] | None = None,
+        missing=(),
+    ):
+        self.first_date = first_date
+        self.last_date = last_date
+        self.drift = drift
+        self.vol = vol
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.missing = set(missing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def series(self, ticker: str) -> pd.Series:
+        days = pd.date_range(self.first_date, self.last_date or pd.Timestamp.today().normalize(), freq="D")
+        dates = days[days.dayofweek < 5]  # bdate_range, minus its slow offset stepping
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        prices = 100.0 * np.exp(np.cumsum(rng.normal(self.drift, self.vol, len(dates))))
+        return pd.Series(prices, index=dates)
+
+    def fetch(self, ticker: str, start: pd.Timestamp | None = None) -> pd.Series:
+        with self._lock:
+            self.calls.append((ticker, start))
+            failing = self.failures.get(ticker, 0) > 0
+            if failing:
+                self.failures[ticker] -= 1
+        if self.latency:
+            time.sleep(self.latency)
+        if ticker in self.missing:
+            raise TickerNotFound(ticker)
+        if failing:
+            raise ConnectionError(f"injected failure for {ticker}")
+        close = self.series(ticker)
+        return close if start is None else close[close.index >= start]
+
+    def fetch_bars(self, ticker: str, interval: str, period: str | None = None, start: pd.Timestamp | None = None) -> pd.Series:
+        # Bars every `interval` from 09:30 to 16:00 on the last `period`
+        # weekdays (or from `start`), up to now; a bar's close depends only
+        # on its ticker and time, so refetches agree with earlier ones.
+        with self._lock:
+            self.calls.append((ticker, interval, period, start))
+        if self.latency:
+            time.sleep(self.latency)
+        if ticker in self.missing:
+            raise TickerNotFound(ticker)
+        now = pd.Timestamp.now().floor("min")
+        sessions = int(period[:-1]) if period else 5
+        days = pd.bdate_range(end=now.normalize(), periods=sessions + 1)
+        step = pd.Timedelta(interval.replace("m", "min"))
+        stamps = pd.DatetimeIndex(np.concatenate([
+            pd.date_range(d + pd.Timedelta(hours=9, minutes=30), d + pd.Timedelta(hours=16), freq=step).to_numpy() for d in days
+        ]))
+        stamps = stamps[stamps <= now]
+        if start is not None:
+            stamps = stamps[stamps >= start]
+        else:
+            stamps = stamps[stamps.normalize() >= stamps.normalize().unique()[-sessions]]
+        phase = zlib.crc32(ticker.encode()) / 2**32
+        minutes = stamps.asi8 / 6e10
+        return pd.Series(100.0 * np.exp(0.01 * np.sin(minutes / 97.0 + 2 * np.pi * phase)), index=stamps)
+
+
+def fetch_with_retry(provider, ticker: str, start: pd.Timestamp | None, retries: int = FETCH_RETRIES, backoff: float = FETCH_BACKOFF) -> pd.Series:
+    for attempt in range(retries + 1):
+        try:
+            return provider.fetch(ticker, start)
+        except TickerNotFound:
+            raise
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def fetch_concurrently(
+    provider,
+    requests: dict,
+    workers: int = FETCH_WORKERS,
+    retries: int = FETCH_RETRIES,
+    backoff: float = FETCH_BACKOFF,
+    timeout: float | None = None,
+) -> tuple[dict[str, pd.Series], dict[str, str]]:
+    # requests maps ticker -> start date (None = full history). One slow or
+    # failing ticker never sinks the others: successes and failures come
+    # back separately.
+    if not requests:
+        return {}, {}
+    if timeout is None:
+        timeout = FETCH_TIMEOUT * (retries + 1) + backoff * (2 ** retries)
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(requests)), thread_name_prefix="price-fetch")
+    futures = {pool.submit(fetch_with_retry, provider, t, start, retries, backoff): t for t, start in requests.items()}
+    done, pending = wait(futures, timeout=timeout)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    results, failures = {}, {}
+    for fut in done:
+        ticker = futures[fut]
+        try:
+            results[ticker] = fut.result()
+        except TickerNotFound:
+            failures[ticker] = "not found"
+        except Exception as exc:
+            failures[ticker] = type(exc).__name__
+    for fut in pending:
+        failures[futures[fut]] = "timeout"
+    return results, failures
+
+
+class PriceStore:
+    # One pair of .npy files per ticker (dates + adjusted closes), opened as
+    # read-only memory maps. Only the tail after the last stored date is
+    # fetched; a changed overlap close means the provider re-adjusted the
+    # history (split/dividend), so the ticker is refetched in full. Tickers
+    # that need fetching are batched into one provider call. Bars dated on or
+    # after `until` (at the latest today, whose bar may still be forming) are
+    # never stored, so tomorrow's overlap check compares settled closes.
+    def __init__(self, root: str, provider=None, refresh_after: float = 3600.0):
+        self.root = root
+        self.provider = provider or YFinanceProvider()
+        self.refresh_after = refresh_after
+        self._lock = threading.Lock()
+        self._arrays = {}
+        self._checked = {}
+        self._inflight = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, ticker: str, part: str) -> str:
+        return os.path.join(self.root, f"{re.sub(r'[^A-Za-z0-9._-]', '_', ticker)}.{part}.npy")
+
+    def _open(self, ticker: str):
+        dates_path, close_path = self._path(ticker, "dates"), self._path(ticker, "close")
+        if not (os.path.exists(dates_path) and os.path.exists(close_path)):
+            return None
+        return np.load(dates_path, mmap_mode="r"), np.load(close_path, mmap_mode="r")
+
+    def _load(self, ticker: str):
+        # Readers don't take the lock: a write swaps in the new maps as one
+        # dict assignment, and a first load racing it never overwrites them.
+        stored = self._arrays.get(ticker)
+        if stored is None:
+            stored = self._open(ticker)
+            if stored is not None:
+                stored = self._arrays.setdefault(ticker, stored)
+        return stored
+
+    def _write(self, ticker: str, dates: np.ndarray, closes: np.ndarray):
+        for part, arr in (("dates", dates), ("close", closes)):
+            path = self._path(ticker, part)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                np.save(fh, arr)
+            os.replace(tmp, path)
+        self._arrays[ticker] = self._open(ticker)
+
+    def _save_series(self, ticker: str, close: pd.Series):
+        close = close[~close.index.duplicated(keep="last")].sort_index()
+        dates = close.index.to_numpy(dtype="datetime64[D]")
+        self._write(ticker, dates, close.to_numpy(dtype=np.float64))
+
+    @staticmethod
+    def _count_fetched(fetched: dict[str, pd.Series]):
+        count("tickers_fetched", len(fetched))
+        count("bytes_fetched", sum(c.nbytes + c.index.nbytes for c in fetched.values()))
+
+    def _merge(self, fetched: dict[str, pd.Series], requests: dict) -> dict:
+        # Appends each fetched tail to the stored history; returns the
+        # tickers whose overlap close changed, to be refetched in full.
+        refetch = {}
+        for ticker, close in fetched.items():
+            last_date = requests[ticker]
+            if last_date is None:
+                self._save_series(ticker, close)
+                continue
+            dates, closes = self._load(ticker)
+            overlap = close[close.index == last_date]
+            if len(overlap) and not np.isclose(float(overlap.iloc[0]), float(closes[-1]), rtol=1e-6):
+                refetch[ticker] = None
+                continue
+            new = close[close.index > last_date]
+            if not new.empty:
+                self._write(
+                    ticker,
+                    np.concatenate([dates, new.index.to_numpy(dtype="datetime64[D]")]),
+                    np.concatenate([closes, new.to_numpy(dtype=np.float64)]),
+                )
+        return refetch
+
+    def _fetch(self, requests: dict, cutoff: pd.Timestamp) -> tuple[dict[str, pd.Series], dict[str, str]]:
+        with stage("fetch"):
+            fetched, failures = fetch_concurrently(self.provider, requests)
+        fetched = {t: c[c.index < cutoff] for t, c in fetched.items()}
+        self._count_fetched(fetched)
+        return fetched, failures
+
+    def refresh(self, tickers, until: pd.Timestamp) -> dict[str, str]:
+        # The lock only guards planning and the merge/write; the network
+        # fetch runs outside it, so a slow ticker never holds up sessions
+        # that need other tickers. A ticker already being fetched by another
+        # thread is not fetched again: this call waits for that fetch and
+        # reports its outcome.
+        cutoff = min(pd.Timestamp(until), pd.Timestamp.today().normalize())
+        requests, waiting, owned = {}, {}, {}
+        with self._lock:
+            now = time.time()
+            for ticker in dict.fromkeys(tickers):
+                if ticker in self._inflight:
+                    waiting[ticker] = self._inflight[ticker]
+                    continue
+                stored = self._load(ticker)
+                has_data = stored is not None and len(stored[0]) > 0
+                if has_data and pd.Timestamp(stored[0][-1]) >= until - pd.offsets.BDay(1):
+                    continue
+                if now - self._checked.get(ticker, 0.0) < self.refresh_after:
+                    continue
+                self._checked[ticker] = now
+                requests[ticker] = pd.Timestamp(stored[0][-1]) if has_data else None
+                owned[ticker] = self._inflight[ticker] = Future()
+
+        failures = {}
+        try:
+            fetched, failures = self._fetch(requests, cutoff)
+            with self._lock:
+                refetch = self._merge(fetched, requests)
+            if refetch:
+                fetched, more_failures = self._fetch(refetch, cutoff)
+                failures.update(more_failures)
+                with self._lock:
+                    for ticker, close in fetched.items():
+                        self._save_series(ticker, close)
+        finally:
+            with self._lock:
+                for ticker, future in owned.items():
+                    reason = failures.get(ticker)
+                    if reason is not None and reason != "not found":
+                        self._checked.pop(ticker, None)
+                    del self._inflight[ticker]
+                    future.set_result(reason)
+
+        for ticker, future in waiting.items():
+            reason = future.result()
+            if reason is not None:
+                failures[ticker] = reason
+        return failures
+
+    def window(self, ticker: str, start, end) -> tuple[np.ndarray, np.ndarray]:
+        stored = self._load(ticker)
+        if stored is None:
+            return np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.float64)
+        dates, closes = stored
+        lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start).date()), side="left")
+        hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end).date()), side="left")
+        return dates[lo:hi], closes[lo:hi]
+
+    def version(self, tickers) -> tuple:
+        # Changes whenever refresh appends to or rewrites a ticker's history,
+        # as soon as the merge that wrote it releases the lock.
+        stamps = []
+        for ticker in tickers:
+            stored = self._load(ticker)
+            if stored is None or not len(stored[0]):
+                stamps.append(None)
+            else:
+                dates, closes = stored
+                stamps.append((len(dates), str(dates[-1]), float(closes[0]), float(closes[-1])))
+        return tuple(stamps)
+
+    def load(self, tickers, start, end) -> tuple[pd.DataFrame, dict[str, str]]:
+        until = min(pd.Timestamp(end), pd.Timestamp.today().normalize())
+        return self.frame(tickers, start, end, self.refresh(tickers, until))
+
+    def frame(self, tickers, start, end, failures: dict[str, str] | None = None) -> tuple[pd.DataFrame, dict[str, str]]:
+        # What is stored for [start, end), without refreshing; `failures`
+        # are the refresh's, kept only for tickers that end up without data.
+        failures = dict(failures or {})
+        columns = {}
+        for ticker in tickers:
+            dates, closes = self.window(ticker, start, end)
+            if len(dates):
+                columns[ticker] = pd.Series(closes, index=pd.DatetimeIndex(dates))
+            else:
+                failures.setdefault(ticker, "no data")
+        if not columns:
+            return pd.DataFrame(), failures
+        return pd.DataFrame(columns), {t: r for t, r in failures.items() if t not in columns}
+
+    def closes(self, tickers, start, end) -> pd.DataFrame:
+        return self.load(tickers, start, end)[0]
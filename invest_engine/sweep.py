@@ -0,0 +1,180 @@
+"""Parameter sweeps: a scenario grid evaluated in batches of matrix columns."""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .batch import run_batch_engine
+from .engine import DEPLETION_FRACTION, scenario_returns, simulate_portfolio
+from .market import MarketData, simulation_window
+from .metrics import series_metrics
+
+SWEEP_AXES = ("weights", "withdrawal_rate", "withdrawal_month", "start_year", "end_year", "monthly")
+# Points that differ only in these run as columns of one batched engine pass.
+BATCH_AXES = ("weights", "withdrawal_rate", "withdrawal_month", "monthly")
+
+
+def expand_grid(base: dict, axes: dict) -> list[dict]:
+    # Cartesian product of the swept axes over a base scenario. "weights" is
+    # a list of {asset: weight} dicts (each may hold different assets);
+    # "horizon" (years) is an alternative to "end_year" that moves with the
+    # start year.
+    unknown = set(axes) - set(SWEEP_AXES) - {"horizon"}
+    if unknown:
+        raise ValueError(f"unknown sweep axes: {sorted(unknown)}")
+    names = [a for a in (*SWEEP_AXES, "horizon") if a in axes]
+    points = []
+    for values in itertools.product(*(axes[a] for a in names)):
+        point = {**base, **dict(zip(names, values))}
+        if "horizon" in point:
+            point["end_year"] = int(point["start_year"]) + int(point.pop("horizon")) - 1
+        point["assets"] = [a for a, w in point["weights"].items() if w]
+        points.append(point)
+    return points
+
+
+def sweep_window(points: list[dict]) -> tuple[str, str]:
+    # Download range covering every point, for a single shared MarketData.
+    windows = [simulation_window(p["start_year"], p["end_year"]) for p in points]
+    start = min(w[2] for w in windows)
+    end = max(w[3] for w in windows)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def summarize(point: dict, series, stats: dict) -> dict:
+    # The handful of numbers a grid cell needs.
+    if not stats:
+        return {"ok": False}
+    net_profit = stats["total_withdrawn_net"] + stats["end_val"] - stats["total_invested"] - stats["liquidation_tax"]
+    mc = stats.get("monte_carlo")
+    return {
+        "ok": True,
+        "end_val": stats["end_val"],
+        "net_profit": net_profit,
+        "total_invested": stats["total_invested"],
+        "total_withdrawn_net": stats["total_withdrawn_net"],
+        "total_tax_paid": stats["total_tax_paid"] + stats["liquidation_tax"],
+        "cagr": stats["cagr"],
+        "max_dd": stats["max_dd"],
+        "depleted": bool(series.min() <= stats["start_val"] * DEPLETION_FRACTION) if stats["start_val"] > 0 else False,
+        "ruin_prob": mc["ruin_prob"] if mc else None,
+    }
+
+
+def point_window(market: MarketData, point: dict, windows: dict) -> MarketData:
+    _, _, dl_start, hist_end = simulation_window(point["start_year"], point["end_year"])
+    key = (dl_start.date(), hist_end.date())
+    if key not in windows:
+        windows[key] = market.window(dl_start, hist_end)
+    return windows[key]
+
+
+def run_point(market: MarketData, point: dict, windows: dict | None = None) -> dict:
+    # One point through simulate_portfolio; the sweep only takes this path
+    # for points with a Monte Carlo projection, which the batch engine lacks.
+    view = point_window(market, point, {} if windows is None else windows)
+    port_cfg = {
+        "assets": point["assets"], "weights": point["weights"],
+        "withdrawal_rate": float(point.get("withdrawal_rate", 0.0)),
+        "withdrawal_month": int(point.get("withdrawal_month", 1)),
+    }
+    series, stats = simulate_portfolio(
+        port_cfg, view, float(point.get("initial", 0.0)), float(point.get("monthly", 0.0)),
+        point["start_year"], point["end_year"], point.get("rebalance"),
+        float(point.get("tax_rate", 0.25)), int(point.get("mc_paths", 0)),
+        point.get("mc_method", "bootstrap"), int(point.get("mc_seed", 42)),
+        cost_method=point.get("cost_method", "average"), inflation=float(point.get("inflation", 0.0)),
+    )
+    return summarize(point, series, stats)
+
+
+def run_batch(market: MarketData, points: list[dict], windows: dict | None = None) -> list[dict]:
+    # Points sharing their assets and everything but BATCH_AXES: one return
+    # matrix (the same scenario_returns simulate_portfolio would use) and
+    # one run_batch_engine pass with a column per point, each with its own
+    # weights, deposit and withdrawal. Missing assets are dropped and
+    # weights renormalized per point, as in simulate_portfolio.
+    first = points[0]
+    view = point_window(market, first, {} if windows is None else windows)
+    assets = [a for a in first["assets"] if a in view.columns]
+    weights = np.array([[float(p["weights"].get(a, 0)) for a in assets] for p in points]).reshape(len(points), len(assets))
+    totals = weights.sum(axis=1)
+    results = [{"ok": False} for _ in points]
+    live = np.flatnonzero(totals > 0)
+    if not len(live):
+        return results
+    _, combined, _ = scenario_returns(view, assets, first["start_year"], first["end_year"])
+    if combined.empty:
+        return results
+
+    initial = float(first.get("initial", 0.0))
+    tax_rate = float(first.get("tax_rate", 0.25))
+    values, flows = run_batch_engine(
+        combined.to_numpy(dtype=float), combined.index, weights[live] / totals[live, None], first.get("rebalance"),
+        initial, np.array([float(points[i].get("monthly", 0.0)) for i in live]),
+        np.array([float(points[i].get("withdrawal_rate", 0.0)) for i in live]),
+        np.array([int(points[i].get("withdrawal_month", 1)) for i in live]),
+        tax_rate, None, first.get("cost_method", "average"), float(first.get("inflation", 0.0)),
+    )
+    for j, i in enumerate(live):
+        stats = {
+            **series_metrics(values[:, j], combined.index, start_value=initial),
+            **{k: v[j] for k, v in flows.items() if k != "holdings"},
+        }
+        results[i] = summarize(points[i], values[:, j], stats)
+    return results
+
+
+def batch_key(point: dict) -> tuple:
+    rest = {k: v for k, v in point.items() if k not in BATCH_AXES and k != "name"}
+    return tuple(point["assets"]), tuple(sorted((k, repr(v)) for k, v in rest.items()))
+
+
+def run_sweep(market: MarketData, points: list[dict]) -> pd.DataFrame:
+    # Points are grouped by batch_key, so a grid of weights × deposits ×
+    # withdrawal rates × withdrawal months costs one engine pass per asset
+    # set and year range. Groups over the same years share a sliced window.
+    if not points:
+        return pd.DataFrame()
+    groups = {}
+    for i, p in enumerate(points):
+        groups.setdefault(batch_key(p), []).append(i)
+    windows = {}
+    results = [None] * len(points)
+    for members in groups.values():
+        group = [points[i] for i in members]
+        if int(group[0].get("mc_paths", 0)):
+            out = [run_point(market, p, windows) for p in group]
+        else:
+            out = run_batch(market, group, windows)
+        for i, res in zip(members, out):
+            results[i] = res
+
+    rows = []
+    for p, res in zip(points, results):
+        rows.append({
+            "weights": ", ".join(f"{a} {w:g}" for a, w in p["weights"].items() if w),
+            "withdrawal_rate": float(p.get("withdrawal_rate", 0.0)),
+            "withdrawal_month": int(p.get("withdrawal_month", 1)),
+            "start_year": int(p["start_year"]),
+            "end_year": int(p["end_year"]),
+            "monthly": float(p.get("monthly", 0.0)),
+            **res,
+        })
+    return pd.DataFrame(rows)
+
+
+def ruin_table(results: pd.DataFrame, by=("weights", "withdrawal_rate")) -> pd.DataFrame:
+    # Historical ruin probability: share of start years whose path fell
+    # below DEPLETION_FRACTION of the initial capital (a Trinity-style table).
+    ok = results[results["ok"]]
+    if ok.empty:
+        return pd.DataFrame()
+    return ok.groupby(list(by)).agg(
+        ruin_prob=("depleted", "mean"),
+        median_end=("end_val", "median"),
+        median_net_profit=("net_profit", "median"),
+        worst_end=("end_val", "min"),
+        n=("depleted", "size"),
+    ).reset_index()
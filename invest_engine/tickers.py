@@ -0,0 +1,244 @@
+"""Ticker universe and search index."""
+
+import bisect
+import heapq
+import re
+
+import numpy as np
+
+
+TICKER_DB = {
+    "AAPL": "Apple Inc.", "MSFT": "Microsoft Corp.",
+    "GOOGL": "Alphabet (Google) Class A", "GOOG": "Alphabet (Google) Class C",
+    "AMZN": "Amazon.com Inc.", "NVDA": "NVIDIA Corp.",
+    "META": "Meta Platforms (Facebook)", "TSLA": "Tesla Inc.",
+    "BRK-B": "Berkshire Hathaway B", "JPM": "JPMorgan Chase",
+    "V": "Visa Inc.", "JNJ": "Johnson & Johnson",
+    "WMT": "Walmart Inc.", "PG": "Procter & Gamble",
+    "MA": "Mastercard Inc.", "UNH": "UnitedHealth Group",
+    "HD": "Home Depot", "DIS": "Walt Disney Co.",
+    "PYPL": "PayPal Holdings", "NFLX": "Netflix Inc.",
+    "ADBE": "Adobe Inc.", "CRM": "Salesforce Inc.",
+    "INTC": "Intel Corp.", "AMD": "Advanced Micro Devices",
+    "CSCO": "Cisco Systems", "PEP": "PepsiCo Inc.",
+    "KO": "Coca-Cola Co.", "ABT": "Abbott Laboratories",
+    "MRK": "Merck & Co.", "NKE": "Nike Inc.",
+    "T": "AT&T Inc.", "VZ": "Verizon Communications",
+    "XOM": "Exxon Mobil Corp.", "CVX": "Chevron Corp.",
+    "BA": "Boeing Co.", "CAT": "Caterpillar Inc.",
+    "GS": "Goldman Sachs", "MS": "Morgan Stanley",
+    "COST": "Costco Wholesale", "AVGO": "Broadcom Inc.",
+    "QCOM": "Qualcomm Inc.", "TXN": "Texas Instruments",
+    "NOW": "ServiceNow Inc.", "UBER": "Uber Technologies",
+    "SQ": "Block Inc. (Square)", "SHOP": "Shopify Inc.",
+    "SNOW": "Snowflake Inc.", "PLTR": "Palantir Technologies",
+    "COIN": "Coinbase Global", "SOFI": "SoFi Technologies",
+    "RIVN": "Rivian Automotive", "LCID": "Lucid Group",
+    "SPY": "SPDR S&P 500 ETF", "VOO": "Vanguard S&P 500 ETF",
+    "IVV": "iShares Core S&P 500 ETF", "QQQ": "Invesco Nasdaq 100 ETF",
+    "VTI": "Vanguard Total US Market ETF", "IWM": "iShares Russell 2000 ETF",
+    "DIA": "SPDR Dow Jones Industrial ETF", "VUG": "Vanguard Growth ETF",
+    "VTV": "Vanguard Value ETF", "SCHD": "Schwab US Dividend Equity ETF",
+    "VIG": "Vanguard Dividend Appreciation ETF",
+    "ARKK": "ARK Innovation ETF", "ARKW": "ARK Next Gen Internet ETF",
+    "XLK": "Technology Select Sector SPDR", "XLF": "Financial Select Sector SPDR",
+    "XLE": "Energy Select Sector SPDR", "XLV": "Health Care Select Sector SPDR",
+    "XLY": "Consumer Discretionary SPDR", "XLP": "Consumer Staples SPDR",
+    "XLI": "Industrial Select Sector SPDR", "XLRE": "Real Estate Select Sector SPDR",
+    "VXUS": "Vanguard Total International Stock ETF",
+    "EFA": "iShares MSCI EAFE ETF", "EEM": "iShares MSCI Emerging Markets ETF",
+    "VWO": "Vanguard FTSE Emerging Markets ETF",
+    "VEA": "Vanguard FTSE Developed Markets ETF",
+    "IEMG": "iShares Core MSCI Emerging Markets ETF",
+    "FXI": "iShares China Large-Cap ETF", "EWJ": "iShares MSCI Japan ETF",
+    "EWG": "iShares MSCI Germany ETF", "EWU": "iShares MSCI United Kingdom ETF",
+    "BND": "Vanguard Total Bond Market ETF",
+    "AGG": "iShares Core US Aggregate Bond ETF",
+    "TLT": "iShares 20+ Year Treasury Bond ETF",
+    "IEF": "iShares 7-10 Year Treasury Bond ETF",
+    "SHY": "iShares 1-3 Year Treasury Bond ETF",
+    "TIP": "iShares TIPS Bond ETF",
+    "LQD": "iShares Investment Grade Corporate Bond ETF",
+    "HYG": "iShares iBoxx High Yield Corporate Bond ETF",
+    "BIL": "SPDR Bloomberg 1-3 Month T-Bill ETF",
+    "BNDX": "Vanguard Total International Bond ETF",
+    "EMB": "iShares J.P. Morgan USD EM Bond ETF",
+    "GLD": "SPDR Gold Shares", "IAU": "iShares Gold Trust",
+    "SLV": "iShares Silver Trust", "USO": "United States Oil Fund",
+    "DBC": "Invesco DB Commodity Index ETF",
+    "VNQ": "Vanguard Real Estate ETF", "IYR": "iShares US Real Estate ETF",
+    "VNQI": "Vanguard Global ex-US Real Estate ETF",
+    "NICE": "NICE Ltd.", "CYBR": "CyberArk Software",
+    "CHKP": "Check Point Software", "WIX": "Wix.com Ltd.",
+    "MNDY": "monday.com Ltd.", "GLBE": "Global-e Online",
+    "FVRR": "Fiverr International", "RSKD": "Riskified Ltd.",
+    "BTC-USD": "Bitcoin USD", "ETH-USD": "Ethereum USD",
+    "MSTR": "MicroStrategy (Bitcoin proxy)",
+    "BITO": "ProShares Bitcoin Strategy ETF",
+    "IBIT": "iShares Bitcoin Trust ETF",
+}
+
+
+class TickerIndex:
+    # Search index over symbols and names. Prefix lookups bisect sorted
+    # symbol/name keys (a flattened trie); substring lookups intersect
+    # 2/3-gram posting sets; typo suggestions score symbol and name-word
+    # bigrams by Dice similarity, counting shared bigrams for every term at
+    # once from per-bigram arrays of term ids. Ids follow the source order,
+    # which keeps the exact / starts / contains ranking of a linear scan.
+    def __init__(self, db: dict[str, str]):
+        self.entries = list(db.items())
+        self.sym_up = [sym.upper() for sym, _ in self.entries]
+        self.name_up = [name.upper() for _, name in self.entries]
+        self.exact = {}
+        for i, sym in enumerate(self.sym_up):
+            self.exact.setdefault(sym, i)
+
+        sym_keys = sorted((k, i) for i, k in enumerate(self.sym_up))
+        name_keys = sorted((k, i) for i, k in enumerate(self.name_up))
+        self.sym_sorted, self.sym_ids = [k for k, _ in sym_keys], [i for _, i in sym_keys]
+        self.name_sorted, self.name_ids = [k for k, _ in name_keys], [i for _, i in name_keys]
+
+        grams = {}
+        for i, (sym, name) in enumerate(zip(self.sym_up, self.name_up)):
+            for text in (sym, name):
+                for n in (2, 3):
+                    for j in range(len(text) - n + 1):
+                        grams.setdefault(text[j:j + n], set()).add(i)
+        self.grams = grams
+        self.gram_lists = {g: sorted(ids) for g, ids in grams.items()}
+
+        terms = {}
+        for i, (sym, name) in enumerate(zip(self.sym_up, self.name_up)):
+            for term in [sym] + re.findall(r"[A-Z0-9]{2,}", name):
+                terms.setdefault(term, []).append(i)
+        self.terms = terms
+        self.term_list = list(terms)
+        self.term_first = np.array([min(ids) for ids in terms.values()], dtype=np.int64)
+        term_bigrams = {}
+        n_bigrams = []
+        for t, term in enumerate(self.term_list):
+            grams = self._bigrams(term)
+            n_bigrams.append(len(grams))
+            for bg in grams:
+                term_bigrams.setdefault(bg, []).append(t)
+        self.term_nbigrams = np.array(n_bigrams, dtype=np.float64)
+        self.term_bigrams = {bg: np.array(ids, dtype=np.int64) for bg, ids in term_bigrams.items()}
+
+    @staticmethod
+    def _bigrams(text: str) -> set[str]:
+        return {text[j:j + 2] for j in range(len(text) - 1)}
+
+    @staticmethod
+    def _edit_distance(a: str, b: str, bound: int | None = None) -> int:
+        # Optimal string alignment: Levenshtein plus adjacent transpositions.
+        # With `bound`, gives up (returning bound + 1) once a whole row
+        # exceeds it; no later row can come back under.
+        # Comparisons instead of min() calls: this runs ~40 times a keystroke.
+        prev2, prev = None, list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            ca, cur = a[i - 1], [i] + [0] * len(b)
+            for j in range(1, len(b) + 1):
+                best = prev[j - 1] + (ca != b[j - 1])
+                if prev[j] + 1 < best:
+                    best = prev[j] + 1
+                if cur[j - 1] + 1 < best:
+                    best = cur[j - 1] + 1
+                if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1] and prev2[j - 2] + 1 < best:
+                    best = prev2[j - 2] + 1
+                cur[j] = best
+            if bound is not None and min(cur) > bound:
+                return bound + 1
+            prev2, prev = prev, cur
+        return prev[-1] if bound is None else min(prev[-1], bound + 1)
+
+    @staticmethod
+    def _prefix(keys: list[str], ids: list[int], q: str) -> list[int]:
+        lo = bisect.bisect_left(keys, q)
+        hi = bisect.bisect_left(keys, q + "\uffff")
+        return ids[lo:hi]
+
+    def _contains(self, q: str, skip: set[int], need: int) -> list[int]:
+        if len(q) < 2:
+            candidates = range(len(self.entries))
+        elif len(q) <= 3:
+            candidates = self.gram_lists.get(q, [])
+        else:
+            n = min(len(q), 3)
+            postings = [self.grams.get(q[j:j + n]) for j in range(len(q) - n + 1)]
+            if any(p is None for p in postings):
+                return []
+            candidates = sorted(set.intersection(*sorted(postings, key=len)))
+        out = []
+        for i in candidates:
+            if i not in skip and (q in self.sym_up[i] or q in self.name_up[i]):
+                out.append(i)
+                if len(out) >= need:
+                    break
+        return out
+
+    def _covering_distance(self, reranked: list[tuple], limit: int) -> int | None:
+        # Distance of the reranked term that brings the distinct entries to
+        # `limit`; None while there are fewer.
+        seen = set()
+        for dist, _, _, term in reranked:
+            for i in self.terms[term]:
+                seen.add(i)
+                if len(seen) >= limit:
+                    return dist
+        return None
+
+    def search(self, query: str, limit: int = 12) -> list[tuple[str, str]]:
+        q = query.upper().strip()
+        if not q:
+            return []
+        exact = [self.exact[q]] if q in self.exact else []
+        starts = set(self._prefix(self.sym_sorted, self.sym_ids, q))
+        starts.update(self._prefix(self.name_sorted, self.name_ids, q))
+        starts.difference_update(exact)
+        ranked = exact + heapq.nsmallest(limit, starts)
+        if len(ranked) < limit:
+            ranked += self._contains(q, set(ranked) | starts, limit - len(ranked))
+        return [self.entries[i] for i in ranked[:limit]]
+
+    def suggest(self, query: str, limit: int = 5, min_score: float = 0.4, pool: int = 50) -> list[tuple[str, str]]:
+        q = re.sub(r"[^A-Z0-9]", "", query.upper())
+        q_grams = self._bigrams(q)
+        postings = [self.term_bigrams[bg] for bg in q_grams if bg in self.term_bigrams]
+        if not postings:
+            return []
+        ids = np.concatenate(postings)
+        count = np.bincount(ids, minlength=len(self.term_list))
+        ids = np.flatnonzero(count)
+        score = 2.0 * count[ids] / (len(q_grams) + self.term_nbigrams[ids])
+        keep = score >= min_score
+        ids, score = ids[keep], score[keep]
+        if len(ids) > pool:
+            # Everything tied with the pool-th best score stays in, so the
+            # (score, first id, term) order below decides as before.
+            keep = score >= np.partition(score, len(score) - pool)[len(score) - pool]
+            ids, score = ids[keep], score[keep]
+        scored = [(-s, int(self.term_first[t]), self.term_list[t]) for t, s in zip(ids.tolist(), score.tolist())]
+        shortlist = heapq.nsmallest(pool, scored)
+
+        # Reranked by edit distance, computed in order of its lower bound
+        # (the length difference). Once the best terms give `limit` entries
+        # within distance `bound`, terms that can't get under it are skipped.
+        reranked, bound = [], None
+        for score, first, term in sorted(shortlist, key=lambda c: abs(len(c[2]) - len(q))):
+            if bound is not None and abs(len(term) - len(q)) > bound:
+                break
+            dist = self._edit_distance(q, term, bound)
+            if bound is not None and dist > bound:
+                continue
+            bisect.insort(reranked, (dist, score, first, term))
+            bound = self._covering_distance(reranked, limit)
+        seen, out = set(), []
+        for _, _, _, term in reranked:
+            for i in self.terms[term]:
+                if i not in seen:
+                    seen.add(i)
+                    out.append(self.entries[i])
+            if len(out) >= limit:
+                break
+        return out[:limit]
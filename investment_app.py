@@ -1,10 +1,29 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from invest_engine import (
+    CHART_MAX_POINTS, DEPLETION_FRACTION, FETCH_TIMEOUT, GOAL_PATHS, INTRADAY_PERIODS, METADATA_PATH, PRICE_STORE_DIR,
+    RANK_METRICS, TICKER_DB, USDILS_TICKER,
+    BarCache, LRUCache, MetadataStore, PriceStore, RunProfile, SharedMarketCache, TickerIndex, activate, count, profiled, stage,
+    annualized_moments, backtest_cohorts, compare_portfolios, downsample_indices, downsample_series,
+    efficient_frontier, expand_grid, goal_paths, load_fx, market_from_closes, ruin_table, run_sweep, scale_result,
+    simulate_portfolio, simulation_key, simulation_window, solve_deposit, solve_withdrawal_rate, sweep_window,
+)
+
+# Every rerun is timed from here; stage()/count() calls anywhere below (and
+# inside invest_engine) land in this profile.
+run_profile = RunProfile("rerun")
+activate(run_profile)
+
 # ========================
 # Page Config & CSS
 # ========================
@@ -122,101 +141,58 @@ st.markdown(RTL_CSS, unsafe_allow_html=True)
 # Session State Init
 # ========================
 
+# Up to DETAIL_MAX_PORTFOLIOS portfolios get the full per-portfolio
+# results (Monte Carlo fans, cards, bottom line); past that the run switches
+# to the batched engine's ranked table.
+MAX_PORTFOLIOS = 50
+DETAIL_MAX_PORTFOLIOS = 3
+PORTFOLIOS_PER_ROW = 3
+
+
+def new_portfolio(weights: dict | None = None) -> dict:
+    weights = weights or {}
+    return {
+        "assets": list(weights), "weights": dict(weights),
+        "phase": "שלב הצבירה", "monthly": 0, "withdrawal_rate": 0.0, "withdrawal_month": 1,
+    }
+
+
 if "num_portfolios" not in st.session_state:
     st.session_state.num_portfolios = 1
 
 if "portfolios" not in st.session_state:
-    st.session_state.portfolios = {}
-    for i in range(3):
-        st.session_state.portfolios[i] = {
-            "assets": ["SPY"] if i == 0 else [],
-            "weights": {"SPY": 100.0} if i == 0 else {},
-            "phase": "שלב הצבירה",
-            "monthly": 0,
-            "withdrawal_rate": 0.0,
-            "withdrawal_month": 1,
-        }
+    st.session_state.portfolios = {i: new_portfolio({"SPY": 100.0} if i == 0 else None) for i in range(DETAIL_MAX_PORTFOLIOS)}
 
 # ========================
-# Ticker Database
+# Debug / Profiling
 # ========================
 
-TICKER_DB = {
-    "AAPL": "Apple Inc.", "MSFT": "Microsoft Corp.",
-    "GOOGL": "Alphabet (Google) Class A", "GOOG": "Alphabet (Google) Class C",
-    "AMZN": "Amazon.com Inc.", "NVDA": "NVIDIA Corp.",
-    "META": "Meta Platforms (Facebook)", "TSLA": "Tesla Inc.",
-    "BRK-B": "Berkshire Hathaway B", "JPM": "JPMorgan Chase",
-    "V": "Visa Inc.", "JNJ": "Johnson & Johnson",
-    "WMT": "Walmart Inc.", "PG": "Procter & Gamble",
-    "MA": "Mastercard Inc.", "UNH": "UnitedHealth Group",
-    "HD": "Home Depot", "DIS": "Walt Disney Co.",
-    "PYPL": "PayPal Holdings", "NFLX": "Netflix Inc.",
-    "ADBE": "Adobe Inc.", "CRM": "Salesforce Inc.",
-    "INTC": "Intel Corp.", "AMD": "Advanced Micro Devices",
-    "CSCO": "Cisco Systems", "PEP": "PepsiCo Inc.",
-    "KO": "Coca-Cola Co.", "ABT": "Abbott Laboratories",
-    "MRK": "Merck & Co.", "NKE": "Nike Inc.",
-    "T": "AT&T Inc.", "VZ": "Verizon Communications",
-    "XOM": "Exxon Mobil Corp.", "CVX": "Chevron Corp.",
-    "BA": "Boeing Co.", "CAT": "Caterpillar Inc.",
-    "GS": "Goldman Sachs", "MS": "Morgan Stanley",
-    "COST": "Costco Wholesale", "AVGO": "Broadcom Inc.",
-    "QCOM": "Qualcomm Inc.", "TXN": "Texas Instruments",
-    "NOW": "ServiceNow Inc.", "UBER": "Uber Technologies",
-    "SQ": "Block Inc. (Square)", "SHOP": "Shopify Inc.",
-    "SNOW": "Snowflake Inc.", "PLTR": "Palantir Technologies",
-    "COIN": "Coinbase Global", "SOFI": "SoFi Technologies",
-    "RIVN": "Rivian Automotive", "LCID": "Lucid Group",
-    "SPY": "SPDR S&P 500 ETF", "VOO": "Vanguard S&P 500 ETF",
-    "IVV": "iShares Core S&P 500 ETF", "QQQ": "Invesco Nasdaq 100 ETF",
-    "VTI": "Vanguard Total US Market ETF", "IWM": "iShares Russell 2000 ETF",
-    "DIA": "SPDR Dow Jones Industrial ETF", "VUG": "Vanguard Growth ETF",
-    "VTV": "Vanguard Value ETF", "SCHD": "Schwab US Dividend Equity ETF",
-    "VIG": "Vanguard Dividend Appreciation ETF",
-    "ARKK": "ARK Innovation ETF", "ARKW": "ARK Next Gen Internet ETF",
-    "XLK": "Technology Select Sector SPDR", "XLF": "Financial Select Sector SPDR",
-    "XLE": "Energy Select Sector SPDR", "XLV": "Health Care Select Sector SPDR",
-    "XLY": "Consumer Discretionary SPDR", "XLP": "Consumer Staples SPDR",
-    "XLI": "Industrial Select Sector SPDR", "XLRE": "Real Estate Select Sector SPDR",
-    "VXUS": "Vanguard Total International Stock ETF",
-    "EFA": "iShares MSCI EAFE ETF", "EEM": "iShares MSCI Emerging Markets ETF",
-    "VWO": "Vanguard FTSE Emerging Markets ETF",
-    "VEA": "Vanguard FTSE Developed Markets ETF",
-    "IEMG": "iShares Core MSCI Emerging Markets ETF",
-    "FXI": "iShares China Large-Cap ETF", "EWJ": "iShares MSCI Japan ETF",
-    "EWG": "iShares MSCI Germany ETF", "EWU": "iShares MSCI United Kingdom ETF",
-    "BND": "Vanguard Total Bond Market ETF",
-    "AGG": "iShares Core US Aggregate Bond ETF",
-    "TLT": "iShares 20+ Year Treasury Bond ETF",
-    "IEF": "iShares 7-10 Year Treasury Bond ETF",
-    "SHY": "iShares 1-3 Year Treasury Bond ETF",
-    "TIP": "iShares TIPS Bond ETF",
-    "LQD": "iShares Investment Grade Corporate Bond ETF",
-    "HYG": "iShares iBoxx High Yield Corporate Bond ETF",
-    "BIL": "SPDR Bloomberg 1-3 Month T-Bill ETF",
-    "BNDX": "Vanguard Total International Bond ETF",
-    "EMB": "iShares J.P. Morgan USD EM Bond ETF",
-    "GLD": "SPDR Gold Shares", "IAU": "iShares Gold Trust",
-    "SLV": "iShares Silver Trust", "USO": "United States Oil Fund",
-    "DBC": "Invesco DB Commodity Index ETF",
-    "VNQ": "Vanguard Real Estate ETF", "IYR": "iShares US Real Estate ETF",
-    "VNQI": "Vanguard Global ex-US Real Estate ETF",
-    "NICE": "NICE Ltd.", "CYBR": "CyberArk Software",
-    "CHKP": "Check Point Software", "WIX": "Wix.com Ltd.",
-    "MNDY": "monday.com Ltd.", "GLBE": "Global-e Online",
-    "FVRR": "Fiverr International", "RSKD": "Riskified Ltd.",
-    "BTC-USD": "Bitcoin USD", "ETH-USD": "Ethereum USD",
-    "MSTR": "MicroStrategy (Bitcoin proxy)",
-    "BITO": "ProShares Bitcoin Strategy ETF",
-    "IBIT": "iShares Bitcoin Trust ETF",
-}
+# The debug panel is hidden unless the page is opened with ?debug=1.
+# PROFILE_LOG appends every rerun's profile as JSON lines for monitoring.
+PROFILE_LOG = os.environ.get("INVEST_PROFILE_LOG")
+debug_mode = st.query_params.get("debug") == "1"
+run_profile.profile_calls = debug_mode and st.session_state.get("debug_cprofile", False)
+
+# ========================
+# Constants
+# ========================
 
 PERIOD_MAP = {
     "יום": "1d", "שבוע": "5d", "חודש": "1mo",
     "מתחילת השנה": "ytd", "שנה": "1y", "5 שנים": "5y",
 }
 
+MC_METHOD_LABELS = {
+    "bootstrap": "בוטסטרפ היסטורי",
+    "normal": "נורמלי מתואם",
+    "single": "נורמלי לתיק",
+}
+
+COST_METHOD_LABELS = {
+    "average": "עלות ממוצעת",
+    "fifo": "FIFO — ראשון נכנס, ראשון יוצא",
+}
+
 MONTHS_HEB = {
     1: "ינואר", 2: "פברואר", 3: "מרס", 4: "אפריל",
     5: "מאי", 6: "יוני", 7: "יולי", 8: "אוגוסט",
@@ -224,65 +200,118 @@ MONTHS_HEB = {
 }
 
 
+# ========================
+# Ticker Search
+# ========================
+
+@st.cache_resource(show_spinner=False)
+def get_ticker_index() -> TickerIndex:
+    return TickerIndex(TICKER_DB)
+
+
+@st.cache_resource(show_spinner=False)
+def get_asset_options() -> list[str]:
+    return sorted(TICKER_DB)
+
+
 def search_tickers(query: str, limit: int = 12) -> list[tuple[str, str]]:
     if not query:
         return []
-    q = query.upper().strip()
-    exact, starts, contains = [], [], []
-    for sym, name in TICKER_DB.items():
-        sym_up, name_up = sym.upper(), name.upper()
-        if sym_up == q:
-            exact.append((sym, name))
-        elif sym_up.startswith(q) or name_up.startswith(q):
-            starts.append((sym, name))
-        elif q in sym_up or q in name_up:
-            contains.append((sym, name))
-    return (exact + starts + contains)[:limit]
+    return get_ticker_index().search(query, limit)
+
+
+# ========================
+# Price Store
+# ========================
+
+@st.cache_resource(show_spinner=False)
+def get_price_store() -> PriceStore:
+    return PriceStore(PRICE_STORE_DIR)
+
+
+@st.cache_resource(show_spinner=False)
+def get_metadata_store() -> MetadataStore:
+    return MetadataStore(METADATA_PATH)
 
 
 # ========================
 # Data Functions
 # ========================
 
-@st.cache_data(ttl=3600, show_spinner=False)
+PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1),
+    "1y": pd.DateOffset(years=1),
+    "5y": pd.DateOffset(years=5),
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_bar_cache() -> BarCache:
+    return BarCache(get_price_store())
+
+
+@profiled()
 def fetch_price_history(ticker: str, period: str) -> pd.DataFrame:
+    # Served from the bar cache at once, even when stale; expired entries
+    # are refreshed in the background for the next rerun.
     try:
-        tk = yf.Ticker(ticker)
-        interval = "5m" if period == "1d" else ("60m" if period == "5d" else "1d")
-        df = tk.history(period=period, interval=interval, auto_adjust=True)
-        if df.empty:
-            return pd.DataFrame()
-        return df[["Close"]]
+        if period in INTRADAY_PERIODS:
+            close = get_bar_cache().intraday(ticker, period)
+        else:
+            today = pd.Timestamp.today().normalize()
+            start = pd.Timestamp(today.year, 1, 1) if period == "ytd" else today - PERIOD_OFFSETS[period]
+            close = get_bar_cache().daily(ticker, start)
     except Exception:
         return pd.DataFrame()
+    if close.empty:
+        return pd.DataFrame()
+    return close.rename("Close").to_frame()
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def download_close_prices(tickers: tuple, start_date: str, end_date: str) -> pd.DataFrame:
+def lookup_asset_info(ticker: str) -> dict | None:
     try:
-        data = yf.download(list(tickers), start=start_date, end=end_date, auto_adjust=True, progress=False)
-        if data.empty:
-            return pd.DataFrame()
-        if len(tickers) == 1:
-            closes = data[["Close"]]
-            closes.columns = [tickers[0]]
-        else:
-            closes = data["Close"]
-        return closes
+        return get_metadata_store().get(ticker)
     except Exception:
-        return pd.DataFrame()
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def get_market_cache() -> SharedMarketCache:
+    return SharedMarketCache(get_price_store())
+
+
+@profiled()
+def load_market_data(tickers: tuple, start_date: str, end_date: str):
+    # One read-only MarketData per universe and window, memory-mapped and
+    # shared by every session (and every worker process on the host).
+    # Listings quoted outside USD are converted with the currency from the
+    # metadata store: US symbols are USD, other listings come from its cache
+    # (the prewarm fills it for the whole ticker list) or a short lookup. A
+    # listing that lookup can't resolve in time is left out ("unknown
+    # currency", shown with the dropped assets) and looked up again in the
+    # background, so the next run includes it.
+    try:
+        market = get_market_cache().market(tickers, start_date, end_date, get_metadata_store())
+    except Exception as exc:
+        return market_from_closes(pd.DataFrame(), {t: type(exc).__name__ for t in tickers})
+    unknown = [t for t, reason in market.failed.items() if reason == "unknown currency"]
+    if unknown:
+        threading.Thread(target=get_metadata_store().prefetch, args=(unknown,), name="metadata-lookup", daemon=True).start()
+    return market
+
+
+USDILS_FALLBACK = 3.6
 
 
-@st.cache_data(ttl=86400, show_spinner=False)
-def get_usd_to_ils() -> float:
+@st.cache_resource(ttl=86400, show_spinner=False)
+def get_fx_series():
+    # The full daily USDILS history, read through the price store (which the
+    # startup prewarm fills) and shared by every portfolio and session.
+    # None when it can't be loaded: callers fall back to one spot rate.
     try:
-        tk = yf.Ticker("USDILS=X")
-        data = tk.history(period="5d")
-        if not data.empty:
-            return float(data["Close"].iloc[-1])
+        return load_fx(get_price_store(), USDILS_TICKER)
     except Exception:
-        pass
-    return 3.6
+        return None
 
 
 def format_currency(value: float, cur: str) -> str:
@@ -291,6 +320,72 @@ def format_currency(value: float, cur: str) -> str:
     return f"${value:,.0f}"
 
 
+# ========================
+# Result Cache
+# ========================
+
+@st.cache_resource(show_spinner=False)
+def get_simulation_cache() -> LRUCache:
+    return LRUCache()
+
+
+def hex_to_rgba(color: str, alpha: float) -> str:
+    r, g, b = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({r},{g},{b},{alpha})"
+
+
+# ========================
+# Chart Rendering
+# ========================
+
+FIGURE_CACHE_SIZE = 16
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache() -> LRUCache:
+    return LRUCache(FIGURE_CACHE_SIZE)
+
+
+def figure_key(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def line_trace(x, y, **kwargs):
+    # SVG traces stall the browser past a few thousand points; WebGL draws
+    # them at any size, so full-resolution traces switch over.
+    trace_cls = go.Scattergl if len(y) > CHART_MAX_POINTS else go.Scatter
+    return trace_cls(x=x, y=y, **kwargs)
+
+
+def band_indices(lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    # One shared index set for a fan band, keeping the extremes of both edges.
+    half = CHART_MAX_POINTS // 2
+    return np.union1d(downsample_indices(None, lower, half), downsample_indices(None, upper, half))
+
+
+# ========================
+# Background Prewarm
+# ========================
+
+PREWARM = os.environ.get("INVEST_PREWARM", "1") != "0"
+
+
+def prewarm(store: PriceStore, tickers: tuple, metadata: MetadataStore):
+    # Runs once per session after the first paint, off the script thread:
+    # pays the yfinance import, plotly's first-figure setup and the
+    # session's price history up front so the first simulation, search or
+    # ILS switch doesn't, then tops up the asset metadata (a no-op while
+    # it's fresh). Must not call st.* (no script context here).
+    try:
+        import yfinance  # noqa: F401
+
+        go.Figure(go.Scatter(x=[0], y=[0])).to_plotly_json()
+        store.refresh(tickers, pd.Timestamp.today().normalize())
+        metadata.prefetch(tuple(TICKER_DB) + tickers)
+    except Exception:
+        pass
+
+
 # ================================================================
 #   HERO HEADER
 # ================================================================
@@ -326,23 +421,40 @@ with tab_research:
             chosen_ticker = chosen.split("  —  ")[0].strip() if chosen else None
         else:
             chosen_ticker = search_query.strip().upper()
-            st.info(f"לא נמצא במאגר — מנסה לטעון: {chosen_ticker}")
+            suggestions = get_ticker_index().suggest(search_query)
+            if suggestions:
+                options_list = [f"{chosen_ticker}  —  (כפי שהוקלד)"] + [f"{sym}  —  {name}" for sym, name in suggestions]
+                chosen = st.selectbox("לא נמצא במאגר — האם התכוונת ל:", options=options_list, key="search_suggest")
+                chosen_ticker = chosen.split("  —  ")[0].strip() if chosen else chosen_ticker
+            else:
+                st.info(f"לא נמצא במאגר — מנסה לטעון: {chosen_ticker}")
 
         if chosen_ticker:
-            with st.spinner("טוען נתונים..."):
+            with st.spinner("טוען נתונים..."), ThreadPoolExecutor(max_workers=1) as pool:
+                info_future = pool.submit(lookup_asset_info, chosen_ticker)
                 price_data = fetch_price_history(chosen_ticker, PERIOD_MAP[search_period])
-
-            if not price_data.empty:
                 try:
-                    asset_name = yf.Ticker(chosen_ticker).info.get("shortName", chosen_ticker)
+                    asset_info = info_future.result(timeout=FETCH_TIMEOUT) or {}
                 except Exception:
-                    asset_name = chosen_ticker
+                    asset_info = {}
 
-                st.markdown(f"#### {asset_name} ({chosen_ticker})")
+            if not price_data.empty:
 
+                st.markdown(f"#### {asset_info.get('name') or chosen_ticker} ({chosen_ticker})")
+                info_parts = [
+                    asset_info.get("asset_class"), asset_info.get("exchange"),
+                    f"מטבע: {asset_info['currency']}" if asset_info.get("currency") else None,
+                    f"דמי ניהול: {asset_info['expense_ratio']:.2f}%" if asset_info.get("expense_ratio") is not None else None,
+                ]
+                if any(info_parts):
+                    st.caption(" • ".join(p for p in info_parts if p))
+                quote_currency = asset_info.get("currency")
+                px_sym = "$" if quote_currency == "USD" else f"{quote_currency} " if quote_currency else ""
+
+                close_s = price_data["Close"] if st.session_state.get("chart_full_res") else downsample_series(price_data["Close"])
                 fig_s = go.Figure()
-                fig_s.add_trace(go.Scatter(
-                    x=price_data.index, y=price_data["Close"],
+                fig_s.add_trace(line_trace(
+                    close_s.index, close_s.values,
                     mode="lines", name=chosen_ticker,
                     line=dict(color="#00d4aa", width=2),
                     fill="tozeroy", fillcolor="rgba(0,212,170,0.1)",
@@ -350,7 +462,7 @@ with tab_research:
                 fig_s.update_layout(
                     template="plotly_dark", height=400,
                     margin=dict(l=20, r=20, t=30, b=20),
-                    xaxis_title="תאריך", yaxis_title="מחיר ($)",
+                    xaxis_title="תאריך", yaxis_title=f"מחיר ({px_sym.strip()})",
                     hovermode="x unified",
                 )
                 st.plotly_chart(fig_s, use_container_width=True)
@@ -362,10 +474,10 @@ with tab_research:
                 lo = float(price_data["Close"].min())
 
                 mc1, mc2, mc3, mc4 = st.columns(4)
-                mc1.metric("מחיר נוכחי", f"${lp:.2f}")
+                mc1.metric("מחיר נוכחי", f"{px_sym}{lp:.2f}")
                 mc2.metric("שינוי בתקופה", f"{ch:+.2f}%")
-                mc3.metric("שיא", f"${hi:.2f}")
-                mc4.metric("שפל", f"${lo:.2f}")
+                mc3.metric("שיא", f"{px_sym}{hi:.2f}")
+                mc4.metric("שפל", f"{px_sym}{lo:.2f}")
             else:
                 st.warning(f"לא נמצאו נתונים עבור: {chosen_ticker}")
 
@@ -395,9 +507,27 @@ with tab_simulation:
     with rebal_col:
         rebalance_freq = st.selectbox("🔄 איזון מחדש", ["ללא", "חודשי", "רבעוני", "שנתי"], key="rebalance_freq")
 
+    # Row 1b: How taxable gains are measured — every purchase is its own lot
+    lot_col, infl_col = st.columns(2)
+    with lot_col:
+        cost_method = st.selectbox(
+            "🧾 שיטת חישוב עלות", options=list(COST_METHOD_LABELS), format_func=COST_METHOD_LABELS.get, key="cost_method",
+            help="כל הפקדה נרשמת כמנה נפרדת. FIFO: משיכה מוכרת קודם את המנות הוותיקות. עלות ממוצעת: כל משיכה מוכרת חלק יחסי מכל המנות.",
+        )
+    with infl_col:
+        cost_inflation_pct = st.number_input(
+            "📈 הצמדת העלות למדד (אינפלציה שנתית %)", min_value=0.0, max_value=20.0,
+            value=0.0, step=0.5, key="cost_inflation_pct",
+            help="עלות כל מנה מוצמדת לאינפלציה מיום הקנייה, כך שרק הרווח הריאלי חייב במס. 0 = מס על הרווח הנומינלי.",
+        )
+
     CAPITAL_GAINS_TAX = capital_gains_tax_pct / 100.0
+    COST_INFLATION = cost_inflation_pct / 100.0
     freq_map = {"ללא": None, "חודשי": "ME", "רבעוני": "QE", "שנתי": "YE"}
-    exchange_rate = get_usd_to_ils() if active_currency == "ILS" else 1.0
+    fx = get_fx_series() if active_currency == "ILS" else None
+    # Spot rate: the latest quote. Sweeps, cohorts and the optimizer convert
+    # with it; the main simulation converts each flow at its own date's rate.
+    exchange_rate = (fx.latest if fx is not None else USDILS_FALLBACK) if active_currency == "ILS" else 1.0
     cur_symbol = "₪" if active_currency == "ILS" else "$"
     cur_label = "שקלים" if active_currency == "ILS" else "דולרים"
 
@@ -428,9 +558,15 @@ with tab_simulation:
         initial_capital = float(initial_capital_input)
         global_monthly = float(global_monthly_input)
 
-    if active_currency == "ILS":
+    if active_currency == "ILS" and fx is not None:
+        st.caption(
+            f"💱 שער נוכחי: {exchange_rate:.2f} ₪/$ | "
+            f"הסימולציה ממירה כל הפקדה, משיכה ונקודה בגרף לפי השער ההיסטורי של אותו יום "
+            f"(נתוני שער מ-{fx.first_date:%m/%Y}; לפני כן — השער הראשון, בעתיד — השער הנוכחי)"
+        )
+    elif active_currency == "ILS":
         st.caption(
-            f"💱 שער המרה: {exchange_rate:.2f} ₪/$ | "
+            f"💱 היסטוריית השער לא נטענה — המרה לפי שער קבוע {exchange_rate:.2f} ₪/$ | "
             f"השקעה ראשונית: ${initial_capital:,.0f} | "
             f"הפקדה חודשית: ${global_monthly:,.0f}"
         )
@@ -450,6 +586,37 @@ with tab_simulation:
     if is_future:
         st.info(f"⏳ טווח הסימולציה כולל שנים עתידיות ({current_year + 1}–{int(end_year)}). הפרויקציה מבוססת על תשואות היסטוריות ממוצעות.")
 
+    mc_paths, mc_method, mc_seed = 0, "bootstrap", 42
+    if is_future:
+        mc_col1, mc_col2, mc_col3, mc_col4 = st.columns(4)
+        with mc_col1:
+            mc_enabled = st.checkbox(
+                "🎲 תחזית מונטה קרלו (טווח הסתברויות)", key="mc_enabled",
+                help="מריץ אלפי מסלולים אקראיים לשנים העתידיות ומציג טווחי אחוזונים (5%–95%).",
+            )
+        with mc_col2:
+            mc_paths_input = st.number_input(
+                "מספר מסלולים", min_value=1_000, max_value=100_000,
+                value=10_000, step=1_000, key="mc_paths", disabled=not mc_enabled,
+            )
+        with mc_col3:
+            mc_method = st.selectbox(
+                "שיטת דגימה", options=list(MC_METHOD_LABELS), format_func=MC_METHOD_LABELS.get,
+                key="mc_method", disabled=not mc_enabled,
+                help="בוטסטרפ: דגימת בלוקים של ימי מסחר היסטוריים (זנבות עבים ומתאמים אמיתיים). "
+                     "נורמלי מתואם: התפלגות נורמלית רב-ממדית לפי מטריצת השונות. "
+                     "נורמלי לתיק: תשואה אחת לתיק כולו (ללא סחיפת משקלות).",
+            )
+        with mc_col4:
+            mc_seed = st.number_input("זרע אקראי", min_value=0, max_value=2**31 - 1, value=42, step=1, key="mc_seed", disabled=not mc_enabled)
+        mc_paths = int(mc_paths_input) if mc_enabled else 0
+
+    chart_full_res = st.checkbox(
+        "🖼️ גרפים ברזולוציה מלאה", key="chart_full_res",
+        help=f"כברירת מחדל כל קו מצומצם לכ-{CHART_MAX_POINTS:,} נקודות (שיאים ושפלים נשמרים) לטעינה מהירה. "
+             "ברזולוציה מלאה קווים ארוכים מצוירים ב-WebGL.",
+    )
+
     st.markdown('</div>', unsafe_allow_html=True)
 
     # ── SECTION: Portfolio Definition ──
@@ -458,25 +625,77 @@ with tab_simulation:
 
     add_col, remove_col, info_col = st.columns([1, 1, 2])
     with add_col:
-        if st.button("➕ הוסף פורטפוליו", disabled=(st.session_state.num_portfolios >= 3)):
+        if st.button("➕ הוסף פורטפוליו", disabled=(st.session_state.num_portfolios >= MAX_PORTFOLIOS)):
             st.session_state.num_portfolios += 1
-            new_idx = st.session_state.num_portfolios - 1
-            if new_idx not in st.session_state.portfolios:
-                st.session_state.portfolios[new_idx] = {
-                    "assets": [], "weights": {}, "phase": "שלב הצבירה",
-                    "monthly": 0, "withdrawal_rate": 0.0, "withdrawal_month": 1,
-                }
+            st.session_state.portfolios.setdefault(st.session_state.num_portfolios - 1, new_portfolio())
             st.rerun()
     with remove_col:
         if st.button("➖ הסר פורטפוליו", disabled=(st.session_state.num_portfolios <= 1)):
             st.session_state.num_portfolios -= 1
             st.rerun()
     with info_col:
-        st.caption(f"מוצגים {st.session_state.num_portfolios} מתוך 3 פורטפוליו מקסימום")
+        st.caption(
+            f"מוצגים {st.session_state.num_portfolios} מתוך {MAX_PORTFOLIOS} פורטפוליו מקסימום"
+            f" • מעל {DETAIL_MAX_PORTFOLIOS} — טבלת דירוג וגרף של המובילים"
+        )
+
+    def load_model_set():
+        # One portfolio per line, "TICKER weight, TICKER weight"; replaces
+        # the current portfolios and resets their widgets.
+        models = []
+        for line in st.session_state.model_set_text.splitlines():
+            weights = {}
+            for part in line.replace(";", ",").split(","):
+                fields = part.replace(":", " ").split()
+                if len(fields) == 2:
+                    try:
+                        weights[fields[0].upper()] = float(fields[1])
+                    except ValueError:
+                        pass
+            if weights:
+                models.append(weights)
+        models = models[:MAX_PORTFOLIOS]
+        if not models:
+            st.session_state.model_set_error = "לא נמצאו תיקים בטקסט — שורה לכל תיק, למשל: SPY 60, TLT 40"
+            return
+        st.session_state.model_set_error = None
+        for key in [k for k in st.session_state if k.startswith(("assets_", "w_", "phase_", "wd_", "custom_"))]:
+            del st.session_state[key]
+        for i, weights in enumerate(models):
+            st.session_state.portfolios[i] = new_portfolio(weights)
+            custom = [a for a in weights if a not in TICKER_DB]
+            if custom:
+                st.session_state[f"custom_{i}"] = ", ".join(custom)
+        st.session_state.num_portfolios = len(models)
+
+    def fill_glide_path():
+        equity, bond = st.session_state.glide_equity.strip().upper(), st.session_state.glide_bond.strip().upper()
+        steps = int(st.session_state.glide_steps)
+        shares = np.linspace(100.0, 0.0, steps) if steps > 1 else np.array([100.0])
+        st.session_state.model_set_text = "\n".join(
+            ", ".join(f"{t} {w:g}" for t, w in ((equity, round(e, 1)), (bond, round(100.0 - e, 1))) if w > 0) for e in shares
+        )
+
+    with st.expander(f"📥 טעינת סט מודלים — עד {MAX_PORTFOLIOS} תיקים בבת אחת"):
+        gl1, gl2, gl3, gl4 = st.columns([1, 1, 1, 1])
+        with gl1:
+            st.text_input("מניות", value="SPY", key="glide_equity")
+        with gl2:
+            st.text_input("אג״ח", value="BND", key="glide_bond")
+        with gl3:
+            st.number_input("מספר תיקים", min_value=2, max_value=MAX_PORTFOLIOS, value=11, step=1, key="glide_steps")
+        with gl4:
+            st.button("📉 צור מסלול (Glide Path)", key="glide_fill", on_click=fill_glide_path)
+        st.text_area(
+            "תיק בכל שורה", key="model_set_text", height=160,
+            placeholder="SPY 60, TLT 40\nVTI 80, BND 20\nQQQ 100",
+        )
+        st.button("📥 טען כפורטפוליו", key="model_set_load", on_click=load_model_set)
+        if st.session_state.get("model_set_error"):
+            st.warning(st.session_state.model_set_error)
 
-    ASSET_OPTIONS = sorted(TICKER_DB.keys())
+    ASSET_OPTIONS = get_asset_options()
     num_p = st.session_state.num_portfolios
-    portfolio_cols = st.columns(num_p)
 
     def render_portfolio(col, idx):
         with col:
@@ -503,7 +722,7 @@ with tab_simulation:
 
             selected_assets = st.multiselect(
                 "🔎 בחר נכסים / מניות", options=ASSET_OPTIONS,
-                default=st.session_state.portfolios[idx].get("assets", []),
+                default=[a for a in st.session_state.portfolios[idx].get("assets", []) if a in TICKER_DB],
                 key=f"assets_{idx}",
                 format_func=lambda x: f"{x} — {TICKER_DB.get(x, '')}",
             )
@@ -542,141 +761,386 @@ with tab_simulation:
                 "withdrawal_rate": withdrawal_rate, "withdrawal_month": withdrawal_month,
             }
 
-    for idx in range(num_p):
-        render_portfolio(portfolio_cols[idx], idx)
+    for row_start in range(0, num_p, PORTFOLIOS_PER_ROW):
+        row_cols = st.columns(PORTFOLIOS_PER_ROW if num_p > 1 else 1)
+        for idx in range(row_start, min(row_start + PORTFOLIOS_PER_ROW, num_p)):
+            render_portfolio(row_cols[idx - row_start], idx)
 
     st.markdown('</div>', unsafe_allow_html=True)
 
-    # ================================================================
-    #   Simulation Engine
-    # ================================================================
+    # ── SECTION: Optimizer ──
+
+    def load_optimized_portfolio(kind):
+        res = st.session_state.opt_result
+        slot = st.session_state.opt_slot
+        weights = {a: round(float(w) * 100, 1) for a, w in zip(res["assets"], res["frontier"][kind]) if w * 100 >= 0.05}
+        largest = max(weights, key=weights.get)
+        weights[largest] = round(weights[largest] + 100.0 - sum(weights.values()), 1)
+        st.session_state.portfolios[slot] = {
+            **st.session_state.portfolios.get(slot, new_portfolio()),
+            "assets": list(weights), "weights": weights,
+        }
+        for key in [k for k in st.session_state if k == f"assets_{slot}" or k.startswith(f"w_{slot}_")]:
+            del st.session_state[key]
+        st.session_state.num_portfolios = max(st.session_state.num_portfolios, slot + 1)
+
+    with st.expander("🧮 אופטימיזציית תיק — גבול יעיל (Efficient Frontier)"):
+        opt_assets = st.multiselect(
+            "נכסים לאופטימיזציה", options=ASSET_OPTIONS,
+            default=["SPY", "QQQ", "VXUS", "TLT", "BND", "GLD"], key="opt_assets",
+            format_func=lambda x: f"{x} — {TICKER_DB.get(x, '')}",
+        )
+        oc1, oc2, oc3, oc4 = st.columns(4)
+        with oc1:
+            opt_lookback = st.number_input("שנות היסטוריה", min_value=1, max_value=30, value=10, step=1, key="opt_lookback")
+        with oc2:
+            opt_cap = st.slider("משקל מקסימלי לנכס (%)", min_value=5, max_value=100, value=40, step=5, key="opt_cap")
+        with oc3:
+            opt_rf = st.number_input("ריבית חסרת סיכון (%)", min_value=0.0, max_value=10.0, value=4.0, step=0.25, key="opt_rf")
+        with oc4:
+            opt_long_only = st.checkbox("ללא מכירה בחסר", value=True, key="opt_long_only")
+
+        if st.button("📐 חשב גבול יעיל", key="opt_run"):
+            if len(opt_assets) < 2:
+                st.warning("בחר לפחות שני נכסים.")
+            else:
+                opt_end = datetime.today()
+                opt_start = opt_end - timedelta(days=int(opt_lookback * 365.25))
+                with st.spinner("טוען נתונים..."):
+                    opt_market = load_market_data(tuple(opt_assets), opt_start.strftime("%Y-%m-%d"), opt_end.strftime("%Y-%m-%d"))
+                usable = [a for a in opt_assets if a in opt_market.columns]
+                opt_returns = opt_market.returns(usable) if len(usable) >= 2 else pd.DataFrame()
+                if opt_returns.empty:
+                    st.session_state.pop("opt_result", None)
+                    st.error("לא נמצאו מספיק נתונים לאופטימיזציה.")
+                else:
+                    t0 = time.perf_counter()
+                    mu, cov = annualized_moments(opt_returns.to_numpy())
+                    frontier = efficient_frontier(mu, cov, cap=opt_cap / 100.0, long_only=opt_long_only, n_points=300, risk_free=opt_rf / 100.0)
+                    st.session_state.opt_result = {
+                        "assets": usable, "mu": mu, "vol": np.sqrt(np.diag(cov)), "frontier": frontier,
+                        "long_only": opt_long_only, "elapsed": time.perf_counter() - t0,
+                        "failed": [a for a in opt_assets if a not in usable],
+                    }
+
+        res = st.session_state.get("opt_result")
+        if res:
+            fr = res["frontier"]
+            fig_ef = go.Figure()
+            fig_ef.add_trace(go.Scatter(x=fr["vols"] * 100, y=fr["returns"] * 100, mode="lines", name="גבול יעיל", line=dict(color="#4dabf7", width=2.5)))
+            fig_ef.add_trace(go.Scatter(x=res["vol"] * 100, y=res["mu"] * 100, mode="markers+text", name="נכסים", text=res["assets"], textposition="top center", marker=dict(color="#888", size=8)))
+            for idx_key, label, color, symbol in (("max_sharpe_idx", "שארפ מקסימלי", "#00d4aa", "star"), ("min_variance_idx", "שונות מינימלית", "#ffcc00", "diamond")):
+                i = fr[idx_key]
+                fig_ef.add_trace(go.Scatter(x=[fr["vols"][i] * 100], y=[fr["returns"][i] * 100], mode="markers", name=label, marker=dict(color=color, size=16, symbol=symbol)))
+            fig_ef.update_layout(template="plotly_dark", height=420, margin=dict(l=20, r=20, t=30, b=20), xaxis_title="תנודתיות שנתית (%)", yaxis_title="תשואה שנתית צפויה (%)")
+            st.plotly_chart(fig_ef, use_container_width=True)
+
+            ms, mv = fr["max_sharpe_idx"], fr["min_variance_idx"]
+            st.caption(
+                f"שארפ מקסימלי: תשואה {fr['returns'][ms] * 100:.1f}% | תנודתיות {fr['vols'][ms] * 100:.1f}% | שארפ {fr['sharpe'][ms]:.2f} • "
+                f"שונות מינימלית: תשואה {fr['returns'][mv] * 100:.1f}% | תנודתיות {fr['vols'][mv] * 100:.1f}% • "
+                f"⏱️ {res['elapsed'] * 1000:.0f}ms ל-{len(fr['weights'])} נקודות ({len(fr['corners'])} נקודות מפנה)"
+            )
+            if res["failed"]:
+                st.warning(f"לא נטענו נתונים עבור: {', '.join(res['failed'])}")
 
-    def simulate_portfolio(port_cfg, initial, monthly_contribution, start_y, end_y, rebalance):
-        assets = port_cfg["assets"]
-        weights_dict = port_cfg["weights"]
-        withdrawal_rate = port_cfg.get("withdrawal_rate", 0.0)
-        withdrawal_month = port_cfg.get("withdrawal_month", 1)
-
-        if not assets or not weights_dict:
-            return pd.Series(dtype=float), {}
-        total_w = sum(weights_dict.values())
-        if total_w == 0:
-            return pd.Series(dtype=float), {}
-
-        norm_weights = np.array([weights_dict.get(a, 0) / total_w for a in assets])
-        today = datetime.today()
-        sim_start = datetime(int(start_y), 1, 1)
-        sim_end = datetime(int(end_y), 12, 31)
-
-        hist_end = min(sim_end, today)
-        dl_start = sim_start if sim_start < today else today - timedelta(days=10 * 365)
-
-        closes = download_close_prices(tuple(assets), dl_start.strftime("%Y-%m-%d"), hist_end.strftime("%Y-%m-%d"))
-        if closes.empty:
-            return pd.Series(dtype=float), {}
-
-        missing = [a for a in assets if a not in closes.columns]
-        if missing:
-            return pd.Series(dtype=float), {}
-
-        closes = closes[list(assets)]
-        returns_df = closes.pct_change().dropna()
-        if returns_df.empty:
-            return pd.Series(dtype=float), {}
-
-        port_daily_returns = (returns_df * norm_weights).sum(axis=1)
-        hist_returns = port_daily_returns[port_daily_returns.index >= pd.Timestamp(sim_start)]
-
-        if sim_end > today:
-            mean_daily = port_daily_returns.mean()
-            std_daily = port_daily_returns.std()
-            future_days = pd.bdate_range(start=today + timedelta(days=1), end=sim_end)
-            np.random.seed(42)
-            future_returns = np.random.normal(mean_daily, std_daily, len(future_days))
-            combined_returns = pd.concat([hist_returns, pd.Series(future_returns, index=future_days)])
-        else:
-            combined_returns = hist_returns
-
-        if rebalance:
-            combined_returns = combined_returns.resample(rebalance).apply(lambda x: (1 + x).prod() - 1)
-
-        capital = float(initial)
-        cost_basis = float(initial)
-        total_invested = float(initial)
-        total_withdrawn_gross = 0.0
-        total_tax_paid = 0.0
-        total_withdrawn_net = 0.0
-        values = []
-        prev_month = None
-        withdrew_this_year = set()
-
-        for date, r in combined_returns.items():
-            cur_month = (date.year, date.month)
-            new_month = prev_month is not None and cur_month != prev_month
-            prev_month = cur_month
-            capital *= (1 + r)
-
-            if new_month:
-                if monthly_contribution > 0:
-                    capital += monthly_contribution
-                    cost_basis += monthly_contribution
-                    total_invested += monthly_contribution
-
-                if withdrawal_rate > 0 and date.month == withdrawal_month and date.year not in withdrew_this_year:
-                    withdrew_this_year.add(date.year)
-                    gross_wd = capital * (withdrawal_rate / 100.0)
-
-                    if capital > 0 and capital > cost_basis:
-                        gain_ratio = (capital - cost_basis) / capital
-                        tax = gross_wd * gain_ratio * CAPITAL_GAINS_TAX
-                    else:
-                        tax = 0.0
+            weights_df = pd.DataFrame(
+                {"שארפ מקסימלי (%)": fr["max_sharpe"] * 100, "שונות מינימלית (%)": fr["min_variance"] * 100},
+                index=res["assets"],
+            )
+            weights_df = weights_df[(weights_df.abs() >= 0.05).any(axis=1)].round(1)
+            st.dataframe(weights_df, use_container_width=True)
+
+            if res["long_only"]:
+                lc1, lc2, lc3 = st.columns([1, 1, 1])
+                with lc1:
+                    st.selectbox("טען לפורטפוליו", options=list(range(min(st.session_state.num_portfolios + 1, MAX_PORTFOLIOS))), format_func=lambda i: f"פורטפוליו {i + 1}", key="opt_slot")
+                with lc2:
+                    st.button("⬅️ טען תיק שארפ מקסימלי", key="opt_load_ms", on_click=load_optimized_portfolio, args=("max_sharpe",))
+                with lc3:
+                    st.button("⬅️ טען תיק שונות מינימלית", key="opt_load_mv", on_click=load_optimized_portfolio, args=("min_variance",))
+            else:
+                st.caption("טעינה לפורטפוליו זמינה רק לתיקים ללא מכירה בחסר.")
 
-                    total_withdrawn_gross += gross_wd
-                    total_tax_paid += tax
-                    total_withdrawn_net += gross_wd - tax
+    # ── SECTION: Parameter Sweep ──
 
-                    capital -= gross_wd
-                    capital = max(capital, 0)
+    SWEEP_METRICS = {
+        "end_val": "שווי סופי",
+        "net_profit": "רווח נטו אחרי מס",
+        "depleted": "שחיקת הקרן (0/1)",
+    }
 
-                    if capital > 0:
-                        cost_basis *= capital / (capital + gross_wd) if (capital + gross_wd) > 0 else 0
+    with st.expander("🧪 סריקת פרמטרים — שיעורי משיכה × שנות התחלה × הרכבים"):
+        sweepable = [i for i in range(st.session_state.num_portfolios) if st.session_state.portfolios[i]["assets"]]
+        sw_ports = st.multiselect(
+            "הרכבי תיק (מהפורטפוליו שהוגדרו)", options=sweepable, default=sweepable,
+            format_func=lambda i: f"פורטפוליו {i + 1}", key="sw_ports",
+        )
+        sc1, sc2, sc3 = st.columns(3)
+        with sc1:
+            sw_rates = st.slider("שיעור משיכה שנתי (%)", min_value=0.0, max_value=12.0, value=(3.0, 6.0), step=0.5, key="sw_rates")
+            sw_rate_step = st.number_input("קפיצה (%)", min_value=0.25, max_value=5.0, value=0.5, step=0.25, key="sw_rate_step")
+        with sc2:
+            sw_years = st.slider("שנות התחלה", min_value=1990, max_value=current_year - 1, value=(max(1995, current_year - 30), current_year - 10), step=1, key="sw_years")
+            sw_horizon = st.number_input("אופק (שנים)", min_value=1, max_value=60, value=10, step=1, key="sw_horizon")
+        with sc3:
+            sw_monthly_text = st.text_input(f"הפקדות חודשיות ({cur_symbol}, מופרדות בפסיק)", value=f"{global_monthly_input:g}", key="sw_monthly")
+            sw_months = st.multiselect("חודשי משיכה", options=list(MONTHS_HEB.keys()), default=[1], format_func=lambda m: MONTHS_HEB[m], key="sw_months")
+
+        if st.button("🧪 הרץ סריקה", key="sw_run"):
+            try:
+                sw_monthly = sorted({float(v) / exchange_rate for v in sw_monthly_text.replace(" ", "").split(",") if v})
+            except ValueError:
+                sw_monthly = []
+            rates = list(np.round(np.arange(sw_rates[0], sw_rates[1] + sw_rate_step / 2, sw_rate_step), 4))
+            if not sw_ports or not sw_monthly or not sw_months or not rates:
+                st.warning("בחר לפחות הרכב אחד, הפקדה חודשית אחת וחודש משיכה אחד.")
+            else:
+                sweep_base = {
+                    "initial": initial_capital, "rebalance": freq_map[rebalance_freq], "tax_rate": CAPITAL_GAINS_TAX,
+                    "cost_method": cost_method, "inflation": COST_INFLATION,
+                    "weights": st.session_state.portfolios[sw_ports[0]]["weights"],
+                }
+                sweep_axes = {
+                    "weights": [{a: st.session_state.portfolios[i]["weights"].get(a, 0) for a in st.session_state.portfolios[i]["assets"]} for i in sw_ports],
+                    "withdrawal_rate": rates,
+                    "withdrawal_month": sw_months,
+                    "start_year": list(range(sw_years[0], sw_years[1] + 1)),
+                    "horizon": [int(sw_horizon)],
+                    "monthly": sw_monthly,
+                }
+                points = expand_grid(sweep_base, sweep_axes)
+                with st.spinner(f"מריץ {len(points):,} תרחישים..."):
+                    t0 = time.perf_counter()
+                    sw_market = load_market_data(tuple(sorted({a for p in points for a in p["assets"]})), *sweep_window(points))
+                    sw_results = run_sweep(sw_market, points)
+                    st.session_state.sweep_result = {
+                        "results": sw_results, "labels": {w: f"פורטפוליו {i + 1}" for i, w in zip(sw_ports, sw_results["weights"].unique())},
+                        "elapsed": time.perf_counter() - t0, "ex_rate": exchange_rate, "cur_symbol": cur_symbol,
+                    }
+
+        sw = st.session_state.get("sweep_result")
+        if sw is not None and not sw["results"].empty:
+            results = sw["results"]
+            ok = results[results["ok"]]
+            metric = st.radio("מדד", list(SWEEP_METRICS), format_func=SWEEP_METRICS.get, horizontal=True, key="sw_metric")
+            # A heatmap shows exactly two axes (withdrawal rate × start year);
+            # the other swept axes are pinned to one chosen value each.
+            fc1, fc2 = st.columns(2)
+            sw_deposits = sorted(ok["monthly"].unique())
+            if len(sw_deposits) > 1:
+                with fc1:
+                    shown_deposit = st.selectbox("הפקדה חודשית במפה", sw_deposits, format_func=lambda v: f"{sw['cur_symbol']}{v * sw['ex_rate']:,.0f}", key="sw_show_monthly")
+                ok = ok[ok["monthly"] == shown_deposit]
+            sw_wd_months = sorted(ok["withdrawal_month"].unique())
+            if len(sw_wd_months) > 1:
+                with fc2:
+                    shown_month = st.selectbox("חודש משיכה במפה", sw_wd_months, format_func=lambda m: MONTHS_HEB[m], key="sw_show_month")
+                ok = ok[ok["withdrawal_month"] == shown_month]
+            for weights_label, group in ok.groupby("weights", sort=False):
+                # Portfolios with identical weights give identical rows.
+                grid = group.drop_duplicates(["withdrawal_rate", "start_year"]).pivot(index="withdrawal_rate", columns="start_year", values=metric)
+                z = grid.to_numpy(dtype=float) * (1.0 if metric == "depleted" else sw["ex_rate"])
+                fig_sw = go.Figure(go.Heatmap(
+                    z=z, x=grid.columns.astype(str), y=[f"{r:g}%" for r in grid.index],
+                    colorscale="RdYlGn_r" if metric == "depleted" else "RdYlGn",
+                    hovertemplate="שנת התחלה %{x} | משיכה %{y}<br>%{z:,.0f}<extra></extra>",
+                ))
+                fig_sw.update_layout(
+                    template="plotly_dark", height=360, margin=dict(l=20, r=20, t=40, b=20),
+                    title=f"{sw['labels'].get(weights_label, '')} — {weights_label}", xaxis_title="שנת התחלה", yaxis_title="שיעור משיכה",
+                )
+                st.plotly_chart(fig_sw, use_container_width=True)
+
+            table = ruin_table(ok)
+            if not table.empty:
+                table["weights"] = table["weights"].map(lambda w: f"{sw['labels'].get(w, '')} — {w}")
+                for col in ("median_end", "worst_end", "median_net_profit"):
+                    table[col] = (table[col] * sw["ex_rate"]).map(lambda v: f"{sw['cur_symbol']}{v:,.0f}")
+                table["ruin_prob"] = (table["ruin_prob"] * 100).map(lambda v: f"{v:.0f}%")
+                table = table.rename(columns={
+                    "weights": "הרכב", "withdrawal_rate": "משיכה (%)", "ruin_prob": "הסתברות לשחיקה",
+                    "median_end": "שווי סופי חציוני", "median_net_profit": "רווח נטו חציוני", "worst_end": "שווי סופי גרוע", "n": "תרחישים",
+                })
+                st.dataframe(table, use_container_width=True, hide_index=True)
+            st.caption(
+                f"⏱️ {len(results):,} תרחישים ב-{sw['elapsed']:.2f} שניות • "
+                f"הסתברות לשחיקה = שיעור שנות ההתחלה שבהן שווי התיק ירד מתחת ל-{DEPLETION_FRACTION * 100:.0f}% מהסכום ההתחלתי."
+            )
+            if not results["ok"].all():
+                st.warning(f"{(~results['ok']).sum()} תרחישים ללא נתונים הושמטו.")
+
+    # ── SECTION: Rolling Cohorts ──
+
+    with st.expander("📆 בדיקה מתגלגלת — כל חודשי ההתחלה ההיסטוריים"):
+        rc1, rc2, rc3 = st.columns(3)
+        with rc1:
+            rc_slot = st.selectbox(
+                "פורטפוליו", options=[i for i in range(st.session_state.num_portfolios) if st.session_state.portfolios[i]["assets"]] or [0],
+                format_func=lambda i: f"פורטפוליו {i + 1}", key="rc_slot",
+            )
+        with rc2:
+            rc_horizon = st.number_input("אופק (שנים)", min_value=1, max_value=40, value=30, step=1, key="rc_horizon")
+        with rc3:
+            rc_from = st.number_input("היסטוריה משנת", min_value=1970, max_value=current_year - 1, value=1993, step=1, key="rc_from")
+
+        if st.button("📆 הרץ בדיקה מתגלגלת", key="rc_run"):
+            rc_cfg = st.session_state.portfolios[rc_slot]
+            with st.spinner("מחשב קוהורטות..."):
+                t0 = time.perf_counter()
+                rc_market = load_market_data(tuple(rc_cfg["assets"]), f"{int(rc_from)}-01-01", datetime.today().strftime("%Y-%m-%d"))
+                rc_result = backtest_cohorts(rc_cfg, rc_market, initial_capital, global_monthly, int(rc_horizon), freq_map[rebalance_freq], CAPITAL_GAINS_TAX, cost_method, COST_INFLATION)
+                st.session_state.cohort_result = {
+                    "result": rc_result, "slot": rc_slot, "horizon": int(rc_horizon), "elapsed": time.perf_counter() - t0,
+                    "ex_rate": exchange_rate, "cur": active_currency,
+                }
+
+        rc = st.session_state.get("cohort_result")
+        if rc is not None:
+            res = rc["result"]
+            if not res:
+                st.warning(f"אין מספיק היסטוריה לאופק של {rc['horizon']} שנים — הקטן את האופק או הקדם את שנת ההתחלה.")
+            else:
+                ex, cur = rc["ex_rate"], rc["cur"]
+                worst = res["worst"]
+                m1, m2, m3, m4 = st.columns(4)
+                with m1:
+                    st.metric("קוהורטות", f"{res['n_cohorts']:,}")
+                with m2:
+                    st.metric("ללא שחיקת הקרן", f"{res['success_rate'] * 100:.1f}%")
+                with m3:
+                    st.metric("שווי סופי חציוני", format_currency(res["median_end"] * ex, cur))
+                with m4:
+                    st.metric(f"הקוהורטה הגרועה ({worst['start']:%m/%Y})", format_currency(worst["end_val"] * ex, cur))
+
+                years_axis = np.arange(1, rc["horizon"] * 12 + 1) / 12.0
+                bands = res["bands"]
+                fig_rc = go.Figure()
+                for lo, hi, alpha in ((5, 95, 0.12), (25, 75, 0.22)):
+                    fig_rc.add_trace(go.Scatter(
+                        x=np.concatenate([years_axis, years_axis[::-1]]),
+                        y=np.concatenate([bands[hi], bands[lo][::-1]]) * ex,
+                        fill="toself", fillcolor=hex_to_rgba("#4dabf7", alpha), line=dict(width=0),
+                        name=f"P{lo}–P{hi}", hoverinfo="skip",
+                    ))
+                fig_rc.add_trace(go.Scatter(x=years_axis, y=bands[50] * ex, mode="lines", name="חציון", line=dict(color="#4dabf7", width=2.5)))
+                worst_idx = int(np.argmin(res["paths"][:, -1]))
+                fig_rc.add_trace(go.Scatter(x=years_axis, y=res["paths"][worst_idx] * ex, mode="lines", name=f"גרועה ({worst['start']:%m/%Y})", line=dict(color="#ff6b6b", width=2, dash="dot")))
+                fig_rc.update_layout(template="plotly_dark", height=420, margin=dict(l=20, r=20, t=30, b=20), xaxis_title="שנים מתחילת ההשקעה", yaxis_title=f"שווי ({cur})")
+                st.plotly_chart(fig_rc, use_container_width=True)
+
+                cohorts = res["cohorts"]
+                fig_hist = go.Figure(go.Histogram(x=cohorts["end_val"] * ex, nbinsx=40, marker_color="#00d4aa"))
+                fig_hist.update_layout(template="plotly_dark", height=260, margin=dict(l=20, r=20, t=30, b=20), xaxis_title="שווי סופי", yaxis_title="קוהורטות")
+                st.plotly_chart(fig_hist, use_container_width=True)
+
+                worst5 = cohorts.nsmallest(5, "end_val")
+                st.dataframe(pd.DataFrame({
+                    "התחלה": worst5["start"].dt.strftime("%m/%Y"),
+                    "שווי סופי": (worst5["end_val"] * ex).map(lambda v: format_currency(v, cur)),
+                    "שווי מינימלי": (worst5["min_val"] * ex).map(lambda v: format_currency(v, cur)),
+                    "ירידה מקסימלית": worst5["max_dd"].map(lambda v: f"{v:.1f}%"),
+                    "CAGR": worst5["cagr"].map(lambda v: f"{v:.2f}%"),
+                }), use_container_width=True, hide_index=True)
+                st.caption(
+                    f"פורטפוליו {rc['slot'] + 1} • {res['n_cohorts']:,} חלונות של {rc['horizon']} שנים, ערכי סוף חודש • "
+                    f"שחיקת הקרן = ירידה מתחת ל-{DEPLETION_FRACTION * 100:.0f}% מהסכום ההתחלתי • ⏱️ {rc['elapsed']:.2f} שניות"
+                )
+                if res["dropped_assets"]:
+                    st.warning(f"לא נטענו נתונים עבור {', '.join(res['dropped_assets'])} — הנכסים הוצאו והמשקלות נורמלו מחדש.")
+
+    # ── SECTION: Goal Seek ──
+
+    GOAL_MODES = {"monthly": "הפקדה חודשית נדרשת ליעד", "withdrawal_rate": "שיעור משיכה מקסימלי בטוח"}
+
+    def apply_goal_result():
+        gr = st.session_state.goal_result
+        if gr["mode"] == "monthly":
+            st.session_state.global_monthly = int(np.ceil(gr["result"]["value"] * gr["rate"]))
+        else:
+            st.session_state[f"wd_{gr['slot']}"] = float(np.floor(gr["result"]["value"] * 100) / 100)
+
+    with st.expander("🎯 חיפוש יעד — הפקדה חודשית נדרשת / שיעור משיכה בטוח"):
+        gc1, gc2, gc3 = st.columns(3)
+        with gc1:
+            gs_slot = st.selectbox(
+                "פורטפוליו", options=[i for i in range(st.session_state.num_portfolios) if st.session_state.portfolios[i]["assets"]] or [0],
+                format_func=lambda i: f"פורטפוליו {i + 1}", key="gs_slot",
+            )
+            gs_mode = st.radio("מה לחשב", list(GOAL_MODES), format_func=GOAL_MODES.get, key="gs_mode")
+        with gc2:
+            if gs_mode == "monthly":
+                gs_target = st.number_input(f"שווי סופי יעד ({cur_symbol})", min_value=0, max_value=1_000_000_000, value=1_000_000, step=50_000, key="gs_target")
+                gs_level = st.slider("ודאות (% מהמסלולים שמגיעים ליעד)", min_value=50, max_value=99, value=90, step=1, key="gs_conf")
+            else:
+                gs_target = st.number_input(f"שווי סופי מינימלי ({cur_symbol}, 0 = ללא)", min_value=0, max_value=1_000_000_000, value=0, step=50_000, key="gs_min_end")
+                gs_level = st.slider("הסתברות שרידות (%)", min_value=50, max_value=100, value=90, step=1, key="gs_survival")
+        with gc3:
+            gs_paths = st.number_input(
+                "מסלולי מונטה קרלו", min_value=0, max_value=5_000, value=GOAL_PATHS, step=500, key="gs_paths",
+                help="עתיד אקראי לפי שיטת מונטה קרלו שנבחרה. 0 — התרחיש היחיד של הסימולציה.",
+            )
+            st.caption(f"טווח {start_year}–{end_year}, איזון {rebalance_freq}, הפקדה ומשיכה כפי שהוגדרו למעלה.")
+
+        if st.button("🎯 חשב", key="gs_run"):
+            gs_cfg = st.session_state.portfolios[gs_slot]
+            # Same money units as the main simulation: shekels with the FX
+            # history, otherwise dollars at the current rate.
+            gs_rate = 1.0 if fx is not None else exchange_rate
+            with st.spinner("מחפש..."):
+                t0 = time.perf_counter()
+                _, _, dl_start, hist_end = simulation_window(start_year, end_year)
+                gs_market = load_market_data(tuple(gs_cfg["assets"]), dl_start.strftime("%Y-%m-%d"), hist_end.strftime("%Y-%m-%d"))
+                gs_paths_obj = goal_paths(gs_cfg, gs_market, start_year, end_year, freq_map[rebalance_freq], int(gs_paths), mc_method, int(mc_seed), fx)
+                if gs_paths_obj is None:
+                    gs_result = None
+                elif gs_mode == "monthly":
+                    gs_result = solve_deposit(gs_paths_obj, initial_capital_input / gs_rate, gs_target / gs_rate, gs_cfg.get("withdrawal_rate", 0.0), gs_level / 100.0)
+                else:
+                    gs_result = solve_withdrawal_rate(
+                        gs_paths_obj, initial_capital_input / gs_rate, global_monthly_input / gs_rate, gs_level / 100.0,
+                        gs_target / gs_rate if gs_target > 0 else None,
+                    )
+                st.session_state.goal_result = {
+                    "result": gs_result, "mode": gs_mode, "slot": gs_slot, "level": gs_level, "target": gs_target,
+                    "rate": gs_rate, "cur": active_currency, "elapsed": time.perf_counter() - t0,
+                }
+
+        gr = st.session_state.get("goal_result")
+        if gr is not None:
+            res = gr["result"]
+            if res is None:
+                st.warning(f"אין נתונים לפורטפוליו {gr['slot'] + 1}.")
+            elif res["value"] is None:
+                if gr["mode"] == "monthly":
+                    st.warning(f"אף הפקדה חודשית לא מביאה ל-{format_currency(gr['target'], gr['cur'])} ב-{gr['level']}% מהמסלולים.")
+                else:
+                    st.warning(f"גם ללא משיכות רק {res['success'] * 100:.1f}% מהמסלולים עומדים ביעד — פחות מ-{gr['level']}%.")
+            else:
+                g1, g2 = st.columns(2)
+                with g1:
+                    if gr["mode"] == "monthly":
+                        st.metric("הפקדה חודשית נדרשת", format_currency(res["value"] * gr["rate"], gr["cur"]))
                     else:
-                        cost_basis = 0
-
-            values.append(capital)
-
-        if not values:
-            return pd.Series(dtype=float), {}
-
-        series = pd.Series(values, index=combined_returns.index)
-        start_val = float(initial)
-        end_val = series.iloc[-1]
-        n_years = max((series.index[-1] - series.index[0]).days / 365.25, 0.01)
-        total_return_pct = ((end_val / start_val) - 1) * 100 if start_val > 0 else 0
-        cagr = ((end_val / start_val) ** (1 / n_years) - 1) * 100 if start_val > 0 else 0
-        daily_ret = series.pct_change().dropna()
-        ann_vol = daily_ret.std() * np.sqrt(252) * 100
-        sharpe = (daily_ret.mean() / daily_ret.std() * np.sqrt(252)) if daily_ret.std() > 0 else 0
-        cumulative = (1 + daily_ret).cumprod()
-        peak = cumulative.cummax()
-        max_dd = ((cumulative - peak) / peak).min() * 100 if len(cumulative) > 0 else 0
-
-        return series, {
-            "start_val": start_val, "end_val": end_val,
-            "total_invested": total_invested, "cost_basis": cost_basis,
-            "total_return_pct": total_return_pct, "cagr": cagr,
-            "ann_vol": ann_vol, "sharpe": sharpe, "max_dd": max_dd,
-            "n_years": n_years,
-            "total_withdrawn_gross": total_withdrawn_gross,
-            "total_tax_paid": total_tax_paid,
-            "total_withdrawn_net": total_withdrawn_net,
-        }
+                        st.metric("שיעור משיכה שנתי מקסימלי", f"{res['value']:.2f}%")
+                with g2:
+                    st.metric("מסלולים שעומדים ביעד", f"{res['success'] * 100:.1f}%")
+                if gr["mode"] == "monthly" and res["value"] * gr["rate"] <= 1_000_000:
+                    st.button("⬅️ קבע כהפקדה החודשית", key="gs_apply", on_click=apply_goal_result)
+                elif gr["mode"] == "withdrawal_rate" and f"wd_{gr['slot']}" in st.session_state and res["value"] <= 20.0:
+                    st.button(f"⬅️ קבע כשיעור המשיכה של פורטפוליו {gr['slot'] + 1}", key="gs_apply", on_click=apply_goal_result)
+            if res is not None:
+                paths_note = f"{res['n_paths']:,} מסלולים" if res["n_paths"] > 1 else "התרחיש היחיד של הסימולציה"
+                st.caption(
+                    f"פורטפוליו {gr['slot'] + 1} • {paths_note} • {res['evaluations']} הרצות • ⏱️ {gr['elapsed']:.2f} שניות"
+                    + (f" • שחיקת הקרן = ירידה מתחת ל-{DEPLETION_FRACTION * 100:.0f}% מהסכום ההתחלתי, בערכי סוף חודש" if gr["mode"] == "withdrawal_rate" else "")
+                )
 
     # ================================================================
     #   Recommendation Engine
     # ================================================================
 
+    @profiled()
     def render_recommendations(all_stats, portfolios_cfg, initial, monthly):
         if not all_stats:
             return
@@ -790,6 +1254,7 @@ with tab_simulation:
     #   Bottom-line Comparison
     # ================================================================
 
+    @profiled()
     def render_bottom_line_comparison(all_stats_raw, portfolios_cfg, num_p_loc, ex_rate, cur, tax_rate):
         if len(all_stats_raw) < 2:
             return
@@ -813,14 +1278,14 @@ with tab_simulation:
                 ongoing_tax = s.get("total_tax_paid", 0)
                 sim_cost_basis = s.get("cost_basis", 0)
                 remaining_gain = max(end_val - sim_cost_basis, 0)
-                final_sale_tax = remaining_gain * tax_rate
+                final_sale_tax = s["liquidation_tax"]
                 net_remaining_profit = remaining_gain - final_sale_tax
                 net_profit = cash_net + net_remaining_profit
                 total_tax = ongoing_tax + final_sale_tax
                 detail_rows.append({"phase_label": "משיכה", "total_invested": total_invested, "end_val": end_val, "cash_withdrawn_net": cash_net, "remaining_gain_net": net_remaining_profit, "ongoing_tax": ongoing_tax, "final_sale_tax": final_sale_tax, "total_tax": total_tax, "net_profit": net_profit})
             else:
                 gain = max(end_val - total_invested, 0)
-                final_sale_tax = gain * tax_rate
+                final_sale_tax = s["liquidation_tax"]
                 net_profit = gain - final_sale_tax
                 total_tax = final_sale_tax
                 detail_rows.append({"phase_label": "צבירה", "total_invested": total_invested, "end_val": end_val, "cash_withdrawn_net": 0, "remaining_gain_net": net_profit, "ongoing_tax": 0, "final_sale_tax": final_sale_tax, "total_tax": total_tax, "net_profit": net_profit})
@@ -890,43 +1355,230 @@ with tab_simulation:
         st.dataframe(pd.DataFrame(table_data).set_index("מדד"), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
+    def simulate_cached(port_cfg, market, initial, monthly_contribution, start_y, end_y, rebalance, mc_paths=0, mc_method="bootstrap", mc_seed=42, fx=None):
+        cache = get_simulation_cache()
+        key, scale = simulation_key(port_cfg, initial, monthly_contribution, start_y, end_y, rebalance, CAPITAL_GAINS_TAX, mc_paths, mc_method, mc_seed, fx.key if fx is not None else None, cost_method, COST_INFLATION, market.currencies)
+        result = cache.get(key)
+        count("sim_cache_hit" if result is not None else "sim_cache_miss")
+        if result is None:
+            with stage("simulate_portfolio", profile=True):
+                result = simulate_portfolio(port_cfg, market, initial / scale, monthly_contribution / scale, start_y, end_y, rebalance, CAPITAL_GAINS_TAX, mc_paths, mc_method, mc_seed, fx, cost_method, COST_INFLATION)
+            if not result[0].empty and not result[1]["dropped_assets"]:
+                cache.put(key, result)
+        return scale_result(*result, scale)
+
     # ──────────────────────────────────
     #  Run Simulation
     # ──────────────────────────────────
 
-    st.markdown("")
-    if st.button("🚀 הפעל סימולציה", use_container_width=True, type="primary"):
+    # ──────────────────────────────────
+    #  Ranked comparison (more than DETAIL_MAX_PORTFOLIOS portfolios)
+    # ──────────────────────────────────
+
+    RANK_LABELS = {
+        "end_val": "שווי סופי",
+        "net_profit": "רווח נטו אחרי מס",
+        "cagr": "CAGR (%)",
+        "sharpe": "שארפ",
+        "sortino": "סורטינו",
+        "calmar": "קלמר",
+        "max_dd": "ירידה מקסימלית (%)",
+        "ann_vol": "תנודתיות (%)",
+        "ulcer_index": "מדד אולסר",
+    }
+    RANK_COLORS = ["#00d4aa", "#ff6b6b", "#4dabf7", "#ffcc00", "#b197fc", "#ff922b", "#63e6be", "#f783ac", "#a9e34b", "#868e96"]
+
+    def run_ranked_comparison(sim_initial, sim_monthly, result_rate):
+        # All portfolios in one batched pass over a shared return matrix;
+        # the result is kept in session state so re-ranking and changing
+        # the number of plotted portfolios don't rerun the simulation.
+        cfgs = [st.session_state.portfolios[i] for i in range(num_p)]
+        universe = tuple(sorted({a for cfg in cfgs for a in cfg["assets"]}))
+        _, _, dl_start, hist_end = simulation_window(start_year, end_year)
+        with stage("load_market_data"):
+            market = load_market_data(universe, dl_start.strftime("%Y-%m-%d"), hist_end.strftime("%Y-%m-%d"))
+        t0 = time.perf_counter()
+        with stage("compare_portfolios"):
+            series, stats = compare_portfolios(
+                cfgs, market, sim_initial, sim_monthly, start_year, end_year, freq_map[rebalance_freq],
+                CAPITAL_GAINS_TAX, fx, cost_method, COST_INFLATION,
+            )
+        stats["name"] = [f"פורטפוליו {i + 1}" for i in range(num_p)]
+        stats["mix"] = [", ".join(f"{a} {cfg['weights'].get(a, 0):g}%" for a in cfg["assets"]) for cfg in cfgs]
+        st.session_state.rank_result = {
+            "series": series * result_rate, "stats": stats, "failed": market.failed,
+            "currency": active_currency, "symbol": cur_symbol, "rate": result_rate, "initial": sim_initial * result_rate,
+            "elapsed": time.perf_counter() - t0,
+        }
+
+    def render_ranked_comparison(res):
+        stats = res["stats"]
+        ok = stats[stats["ok"]]
+        st.markdown('<div class="section-card">', unsafe_allow_html=True)
+        st.markdown(f"### 🏆 דירוג {len(stats)} פורטפוליו")
+        if ok.empty:
+            st.error("לא נמצאו נתונים. ודא שבכל פורטפוליו יש נכסים תקינים.")
+            st.markdown('</div>', unsafe_allow_html=True)
+            return
+        rc1, rc2 = st.columns([2, 1])
+        with rc1:
+            metric = st.selectbox("דרג לפי", options=list(RANK_METRICS), format_func=RANK_LABELS.get, index=RANK_METRICS.index("net_profit"), key="rank_metric")
+        with rc2:
+            top_k = int(st.number_input("פורטפוליו בגרף", min_value=1, max_value=len(RANK_COLORS), value=5, step=1, key="rank_top_k"))
+        ranked = ok.sort_values(f"rank_{metric}")
 
         fig = go.Figure()
+        for color, (i, row) in zip(RANK_COLORS, ranked.head(top_k).iterrows()):
+            disp = res["series"].iloc[:, i].dropna()
+            if not chart_full_res:
+                disp = downsample_series(disp)
+            fig.add_trace(line_trace(disp.index, disp.values, mode="lines", name=row["name"], line=dict(color=color, width=2.2)))
+        fig.add_hline(y=res["initial"], line_dash="dash", line_color="gray", annotation_text="סכום התחלתי", annotation_position="top left")
+        fig.update_layout(template="plotly_dark", height=480, margin=dict(l=20, r=20, t=40, b=20), xaxis_title="תאריך", yaxis_title=f"שווי ({res['symbol']})", hovermode="x unified", legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+        with stage("plotly_chart"):
+            st.plotly_chart(fig, use_container_width=True)
+
+        scale = res["rate"]
+        table = pd.DataFrame({
+            "פורטפוליו": ranked["name"],
+            "הרכב": ranked["mix"],
+            "דירוג": ranked[f"rank_{metric}"].astype(int),
+            "נתונים מ-": ranked["first_date"].dt.date,
+            "שווי סופי": ranked["end_val"] * scale,
+            "רווח נטו אחרי מס": ranked["net_profit"] * scale,
+            "CAGR (%)": ranked["cagr"],
+            "תנודתיות (%)": ranked["ann_vol"],
+            "שארפ": ranked["sharpe"],
+            "סורטינו": ranked["sortino"],
+            "ירידה מקסימלית (%)": ranked["max_dd"],
+            "קלמר": ranked["calmar"],
+            "מדד אולסר": ranked["ulcer_index"],
+        }).set_index("פורטפוליו")
+        money = "₪%,.0f" if res["currency"] == "ILS" else "$%,.0f"
+        with stage("metrics_table"):
+            st.dataframe(
+                table, use_container_width=True,
+                column_config={
+                    "שווי סופי": st.column_config.NumberColumn(format=money),
+                    "רווח נטו אחרי מס": st.column_config.NumberColumn(format=money),
+                    **{c: st.column_config.NumberColumn(format="%.2f") for c in ("CAGR (%)", "תנודתיות (%)", "שארפ", "סורטינו", "ירידה מקסימלית (%)", "קלמר", "מדד אולסר")},
+                },
+            )
+        st.caption(
+            f"⏱️ {res['elapsed']:.2f} שניות ל-{len(stats)} פורטפוליו • כל תיק על ימי המסחר של נכסיו ועם תחזית עתידית משלו, כמו בסימולציה המפורטת • "
+            f"לחיצה על כותרת עמודה ממיינת את הטבלה"
+        )
+        for _, row in stats[stats["ok"]].iterrows():
+            if row["dropped_assets"]:
+                dropped_txt = ", ".join(f"{a} ({res['failed'].get(a, 'no data')})" for a in row["dropped_assets"])
+                st.warning(f"⚠️ {row['name']}: לא נטענו נתונים עבור {dropped_txt} — הנכסים הוצאו והמשקלות נורמלו מחדש.")
+        skipped = stats.loc[~stats["ok"], "name"].tolist()
+        if skipped:
+            st.warning(f"⚠️ ללא נכסים תקינים, לא נכללו בדירוג: {', '.join(skipped)}")
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    st.markdown("")
+    run_clicked = st.button("🚀 הפעל סימולציה", use_container_width=True, type="primary")
+
+    if num_p > DETAIL_MAX_PORTFOLIOS:
+        if run_clicked:
+            if fx is not None:
+                run_ranked_comparison(float(initial_capital_input), float(global_monthly_input), 1.0)
+            else:
+                run_ranked_comparison(initial_capital, global_monthly, exchange_rate)
+        if st.session_state.get("rank_result") is not None:
+            render_ranked_comparison(st.session_state.rank_result)
+
+    elif run_clicked:
+
         all_display_metrics = []
         all_stats_raw = []
         colors = ["#00d4aa", "#ff6b6b", "#4dabf7"]
         any_data = False
+        mc_summaries = []
+
+        # With the FX history the engine works in shekels throughout (each
+        # flow at its date's rate), so results need no further conversion.
+        if fx is not None:
+            sim_initial, sim_monthly, result_rate = float(initial_capital_input), float(global_monthly_input), 1.0
+        else:
+            sim_initial, sim_monthly, result_rate = initial_capital, global_monthly, exchange_rate
+
+        universe = tuple(sorted({a for i in range(num_p) for a in st.session_state.portfolios[i]["assets"]}))
+        _, _, dl_start, hist_end = simulation_window(start_year, end_year)
+        with stage("load_market_data"):
+            market = load_market_data(universe, dl_start.strftime("%Y-%m-%d"), hist_end.strftime("%Y-%m-%d"))
+
+        # The finished figure is cached by a hash of everything drawn on it,
+        # so reruns with unchanged inputs skip downsampling and trace building.
+        fig_key = figure_key(
+            [simulation_key(st.session_state.portfolios[i], sim_initial, sim_monthly, start_year, end_year, freq_map[rebalance_freq], CAPITAL_GAINS_TAX, mc_paths, mc_method, int(mc_seed), fx.key if fx is not None else None, cost_method, COST_INFLATION, market.currencies)[0] for i in range(num_p)],
+            sim_initial, sim_monthly, result_rate, cur_symbol, chart_full_res, datetime.today().date(),
+        )
+        fig = get_figure_cache().get(fig_key)
+        build_fig = fig is None
+        count("figure_cache_miss" if build_fig else "figure_cache_hit")
+        if build_fig:
+            fig = go.Figure()
 
         for idx in range(num_p):
             pcfg = st.session_state.portfolios[idx]
-            series, stats = simulate_portfolio(pcfg, initial_capital, global_monthly, start_year, end_year, freq_map[rebalance_freq])
+            series, stats = simulate_cached(pcfg, market, sim_initial, sim_monthly, start_year, end_year, freq_map[rebalance_freq], mc_paths, mc_method, int(mc_seed), fx)
             if series.empty:
                 continue
 
             any_data = True
-            disp = series * exchange_rate
-            fig.add_trace(go.Scatter(x=disp.index, y=disp.values, mode="lines", name=f"פורטפוליו {idx + 1}", line=dict(color=colors[idx % 3], width=2.5)))
+            if stats["dropped_assets"]:
+                dropped_txt = ", ".join(f"{a} ({market.failed.get(a, 'no data')})" for a in stats["dropped_assets"])
+                st.warning(f"⚠️ פורטפוליו {idx + 1}: לא נטענו נתונים עבור {dropped_txt} — הנכסים הוצאו מהסימולציה והמשקלות נורמלו מחדש.")
+            disp = series * result_rate
+            if not chart_full_res:
+                disp = downsample_series(disp)
+            if build_fig:
+                fig.add_trace(line_trace(disp.index, disp.values, mode="lines", name=f"פורטפוליו {idx + 1}", line=dict(color=colors[idx % 3], width=2.5)))
+
+            mc = stats.get("monte_carlo")
+            if mc:
+                mc_summaries.append((idx, mc))
+            if mc and build_fig:
+                color = colors[idx % 3]
+                keep = slice(None) if chart_full_res else band_indices(mc["bands"][5], mc["bands"][95])
+                mc_dates = mc["dates"][keep]
+                bands = {p: band[keep] * result_rate for p, band in mc["bands"].items()}
+                for lo, hi, alpha in ((5, 95, 0.10), (25, 75, 0.22)):
+                    fig.add_trace(line_trace(
+                        mc_dates.append(mc_dates[::-1]),
+                        np.concatenate([bands[hi], bands[lo][::-1]]),
+                        fill="toself", fillcolor=hex_to_rgba(color, alpha), line=dict(width=0),
+                        hoverinfo="skip", showlegend=False, legendgroup=f"mc_{idx}",
+                    ))
+                fig.add_trace(line_trace(
+                    mc_dates, bands[50], mode="lines", name=f"פורטפוליו {idx + 1} — חציון MC",
+                    line=dict(color=color, width=1.5, dash="dash"), legendgroup=f"mc_{idx}",
+                ))
 
             cur = active_currency
             all_display_metrics.append({
                 "פורטפוליו": f"פורטפוליו {idx + 1}",
-                "💰 סכום התחלתי": format_currency(stats["start_val"] * exchange_rate, cur),
-                "💰 סכום סופי": format_currency(stats["end_val"] * exchange_rate, cur),
-                "💰 סה״כ הושקע": format_currency(stats["total_invested"] * exchange_rate, cur),
-                "📤 סה״כ נמשך (ברוטו)": format_currency(stats["total_withdrawn_gross"] * exchange_rate, cur),
-                "🏛️ סה״כ מס ששולם": format_currency(stats["total_tax_paid"] * exchange_rate, cur),
-                "💸 סה״כ נמשך (נטו)": format_currency(stats["total_withdrawn_net"] * exchange_rate, cur),
+                "💰 סכום התחלתי": format_currency(stats["start_val"] * result_rate, cur),
+                "💰 סכום סופי": format_currency(stats["end_val"] * result_rate, cur),
+                "💰 סה״כ הושקע": format_currency(stats["total_invested"] * result_rate, cur),
+                "📤 סה״כ נמשך (ברוטו)": format_currency(stats["total_withdrawn_gross"] * result_rate, cur),
+                "🏛️ סה״כ מס ששולם": format_currency(stats["total_tax_paid"] * result_rate, cur),
+                "💸 סה״כ נמשך (נטו)": format_currency(stats["total_withdrawn_net"] * result_rate, cur),
                 "📈 תשואה כוללת": f"{stats['total_return_pct']:.2f}%",
                 "📈 תשואה שנתית (CAGR)": f"{stats['cagr']:.2f}%",
                 "📉 תנודתיות שנתית": f"{stats['ann_vol']:.2f}%",
                 "⚖️ שארפ": f"{stats['sharpe']:.2f}",
+                "⚖️ סורטינו": f"{stats['sortino']:.2f}",
                 "📉 ירידה מקסימלית": f"{stats['max_dd']:.2f}%",
+                "⏳ משך הירידה (ימים)": (
+                    f"{stats['max_dd_days']:,} (התאושש {stats['max_dd_recovery']:%m/%Y})" if stats["max_dd_recovery"] is not None
+                    else f"{stats['max_dd_days']:,} (טרם התאושש)"
+                ) if stats["max_dd_peak"] is not None else "—",
+                "⚖️ קלמר": f"{stats['calmar']:.2f}",
+                "😰 מדד אולסר": f"{stats['ulcer_index']:.2f}",
+                "🔁 איזונים (מחזור ממוצע)": f"{stats['rebalance_count']} ({stats['avg_turnover']:.2f}%)" if stats["rebalance_count"] else "—",
                 "🔄 שלב": pcfg["phase"],
             })
             all_stats_raw.append(stats)
@@ -935,11 +1587,26 @@ with tab_simulation:
             # ── Chart ──
             st.markdown('<div class="section-card">', unsafe_allow_html=True)
             st.markdown("### 📈 גרף השוואת פורטפוליו")
-            fig.add_hline(y=initial_capital * exchange_rate, line_dash="dash", line_color="gray", annotation_text="סכום התחלתי", annotation_position="top left")
-            if is_future:
-                fig.add_vline(x=datetime.today().timestamp() * 1000, line_dash="dot", line_color="#ffcc00", annotation_text="היום", annotation_position="top right")
-            fig.update_layout(template="plotly_dark", height=520, margin=dict(l=20, r=20, t=40, b=20), xaxis_title="תאריך", yaxis_title=f"שווי ({cur_symbol})", hovermode="x unified", legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-            st.plotly_chart(fig, use_container_width=True)
+            if build_fig:
+                fig.add_hline(y=sim_initial * result_rate, line_dash="dash", line_color="gray", annotation_text="סכום התחלתי", annotation_position="top left")
+                if is_future:
+                    fig.add_vline(x=datetime.today().timestamp() * 1000, line_dash="dot", line_color="#ffcc00", annotation_text="היום", annotation_position="top right")
+                fig.update_layout(template="plotly_dark", height=520, margin=dict(l=20, r=20, t=40, b=20), xaxis_title="תאריך", yaxis_title=f"שווי ({cur_symbol})", hovermode="x unified", legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+                if not any(s["dropped_assets"] for s in all_stats_raw):
+                    get_figure_cache().put(fig_key, fig)
+            with stage("plotly_chart"):
+                st.plotly_chart(fig, use_container_width=True)
+            for idx, mc in mc_summaries:
+                ruin_txt = f" | הסתברות לשחיקת הקרן: {mc['ruin_prob'] * 100:.1f}%" if mc["ruin_prob"] is not None else ""
+                st.caption(
+                    f"🎲 פורטפוליו {idx + 1}: {mc['n_paths']:,} מסלולים ({MC_METHOD_LABELS[mc.get('method', 'single')]}) | "
+                    f"P5 {format_currency(mc['bands'][5][-1] * result_rate, active_currency)} • "
+                    f"P50 {format_currency(mc['bands'][50][-1] * result_rate, active_currency)} • "
+                    f"P95 {format_currency(mc['bands'][95][-1] * result_rate, active_currency)}"
+                    f"{ruin_txt} | ⏱️ {mc['elapsed']:.2f} שניות ({mc['paths_per_sec']:,.0f} מסלולים/שנייה)"
+                )
+            if any(mc["ruin_prob"] is not None for _, mc in mc_summaries):
+                st.caption(f"שחיקת הקרן = ירידת שווי התיק מתחת ל-{DEPLETION_FRACTION * 100:.0f}% מהשווי בתחילת התחזית.")
             st.markdown('</div>', unsafe_allow_html=True)
 
             # ── Summary cards ──
@@ -962,11 +1629,12 @@ with tab_simulation:
                         st.metric("סה״כ נמשך (נטו ליד)", metrics["💸 סה״כ נמשך (נטו)"])
 
             with st.expander("📋 טבלת מדדים מלאה"):
-                st.dataframe(pd.DataFrame(all_display_metrics).set_index("פורטפוליו"), use_container_width=True)
+                with stage("metrics_table"):
+                    st.dataframe(pd.DataFrame(all_display_metrics).set_index("פורטפוליו"), use_container_width=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
             # ── Bottom-line comparison ──
-            render_bottom_line_comparison(all_stats_raw, st.session_state.portfolios, num_p, exchange_rate, active_currency, CAPITAL_GAINS_TAX)
+            render_bottom_line_comparison(all_stats_raw, st.session_state.portfolios, num_p, result_rate, active_currency, CAPITAL_GAINS_TAX)
 
             # ── Recommendations ──
             render_recommendations(all_stats_raw, st.session_state.portfolios, initial_capital, global_monthly)
@@ -984,3 +1652,55 @@ st.markdown(
     "</div>",
     unsafe_allow_html=True,
 )
+
+# ========================
+# Debug Panel
+# ========================
+
+if debug_mode:
+    with st.expander("🛠️ דיבאג — זמני שלבים בריצה הנוכחית"):
+        st.checkbox(
+            "cProfile לפונקציות המרכזיות (מהריצה הבאה)", key="debug_cprofile",
+            help="מריץ את simulate_portfolio, load_market_data, fetch_price_history ופונקציות התצוגה תחת cProfile.",
+        )
+        breakdown = run_profile.breakdown()
+        breakdown["stage"] = [(" " * d) + path.rsplit("/", 1)[-1] for path, d in zip(breakdown["stage"], breakdown["depth"])]
+        st.dataframe(
+            breakdown.drop(columns="depth").set_index("stage"),
+            use_container_width=True,
+            column_config={
+                "total_ms": st.column_config.NumberColumn("סה״כ (ms)", format="%.1f"),
+                "self_ms": st.column_config.NumberColumn("עצמי (ms)", format="%.1f"),
+                "share": st.column_config.ProgressColumn("חלק מהריצה", min_value=0.0, max_value=1.0, format="%.2f"),
+            },
+        )
+        sim_cache, fig_cache, market_cache = get_simulation_cache(), get_figure_cache(), get_market_cache()
+        bar_stats = get_bar_cache().stats()
+        counters = {
+            **run_profile.counters,
+            "sim_cache_size": len(sim_cache), "sim_cache_hits_total": sim_cache.hits, "sim_cache_misses_total": sim_cache.misses,
+            "figure_cache_size": len(fig_cache), "figure_cache_hits_total": fig_cache.hits, "figure_cache_misses_total": fig_cache.misses,
+            "market_cache_size": len(market_cache), "market_cache_hits_total": market_cache.hits, "market_cache_misses_total": market_cache.misses,
+            "market_cache_builds_total": market_cache.builds, "market_cache_mapped_bytes": market_cache.mapped_bytes(),
+            "bar_cache_size": bar_stats.pop("entries"), "bar_cache_inflight": bar_stats.pop("inflight"),
+            **{f"bar_cache_{k}_total": v for k, v in bar_stats.items()},
+        }
+        st.dataframe(pd.Series(counters, name="value").to_frame(), use_container_width=True)
+        for path, funcs in run_profile.call_stats.items():
+            st.markdown(f"**cProfile — {path}**")
+            st.dataframe(pd.DataFrame(funcs).set_index("function"), use_container_width=True)
+        st.download_button(
+            "⬇️ ייצוא JSONL", run_profile.to_jsonl(), file_name=f"profile_{run_profile.run_id}.jsonl",
+            mime="application/jsonl", key="debug_export",
+        )
+
+if PREWARM and not st.session_state.get("prewarm_started"):
+    st.session_state.prewarm_started = True
+    prewarm_tickers = tuple(sorted({a for p in st.session_state.portfolios.values() for a in p["assets"]} | {USDILS_TICKER}))
+    threading.Thread(target=prewarm, args=(get_price_store(), prewarm_tickers, get_metadata_store()), name="prewarm", daemon=True).start()
+
+if PROFILE_LOG:
+    try:
+        run_profile.append_jsonl(PROFILE_LOG)
+    except OSError:
+        pass
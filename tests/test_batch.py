@@ -0,0 +1,66 @@
+"""Ranked comparisons against one simulate_portfolio call per portfolio."""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine.batch import compare_portfolios  # noqa: E402
+from invest_engine.engine import simulate_portfolio  # noqa: E402
+from invest_engine.market import market_from_closes  # noqa: E402
+from invest_engine.store import SyntheticPriceProvider  # noqa: E402
+
+STATS = ("end_val", "total_invested", "total_withdrawn_net", "total_tax_paid", "liquidation_tax", "cagr", "max_dd", "sharpe")
+CONFIGS = [
+    {"assets": ["SPY", "TLT"], "weights": {"SPY": 60, "TLT": 40}},
+    {"assets": ["QQQ"], "weights": {"QQQ": 100}, "withdrawal_rate": 4.0, "withdrawal_month": 3},
+    {"assets": ["TLT", "SPY"], "weights": {"SPY": 20, "TLT": 80}},
+    {"assets": ["SPY", "TLT"], "weights": {"SPY": 30, "TLT": 70}, "withdrawal_rate": 3.0},
+    {"assets": ["SPY", "YOUNG", "NOPE"], "weights": {"SPY": 50, "YOUNG": 50, "NOPE": 10}},
+]
+
+
+@pytest.fixture(scope="module")
+def market():
+    # History up to today, so the horizon below runs into a drawn future;
+    # YOUNG only trades from 2018.
+    provider = SyntheticPriceProvider("2005-01-03")
+    closes = pd.DataFrame({t: provider.series(t) for t in ("SPY", "TLT", "QQQ")})
+    closes["YOUNG"] = SyntheticPriceProvider("2018-01-02").series("YOUNG")
+    return market_from_closes(closes)
+
+
+@pytest.mark.parametrize("rebalance", [None, "QE"])
+def test_ranked_matches_detail_per_portfolio(market, rebalance):
+    start_y, end_y = 2010, datetime.today().year + 10
+    series, stats = compare_portfolios(CONFIGS, market, 100_000.0, 500.0, start_y, end_y, rebalance)
+    assert stats["ok"].all()
+    for i, cfg in enumerate(CONFIGS):
+        expected_series, expected = simulate_portfolio(cfg, market, 100_000.0, 500.0, start_y, end_y, rebalance)
+        got = series[i].dropna()
+        pd.testing.assert_index_equal(got.index, expected_series.index)
+        pd.testing.assert_series_equal(got, expected_series, check_names=False, check_freq=False, rtol=1e-9)
+        for key in STATS:
+            assert stats.loc[i, key] == pytest.approx(expected[key], rel=1e-9, abs=1e-6), (i, key)
+        assert stats.loc[i, "first_date"] == expected_series.index[0]
+        assert stats.loc[i, "dropped_assets"] == expected["dropped_assets"]
+    assert stats.loc[4, "first_date"].year == 2018 and stats.loc[0, "first_date"].year == 2010
+
+
+def test_adding_a_portfolio_leaves_the_others_alone(market):
+    args = (market, 100_000.0, 500.0, 2010, datetime.today().year + 5)
+    _, before = compare_portfolios(CONFIGS[:2], *args)
+    _, after = compare_portfolios(CONFIGS, *args)
+    # Equal up to the batch's summation order.
+    for key in STATS:
+        assert after[key].iloc[:2].tolist() == pytest.approx(before[key].tolist(), rel=1e-12), key
+
+
+def test_portfolios_without_assets_are_not_ranked(market):
+    series, stats = compare_portfolios([{"assets": ["NOPE"], "weights": {"NOPE": 100}}, CONFIGS[1]], market, 1000.0, 0.0, 2010, 2015)
+    assert stats["ok"].tolist() == [False, True]
+    assert series[0].isna().all() and stats.loc[1, "rank_end_val"] == 1
@@ -0,0 +1,240 @@
+"""LotBook cost bases and realized gains against hand-computed lots."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine.engine import run_holdings_engine  # noqa: E402
+from invest_engine.lots import LOT_BLOCK, LotBook, lot_time, taxable_gain  # noqa: E402
+
+INDEX = pd.bdate_range("2012-01-02", "2019-12-31")
+TAX_RATE = 0.25
+
+
+def two_lot_book(method: str, n_paths: int = 1, inflation: float = 0.0) -> LotBook:
+    # 100 units bought at 1, then 100 of new money at a price of 2 (50 units).
+    book = LotBook(n_paths, method=method, inflation=inflation)
+    book.add(100.0, 100.0, 0.0)
+    book.buy(100.0, 200.0, 1.0)
+    return book
+
+
+# ---------------------------------------------------------------------------
+# FIFO vs average cost
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("method, first, second", [
+    # A third of the 150 units (50) at 2, then the rest at 3.
+    # FIFO: 50 of the first lot (cost 50) → 100 - 50; then 50 of the first
+    # lot and all of the second (cost 50 + 100) → 300 - 150.
+    ("fifo", 50.0, 150.0),
+    # Average: a third of (300 - 200); then all of 300 - 200 × 2/3.
+    ("average", 100.0 / 3.0, 300.0 - 400.0 / 3.0),
+])
+def test_realized_gains_by_method(method, first, second):
+    book = two_lot_book(method)
+    assert book.total_units[0] == 150.0 and book.cost_basis[0] == 200.0
+    assert book.sell(1.0 / 3.0, 300.0, 1.0)[0] == pytest.approx(first, rel=1e-12)
+    assert book.cost_basis[0] == pytest.approx(200.0 - (100.0 - first), rel=1e-12)
+    assert book.unrealized(300.0, 2.0)[0] == pytest.approx(second, rel=1e-12)
+    assert book.sell(1.0, 300.0, 2.0)[0] == pytest.approx(second, rel=1e-12)
+    # Either way the whole position realizes the same total gain.
+    assert first + second == pytest.approx(200.0, rel=1e-12)
+    assert book.total_units[0] == pytest.approx(0.0, abs=1e-9)
+    assert book.cost_basis[0] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_fifo_sale_spans_lot_blocks():
+    # More lots than one block, sold in one go past the block edge.
+    book = LotBook(1, capacity=1, method="fifo")
+    n_lots = LOT_BLOCK + 8
+    for i in range(n_lots):
+        book.add(1.0, float(i + 1), float(i))
+    sold = LOT_BLOCK + 3
+    gain = book.sell(sold / n_lots, 2.0 * n_lots, float(n_lots))[0]
+    assert gain == pytest.approx(2.0 * sold - sold * (sold + 1) / 2.0, rel=1e-12)
+    assert book.head == sold
+    assert book.cost_basis[0] == pytest.approx(sum(range(sold + 1, n_lots + 1)), rel=1e-12)
+
+
+def test_unknown_method_and_deflation_are_rejected():
+    with pytest.raises(ValueError):
+        LotBook(1, method="lifo")
+    with pytest.raises(ValueError):
+        LotBook(1, inflation=-0.01)
+
+
+# ---------------------------------------------------------------------------
+# Inflation indexing
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("price, expected", [
+    (1.5, 150.0 - 121.0),  # real gain over the indexed cost
+    (1.1, 0.0),            # a nominal gain eaten by inflation is not a loss
+    (0.9, -10.0),          # a nominal loss stays the nominal loss
+])
+def test_indexed_single_lot(price, expected):
+    book = LotBook(1, method="fifo", inflation=0.10)
+    book.add(100.0, 100.0, 0.0)
+    assert book.sell(1.0, 100.0 * price, 2.0)[0] == pytest.approx(expected, rel=1e-12, abs=1e-12)
+
+
+@pytest.mark.parametrize("method", ["fifo", "average"])
+def test_indexation_only_shrinks_gains(method):
+    # Random purchases and partial sales on many paths: indexed gains never
+    # exceed the nominal ones, and indexing never turns a lot's gain into
+    # a loss, so a sale loses at most the nominal losses of its lots.
+    rng = np.random.default_rng(3)
+    n_paths = 64
+    nominal = LotBook(n_paths, method=method)
+    indexed = LotBook(n_paths, method=method, inflation=0.04)
+    value = np.full(n_paths, 100.0)
+    for book in (nominal, indexed):
+        book.add(100.0, 100.0, 0.0)
+    for step in range(1, 3 * LOT_BLOCK):
+        t = step / 4.0
+        value = value * rng.lognormal(0.01, 0.15, n_paths)
+        if step % 5 == 0:
+            frac = rng.uniform(0.0, 0.3, n_paths)
+            floor = -loss_bound(nominal, value)
+            real, nom = indexed.sell(frac, value, t), nominal.sell(frac, value, t)
+            assert (real <= nom + 1e-9).all()
+            assert (real >= floor - 1e-9).all()
+        else:
+            for book in (nominal, indexed):
+                book.buy(10.0, value, t)
+            value = value + 10.0
+        assert (indexed.unrealized(value, t) <= nominal.unrealized(value, t) + 1e-9).all()
+
+
+def loss_bound(book: LotBook, value: np.ndarray) -> np.ndarray:
+    # Largest loss any sale could realize: the nominal losses of every open
+    # lot, sold whole.
+    price = value / book.total_units
+    units = book.units[:, :book.n] * book.factor[:, None]
+    cost = book.cost[:, :book.n] * book.factor[:, None]
+    return -np.minimum(units * price[:, None] - cost, 0.0).sum(axis=1)
+
+
+def test_unrealized_matches_the_per_lot_rule():
+    # The block bound only skips work: the indexed unrealized gain equals
+    # taxable_gain over every lot.
+    rng = np.random.default_rng(11)
+    n_paths, level = 16, 1.03 ** 10.0
+    book = LotBook(n_paths, method="fifo", inflation=0.03)
+    value = np.full(n_paths, 100.0)
+    book.add(100.0, 100.0, 0.0)
+    for step in range(1, 2 * LOT_BLOCK + 5):
+        value = value * rng.lognormal(0.0, 0.1, n_paths)
+        book.buy(10.0, value, step / 10.0)
+        value = value + 10.0
+    price = value / book.total_units
+    units, cost = book.units[:, :book.n], book.cost[:, :book.n]
+    expected = taxable_gain(units * price[:, None], cost, cost * np.maximum(book.deflator[:book.n] * level, 1.0))
+    np.testing.assert_allclose(book.unrealized(value, 10.0), expected, rtol=1e-10, atol=1e-9)
+
+
+# ---------------------------------------------------------------------------
+# Tiling a history book onto paths
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("method, inflation", [("fifo", 0.0), ("average", 0.0), ("fifo", 0.03), ("average", 0.03)])
+def test_tile_copies_the_book_onto_every_path(method, inflation):
+    book = two_lot_book(method, inflation=inflation)
+    book.buy(50.0, 250.0, 1.5)
+    book.sell(0.4, 300.0, 2.0)  # fifo moves head, average scales factor
+    n_paths = 5
+    tiled = book.tile(n_paths, reserve=3)
+    assert tiled.n_paths == n_paths
+    assert tiled.units.shape[1] >= tiled.n + 3
+    np.testing.assert_allclose(tiled.total_units, book.total_units[0], rtol=1e-12)
+    np.testing.assert_allclose(tiled.cost_basis, book.cost_basis[0], rtol=1e-12)
+    values = np.linspace(150.0, 400.0, n_paths)
+    expected = [float(book.unrealized(v, 3.0)[0]) for v in values]
+    np.testing.assert_allclose(tiled.unrealized(values, 3.0), expected, rtol=1e-12)
+    # Sales on the tiled paths realize what the same sale on the single
+    # book would, path by path.
+    fracs = np.linspace(0.1, 0.9, n_paths)
+    gains = tiled.sell(fracs, values, 3.0)
+    for i in range(n_paths):
+        single = book.tile(1)
+        assert gains[i] == pytest.approx(single.sell(fracs[i], values[i], 3.0)[0], rel=1e-12, abs=1e-9)
+
+
+def test_tile_scales_costs_not_units():
+    # Rescaled into another money unit, every gain scales with it.
+    book = two_lot_book("fifo", inflation=0.02)
+    tiled = book.tile(3, scale=2.5)
+    np.testing.assert_allclose(tiled.total_units, book.total_units[0], rtol=1e-12)
+    np.testing.assert_allclose(tiled.cost_basis, 2.5 * book.cost_basis[0], rtol=1e-12)
+    np.testing.assert_allclose(tiled.unrealized(2.5 * 280.0, 4.0), 2.5 * book.unrealized(280.0, 4.0)[0], rtol=1e-12)
+
+
+# ---------------------------------------------------------------------------
+# Engine vs a plain per-lot loop
+# ---------------------------------------------------------------------------
+
+def per_lot_loop(returns: np.ndarray, index: pd.DatetimeIndex, initial: float, monthly: float,
+                 withdrawal_rate: float, withdrawal_month: int, inflation: float):
+    # One asset, one path, lots as plain [units, cost, time] lists sold
+    # oldest first, each lot's cost indexed by the inflation since purchase.
+    times = lot_time(index)
+    capital = float(initial)
+    lots = [[float(initial), float(initial), times[0]]]
+    tax_paid = 0.0
+    realized = []
+    withdrew = set()
+    for i, r in enumerate(returns):
+        capital *= 1.0 + r
+        if i == 0 or (index[i].year, index[i].month) == (index[i - 1].year, index[i - 1].month):
+            continue
+        if monthly > 0:
+            price = capital / sum(units for units, _, _ in lots)
+            lots.append([monthly / price, monthly, times[i]])
+            capital += monthly
+        if withdrawal_rate > 0 and index[i].month == withdrawal_month and index[i].year not in withdrew:
+            withdrew.add(index[i].year)
+            price = capital / sum(units for units, _, _ in lots)
+            left = sum(units for units, _, _ in lots) * withdrawal_rate / 100.0
+            gain = 0.0
+            for lot in lots:
+                units, cost, t = lot
+                if left <= 0 or units <= 0:
+                    continue
+                sold = min(left, units)
+                sold_cost = cost * sold / units
+                proceeds = sold * price
+                indexed = sold_cost * max((1.0 + inflation) ** (times[i] - t), 1.0)
+                gain += max(proceeds - indexed, 0.0) + min(proceeds - sold_cost, 0.0)
+                lot[0] -= sold
+                lot[1] -= sold_cost
+                left -= sold
+            realized.append(gain)
+            tax_paid += max(gain, 0.0) * TAX_RATE
+            capital -= capital * withdrawal_rate / 100.0
+    return capital, {
+        "cost_basis": sum(cost for _, cost, _ in lots),
+        "total_tax_paid": tax_paid,
+        "realized": realized,
+    }
+
+
+@pytest.mark.parametrize("inflation", [0.0, 0.03])
+@pytest.mark.parametrize("monthly, withdrawal_rate", [(0.0, 6.0), (800.0, 6.0), (800.0, 15.0)])
+def test_fifo_engine_matches_per_lot_loop(monthly, withdrawal_rate, inflation):
+    rng = np.random.default_rng(5)
+    returns = rng.normal(0.0004, 0.012, len(INDEX))
+    values, flows = run_holdings_engine(
+        returns[:, None], INDEX, np.array([1.0]), None, 100_000.0, monthly, withdrawal_rate, 3, TAX_RATE,
+        cost_method="fifo", inflation=inflation,
+    )
+    end_value, expected = per_lot_loop(returns, INDEX, 100_000.0, monthly, withdrawal_rate, 3, inflation)
+    assert values[-1] == pytest.approx(end_value, rel=1e-12)
+    np.testing.assert_allclose(flows["realized_gains"].to_numpy(), expected["realized"], rtol=1e-9, atol=1e-6)
+    assert flows["total_tax_paid"] == pytest.approx(expected["total_tax_paid"], rel=1e-9)
+    assert flows["cost_basis"] == pytest.approx(expected["cost_basis"], rel=1e-9)
@@ -0,0 +1,105 @@
+"""Currency resolution for the simulation path."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine.cache import simulation_key  # noqa: E402
+from invest_engine.engine import simulate_portfolio  # noqa: E402
+from invest_engine.fx import load_fx  # noqa: E402
+from invest_engine.market import load_market_data  # noqa: E402
+from invest_engine.metadata import MetadataStore, SyntheticInfoProvider  # noqa: E402
+from invest_engine.shared import SharedMarketCache  # noqa: E402
+from invest_engine.store import PriceStore, SyntheticPriceProvider  # noqa: E402
+
+START, END = "2015-01-01", "2020-01-01"
+
+
+@pytest.fixture
+def stores(tmp_path):
+    prices = PriceStore(str(tmp_path / "prices"), SyntheticPriceProvider(last_date=END))
+    info = SyntheticInfoProvider()
+    return prices, MetadataStore(str(tmp_path / "metadata.json"), info), info
+
+
+def test_us_symbols_resolve_without_a_lookup(stores):
+    _, metadata, info = stores
+    assert metadata.currencies(["SPY", "BRK-B", "NOTINDB"]) == {"SPY": "USD", "BRK-B": "USD", "NOTINDB": "USD"}
+    assert info.calls == []
+
+
+def test_listings_resolve_with_a_short_lookup(stores):
+    _, metadata, info = stores
+    assert metadata.currencies(["SPY", "TEVA.TA"]) == {"SPY": "USD", "TEVA.TA": "ILA"}
+    assert metadata.currencies(["TEVA.TA", "^FTSE"], timeout=0.0) == {"TEVA.TA": "ILA", "^FTSE": None}
+    assert info.calls == ["TEVA.TA"]
+
+
+def test_slow_lookup_leaves_currency_unknown(tmp_path):
+    metadata = MetadataStore(str(tmp_path / "metadata.json"), SyntheticInfoProvider(latency=1.0))
+    assert metadata.currencies(["TEVA.TA"], timeout=0.05) == {"TEVA.TA": None}
+
+
+def test_currencies_read_other_processes_records(stores, tmp_path):
+    _, metadata, _ = stores
+    MetadataStore(str(tmp_path / "metadata.json"), SyntheticInfoProvider()).prefetch(["TEVA.TA"])
+    assert metadata.currencies(["TEVA.TA"]) == {"TEVA.TA": "ILA"}
+
+
+def test_unknown_currency_is_dropped_not_priced_as_usd(tmp_path):
+    prices = PriceStore(str(tmp_path / "prices"), SyntheticPriceProvider(last_date=END))
+    metadata = MetadataStore(str(tmp_path / "metadata.json"), SyntheticInfoProvider(missing=("TEVA.TA",)))
+    market = load_market_data(prices, ("SPY", "TEVA.TA"), START, END, metadata)
+    assert market.tickers == ["SPY"]
+    assert market.failed == {"TEVA.TA": "unknown currency"}
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_fresh_cache_keeps_us_symbols(stores, cached):
+    prices, metadata, _ = stores
+    if cached:
+        market = SharedMarketCache(prices).market(("SPY", "QQQ"), START, END, metadata)
+    else:
+        market = load_market_data(prices, ("SPY", "QQQ"), START, END, metadata)
+    assert market.tickers == ["SPY", "QQQ"] and market.failed == {}
+    port = {"assets": ["SPY", "QQQ"], "weights": {"SPY": 50, "QQQ": 50}}
+    series, stats = simulate_portfolio(port, market, 10_000.0, 100.0, 2016, 2019)
+    assert len(series) and stats["end_val"] > 0
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_agorot_listing_converted(stores, cached):
+    prices, metadata, _ = stores
+    if cached:
+        market = SharedMarketCache(prices).market(["SPY", "TEVA.TA"], START, END, metadata)
+    else:
+        market = load_market_data(prices, ("SPY", "TEVA.TA"), START, END, metadata)
+    raw = prices.closes(("TEVA.TA",), START, END)["TEVA.TA"]
+    usd = raw / 100.0 / load_fx(prices).asof(raw.index)
+    assert market.failed == {}
+    assert market.currencies == {"SPY": "USD", "TEVA.TA": "ILA"}
+    np.testing.assert_allclose(market.closes[:, market.columns["TEVA.TA"]], usd.reindex(market.dates), rtol=1e-6)
+
+
+def test_shared_cache_key_follows_currencies(tmp_path):
+    prices = PriceStore(str(tmp_path / "prices"), SyntheticPriceProvider(last_date=END))
+    metadata = MetadataStore(str(tmp_path / "metadata.json"), SyntheticInfoProvider(missing=("TEVA.TA",)), missing_ttl=0.0)
+    cache = SharedMarketCache(prices)
+    before = cache.market(["SPY", "TEVA.TA"], START, END, metadata)
+    metadata.provider = SyntheticInfoProvider()
+    after = cache.market(["SPY", "TEVA.TA"], START, END, metadata)
+    assert before is not after
+    assert before.tickers == ["SPY"] and after.tickers == ["SPY", "TEVA.TA"]
+
+
+def test_simulation_key_includes_currencies():
+    port = {"assets": ["SPY", "TEVA.TA"], "weights": {"SPY": 0.5, "TEVA.TA": 0.5}}
+    keys = {
+        simulation_key(port, 1000, 0, 2015, 2019, "YE", 0.25, currencies=currencies)[0]
+        for currencies in (None, {"SPY": "USD", "TEVA.TA": "ILA"}, {"SPY": "USD", "TEVA.TA": "ILS"})
+    }
+    assert len(keys) == 3
@@ -0,0 +1,105 @@
+"""Streaming metrics against the original pandas formulas, on random series."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine.metrics import TRADING_DAYS_PER_YEAR, RunningMetrics, series_metrics  # noqa: E402
+
+SEEDS = range(20)
+
+
+def random_series(seed: int) -> pd.Series:
+    # A random walk of random length and volatility, with the odd crash and
+    # flat stretch, so drawdowns both recover and stay open at the end.
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 3000))
+    returns = rng.normal(rng.uniform(-0.001, 0.001), rng.uniform(0.001, 0.03), n)
+    returns[rng.random(n) < 0.002] = -0.2
+    returns[rng.random(n) < 0.01] = 0.0
+    returns[0] = 0.0
+    values = rng.uniform(1e3, 1e6) * np.cumprod(1.0 + returns)
+    return pd.Series(values, index=pd.bdate_range("2000-01-03", periods=n))
+
+
+def pandas_metrics(series: pd.Series, start_val: float) -> dict:
+    # simulate_portfolio's summary, as it was written with pandas.
+    end_val = series.iloc[-1]
+    n_years = max((series.index[-1] - series.index[0]).days / 365.25, 0.01)
+    daily_ret = series.pct_change().dropna()
+    cumulative = (1 + daily_ret).cumprod()
+    peak = cumulative.cummax()
+    drawdown = (cumulative - peak) / peak
+    downside = np.sqrt((daily_ret.clip(upper=0) ** 2).mean())
+    return {
+        "total_return_pct": ((end_val / start_val) - 1) * 100,
+        "cagr": ((end_val / start_val) ** (1 / n_years) - 1) * 100,
+        "ann_vol": daily_ret.std() * np.sqrt(TRADING_DAYS_PER_YEAR) * 100,
+        "sharpe": daily_ret.mean() / daily_ret.std() * np.sqrt(TRADING_DAYS_PER_YEAR) if daily_ret.std() > 0 else 0,
+        "sortino": daily_ret.mean() / downside * np.sqrt(TRADING_DAYS_PER_YEAR) if downside > 0 else 0,
+        "max_dd": drawdown.min() * 100 if len(cumulative) > 0 else 0,
+        "max_dd_trough": drawdown.idxmin() if len(cumulative) > 0 else None,
+        "ulcer_index": np.sqrt(((drawdown * 100) ** 2).mean()) if len(cumulative) > 0 else 0,
+    }
+
+
+def assert_matches(result: dict, expected: dict):
+    for key, value in expected.items():
+        if key == "max_dd_trough":
+            if expected["max_dd"] < 0:
+                assert result[key] == value
+        elif np.isnan(value):
+            assert np.isnan(result[key]), key
+        else:
+            assert result[key] == pytest.approx(value, rel=1e-9, abs=1e-9), key
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_one_pass_matches_pandas(seed):
+    series = random_series(seed)
+    start_val = float(series.iloc[0]) * 0.9
+    result = series_metrics(series.to_numpy(), series.index, start_val)
+    assert_matches(result, pandas_metrics(series, start_val))
+    assert result["end_val"] == series.iloc[-1]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_incremental_updates_match_one_pass(seed):
+    series = random_series(seed)
+    rng = np.random.default_rng(seed + 1000)
+    cuts = np.sort(rng.choice(np.arange(1, len(series)), size=min(5, len(series) - 1), replace=False))
+    running = RunningMetrics()
+    for part in np.split(np.arange(len(series)), cuts):
+        running.update(series.to_numpy()[part], series.index[part])
+
+    once = series_metrics(series.to_numpy(), series.index)
+    chunked = running.result()
+    for key, value in once.items():
+        if isinstance(value, float) and not np.isnan(value):
+            assert chunked[key] == pytest.approx(value, rel=1e-9, abs=1e-12), key
+        elif isinstance(value, float):
+            assert np.isnan(chunked[key]), key
+        else:
+            assert chunked[key] == value, key
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_drawdown_dates(seed):
+    series = random_series(seed)
+    result = series_metrics(series.to_numpy(), series.index)
+    if result["max_dd"] == 0:
+        return
+    curve = series.iloc[1:]
+    peak = curve.cummax()
+    trough = result["max_dd_trough"]
+    # The peak is the last high before the trough; recovery is the first
+    # day after it back at that high, if any.
+    assert result["max_dd_peak"] == curve[:trough][curve[:trough] >= peak[trough]].index[-1]
+    after = curve[curve.index > trough]
+    recovered = after[after >= peak[trough]]
+    assert result["max_dd_recovery"] == (recovered.index[0] if len(recovered) else None)
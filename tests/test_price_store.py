@@ -0,0 +1,164 @@
+"""PriceStore refreshes against the offline synthetic provider."""
+
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine import store as store_module  # noqa: E402
+from invest_engine.store import PriceStore, SyntheticPriceProvider  # noqa: E402
+
+TICKER = "SPY"
+FIRST = "2020-01-01"
+
+
+def stored(store: PriceStore, ticker: str = TICKER) -> pd.Series:
+    dates, closes = store.window(ticker, "1900-01-01", "2100-01-01")
+    return pd.Series(np.asarray(closes), index=pd.DatetimeIndex(dates))
+
+
+def test_tail_merge_fetches_only_new_days(tmp_path):
+    first = SyntheticPriceProvider(FIRST, "2020-06-30")
+    PriceStore(str(tmp_path), first).refresh([TICKER], pd.Timestamp("2020-07-01"))
+
+    later = SyntheticPriceProvider(FIRST, "2020-12-31")
+    store = PriceStore(str(tmp_path), later)
+    assert store.refresh([TICKER], pd.Timestamp("2021-01-01")) == {}
+
+    assert later.calls == [(TICKER, pd.Timestamp("2020-06-30"))]
+    pd.testing.assert_series_equal(stored(store), later.series(TICKER), check_freq=False, check_index_type=False)
+
+
+def test_overlap_mismatch_refetches_full_history(tmp_path):
+    PriceStore(str(tmp_path), SyntheticPriceProvider(FIRST, "2020-06-30")).refresh([TICKER], pd.Timestamp("2020-07-01"))
+
+    # A different drift changes every close after the first day, as a
+    # re-adjusted history would.
+    adjusted = SyntheticPriceProvider(FIRST, "2020-12-31", drift=0.001)
+    store = PriceStore(str(tmp_path), adjusted)
+    store.refresh([TICKER], pd.Timestamp("2021-01-01"))
+
+    assert adjusted.calls == [(TICKER, pd.Timestamp("2020-06-30")), (TICKER, None)]
+    pd.testing.assert_series_equal(stored(store), adjusted.series(TICKER), check_freq=False, check_index_type=False)
+
+
+class FormingBarProvider(SyntheticPriceProvider):
+    # The last bar is still trading: its close moves on every call.
+    def fetch(self, ticker, start=None):
+        close = super().fetch(ticker, start).copy()
+        close.iloc[-1] *= 1.0 + 0.01 * len(self.calls)
+        return close
+
+
+def test_forming_bar_is_not_stored(tmp_path):
+    store = PriceStore(str(tmp_path), FormingBarProvider(FIRST, "2020-06-30"))
+    store.refresh([TICKER], pd.Timestamp("2020-06-30"))
+    assert stored(store).index[-1] == pd.Timestamp("2020-06-29")
+
+    # The next day's overlap check compares a settled close, so only the
+    # tail is fetched instead of the whole history.
+    next_day = FormingBarProvider(FIRST, "2020-07-01")
+    store = PriceStore(str(tmp_path), next_day)
+    store.refresh([TICKER], pd.Timestamp("2020-07-01"))
+    assert next_day.calls == [(TICKER, pd.Timestamp("2020-06-29"))]
+    assert stored(store).index[-1] == pd.Timestamp("2020-06-30")
+
+
+def test_until_bounds_stored_history(tmp_path):
+    store = PriceStore(str(tmp_path), SyntheticPriceProvider(FIRST, "2020-12-31"))
+    store.refresh([TICKER], pd.Timestamp("2020-06-15"))
+    assert stored(store).index[-1] < pd.Timestamp("2020-06-15")
+
+
+def test_write_is_atomic(tmp_path, monkeypatch):
+    store = PriceStore(str(tmp_path), SyntheticPriceProvider(FIRST, "2020-06-30"), refresh_after=0.0)
+    store.refresh([TICKER], pd.Timestamp("2020-07-01"))
+    before = stored(store)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    # A write that dies half way leaves the stored files as they were.
+    def broken_save(fh, arr):
+        fh.write(b"partial")
+        raise OSError("disk full")
+
+    store.provider = SyntheticPriceProvider(FIRST, "2020-12-31")
+    monkeypatch.setattr(store_module.np, "save", broken_save)
+    with pytest.raises(OSError):
+        store.refresh([TICKER], pd.Timestamp("2021-01-01"))
+    monkeypatch.undo()
+
+    pd.testing.assert_series_equal(stored(PriceStore(str(tmp_path))), before)
+
+
+def test_rewrite_keeps_open_maps_valid(tmp_path):
+    store = PriceStore(str(tmp_path), SyntheticPriceProvider(FIRST, "2020-06-30"), refresh_after=0.0)
+    store.refresh([TICKER], pd.Timestamp("2020-07-01"))
+    old_dates, old_closes = store.window(TICKER, FIRST, "2100-01-01")
+    expected = np.array(old_closes)
+
+    store.provider = SyntheticPriceProvider(FIRST, "2020-12-31", drift=0.001)
+    store.refresh([TICKER], pd.Timestamp("2021-01-01"))
+
+    # The old map still reads the replaced file's contents, and the store
+    # now serves the new one.
+    np.testing.assert_array_equal(np.asarray(old_closes), expected)
+    assert len(store.window(TICKER, FIRST, "2100-01-01")[0]) > len(old_dates)
+
+
+class BlockingProvider(SyntheticPriceProvider):
+    # Fetches of `slow` wait until `release` is set.
+    def __init__(self, slow: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slow = slow
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def fetch(self, ticker, start=None):
+        if ticker == self.slow:
+            self.started.set()
+            assert self.release.wait(10)
+        return super().fetch(ticker, start)
+
+
+def test_fetch_runs_outside_the_lock(tmp_path):
+    provider = BlockingProvider("SLOW", FIRST, "2020-06-30")
+    store = PriceStore(str(tmp_path), provider)
+    slow = threading.Thread(target=store.refresh, args=(["SLOW"], pd.Timestamp("2020-07-01")))
+    slow.start()
+    try:
+        assert provider.started.wait(10)
+        # Another ticker refreshes and becomes readable while SLOW's fetch
+        # is still in flight.
+        assert store.refresh([TICKER], pd.Timestamp("2020-07-01")) == {}
+        assert len(stored(store)) and store.version(["SLOW"]) == (None,)
+    finally:
+        provider.release.set()
+        slow.join()
+    assert store.version(["SLOW"])[0] is not None
+
+
+def test_concurrent_refreshes_fetch_a_ticker_once(tmp_path):
+    provider = BlockingProvider(TICKER, FIRST, "2020-06-30")
+    store = PriceStore(str(tmp_path), provider)
+    results = [None] * 4
+
+    def refresh(i):
+        results[i] = store.refresh([TICKER], pd.Timestamp("2020-07-01"))
+
+    threads = [threading.Thread(target=refresh, args=(i,)) for i in range(len(results))]
+    for t in threads:
+        t.start()
+    assert provider.started.wait(10)
+    provider.release.set()
+    for t in threads:
+        t.join()
+
+    assert provider.calls == [(TICKER, None)]
+    assert results == [{}] * len(results)
+    assert stored(store).index[-1] == pd.Timestamp("2020-06-30")
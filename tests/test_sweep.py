@@ -0,0 +1,62 @@
+"""Batched parameter sweeps against one simulate_portfolio call per point."""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine.market import market_from_closes  # noqa: E402
+from invest_engine.store import SyntheticPriceProvider  # noqa: E402
+from invest_engine.sweep import expand_grid, run_point, run_sweep  # noqa: E402
+
+COLUMNS = ("end_val", "net_profit", "total_invested", "total_withdrawn_net", "total_tax_paid", "cagr", "max_dd", "depleted")
+
+
+@pytest.fixture(scope="module")
+def market():
+    provider = SyntheticPriceProvider("2000-01-03", "2020-12-31")
+    return market_from_closes(pd.DataFrame({t: provider.series(t) for t in ("SPY", "TLT", "GLD")}))
+
+
+@pytest.mark.parametrize("cost_method", ["average", "fifo"])
+@pytest.mark.parametrize("rebalance", [None, "QE"])
+def test_sweep_matches_per_point(market, cost_method, rebalance):
+    base = {"initial": 100_000.0, "rebalance": rebalance, "tax_rate": 0.25, "cost_method": cost_method, "weights": {"SPY": 1}}
+    axes = {
+        "weights": [{"SPY": 60, "TLT": 40}, {"SPY": 100}, {"SPY": 40, "TLT": 40, "GLD": 20}],
+        "withdrawal_rate": [0.0, 4.0, 12.0],
+        "withdrawal_month": [1, 7],
+        "start_year": [2002, 2008],
+        "horizon": [8],
+        "monthly": [0.0, 2_000.0],
+    }
+    points = expand_grid(base, axes)
+    results = run_sweep(market, points)
+    assert len(results) == len(points) and results["ok"].all()
+    for row, point in zip(results.to_dict("records"), points):
+        expected = run_point(market, point)
+        for col in COLUMNS:
+            assert row[col] == pytest.approx(expected[col], rel=1e-9, abs=1e-6), col
+
+
+def test_sweep_reports_points_without_data(market):
+    points = expand_grid({"initial": 1000.0, "weights": {"SPY": 1}}, {"weights": [{"NOPE": 100}, {"SPY": 100}], "start_year": [2005], "horizon": [5]})
+    results = run_sweep(market, points)
+    assert results["ok"].tolist() == [False, True]
+
+
+def test_sweep_into_the_future_matches_per_point():
+    # Years past today run on the seeded future draw, as simulate_portfolio.
+    provider = SyntheticPriceProvider("2015-01-01")
+    market = market_from_closes(pd.DataFrame({t: provider.series(t) for t in ("SPY", "TLT")}))
+    year = datetime.today().year
+    points = expand_grid(
+        {"initial": 1000.0, "weights": {"SPY": 1}},
+        {"weights": [{"SPY": 50, "TLT": 50}], "withdrawal_rate": [0.0, 5.0], "start_year": [year - 2], "horizon": [5]},
+    )
+    for row, point in zip(run_sweep(market, points).to_dict("records"), points):
+        assert row["end_val"] == pytest.approx(run_point(market, point)["end_val"], rel=1e-9)
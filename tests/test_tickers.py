@@ -0,0 +1,110 @@
+"""TickerIndex against brute-force search and suggestions."""
+
+import heapq
+import random
+import re
+import string
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from invest_engine.tickers import TICKER_DB, TickerIndex  # noqa: E402
+
+
+def osa_distance(a: str, b: str) -> int:
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+def linear_search(db: dict[str, str], query: str, limit: int = 12) -> list[tuple[str, str]]:
+    q = query.upper().strip()
+    exact, starts, contains = [], [], []
+    for sym, name in db.items():
+        s, n = sym.upper(), name.upper()
+        if s == q:
+            exact.append((sym, name))
+        elif s.startswith(q) or n.startswith(q):
+            starts.append((sym, name))
+        elif q in s or q in n:
+            contains.append((sym, name))
+    return (exact + starts + contains)[:limit]
+
+
+def brute_suggest(index: TickerIndex, query: str, limit: int = 5, min_score: float = 0.4, pool: int = 50):
+    # Every term's Dice score, the best `pool` reranked by full edit distance.
+    q = re.sub(r"[^A-Z0-9]", "", query.upper())
+    q_grams = index._bigrams(q)
+    scored = []
+    for term, ids in index.terms.items():
+        grams = index._bigrams(term)
+        if not q_grams & grams:
+            continue
+        score = 2.0 * len(q_grams & grams) / (len(q_grams) + len(grams))
+        if score >= min_score:
+            scored.append((-score, min(ids), term))
+    reranked = sorted((osa_distance(q, t), s, f, t) for s, f, t in heapq.nsmallest(pool, scored))
+    seen, out = set(), []
+    for *_, term in reranked:
+        for i in index.terms[term]:
+            if i not in seen:
+                seen.add(i)
+                out.append(index.entries[i])
+        if len(out) >= limit:
+            break
+    return out[:limit]
+
+
+@pytest.fixture(scope="module")
+def listing() -> dict[str, str]:
+    rng = random.Random(3)
+    words = ["Global", "Tech", "Bank", "Israel", "Energy", "Fund", "Index", "Growth", "Bond", "Health"]
+    db = dict(TICKER_DB)
+    while len(db) < 3000:
+        sym = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 5))) + (".TA" if rng.random() < 0.2 else "")
+        db.setdefault(sym, " ".join(rng.sample(words, rng.randint(1, 3))) + " Inc")
+    return db
+
+
+def test_edit_distance_bound():
+    rng = random.Random(0)
+    for _ in range(5000):
+        a = "".join(rng.choices("ABC", k=rng.randint(0, 6)))
+        b = "".join(rng.choices("ABC", k=rng.randint(0, 6)))
+        assert TickerIndex._edit_distance(a, b) == osa_distance(a, b)
+        bound = rng.randint(0, 3)
+        assert TickerIndex._edit_distance(a, b, bound) == min(osa_distance(a, b), bound + 1)
+
+
+def test_search_keeps_linear_ranking(listing):
+    index = TickerIndex(listing)
+    rng = random.Random(1)
+    entries = list(listing.items())
+    for _ in range(300):
+        sym, name = rng.choice(entries)
+        source = rng.choice([sym, name])
+        lo = rng.randint(0, max(len(source) - 2, 0))
+        query = source[lo:lo + rng.randint(1, 4)]
+        if not query.strip():
+            continue
+        assert index.search(query) == linear_search(listing, query), query
+
+
+def test_suggest_matches_brute_force(listing):
+    index = TickerIndex(listing)
+    rng = random.Random(2)
+    terms = list(index.terms)
+    for _ in range(300):
+        term = list(rng.choice(terms))
+        j = rng.randrange(len(term))
+        term[j] = rng.choice(string.ascii_uppercase)
+        query = "".join(term) + rng.choice(["", "X"])
+        for limit in (1, 5):
+            assert index.suggest(query, limit) == brute_suggest(index, query, limit), query